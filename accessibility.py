@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+from geo import EARTH_RADIUS, WALK_SPEED, project, unproject
+from spatial_index import GridIndex
+
+# Пешая доступность спортивных объектов по регулярной сетке над городом.
+# Границ районов в данных нет: район клетки - район ближайшего спортивного объекта,
+# население района (из кластеров районов) распределяется поровну между его клетками.
+# Клетки, ближайший объект которых без района, относятся к району UNKNOWN_DISTRICT со средним населением клетки
+
+# Шаг сетки, метры
+ACCESS_CELL_SIZE = 250
+
+# Клетки дальше этого расстояния от любого спортивного объекта считаем за пределами города, метры
+CITY_DISTANCE = 3000
+
+# Ближайший объект ищем не дальше, метры: у клеток без объекта ближе расстояние не определено (NaN)
+ACCESS_MAX_DISTANCE = 5000
+
+# Район клеток, у ближайшего объекта которых район не указан (как в таблице объектов)
+UNKNOWN_DISTRICT = 'Не указан'
+
+CELL_COLUMNS = ['lat', 'lon', 'district', 'population']
+
+# Центры клеток сетки с шагом cell_size над прямоугольником координат
+def raster(south, west, north, east, cell_size=ACCESS_CELL_SIZE):
+    lat0 = (south + north) / 2
+    (x_min, x_max), (y_min, y_max) = project([south, north], [west, east], lat0)
+    x, y = np.meshgrid(np.arange(x_min + cell_size / 2, x_max, cell_size),
+                       np.arange(y_min + cell_size / 2, y_max, cell_size))
+    return unproject(x.ravel(), y.ravel(), lat0)
+
+# Индекс для поиска ближайших не дальше max_distance: ячейка под плотность точек (примерно точка на ячейку).
+# В мелких ячейках поиск по редким точкам (например, объектам одного вида спорта) проходит десятки колец
+def nearest_index(lat, lon, max_distance):
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    valid = ~(np.isnan(lat) | np.isnan(lon))
+    cell_size = ACCESS_CELL_SIZE
+    if valid.sum() > 1:
+        x, y = project(lat[valid], lon[valid], float(lat[valid].mean()))
+        area = (x.max() - x.min()) * (y.max() - y.min())
+        cell_size = float(np.clip(np.sqrt(area / valid.sum()), ACCESS_CELL_SIZE, max_distance / 2))
+    return GridIndex(lat, lon, cell_size)
+
+# Клетки города по координатам всех спортивных объектов: сетка над объектами,
+# без клеток дальше CITY_DISTANCE от любого объекта. district_codes - код района каждого объекта
+# (-1 - район не указан), population - население районов по кодам
+def city_cells(lat, lon, district_codes, districts, population, cell_size=ACCESS_CELL_SIZE):
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    valid = ~(np.isnan(lat) | np.isnan(lon))
+    if not valid.any():
+        return pd.DataFrame(columns=CELL_COLUMNS)
+
+    margin = np.degrees(CITY_DISTANCE / EARTH_RADIUS)
+    index = nearest_index(lat, lon, CITY_DISTANCE)
+    lat, lon = lat[valid], lon[valid]
+    lat_margin, lon_margin = margin, margin / np.cos(np.radians(index.lat0))
+    cell_lat, cell_lon = raster(lat.min() - lat_margin, lon.min() - lon_margin,
+                                lat.max() + lat_margin, lon.max() + lon_margin, cell_size)
+
+    rows, _ = index.nearest(cell_lat, cell_lon, CITY_DISTANCE)
+    inside = rows >= 0
+    district = np.asarray(district_codes)[rows[inside]]
+
+    # Население района поровну между его клетками; клеткам без района - среднее население клетки с районом
+    known = district >= 0
+    cells_per_district = np.bincount(district[known], minlength=len(districts))
+    cell_population = np.zeros(len(district))
+    cell_population[known] = np.asarray(population, dtype=np.float64)[district[known]] / cells_per_district[district[known]]
+    if known.any():
+        cell_population[~known] = cell_population[known].mean()
+
+    categories = list(districts)
+    if not known.all():
+        district = np.where(known, district, len(categories))
+        categories.append(UNKNOWN_DISTRICT)
+    return pd.DataFrame({
+        'lat': cell_lat[inside],
+        'lon': cell_lon[inside],
+        'district': pd.Categorical.from_codes(district, categories=categories),
+        'population': cell_population,
+    })
+
+# Расстояние от каждой клетки до ближайшей из точек (lat, lon), метры; NaN - ближе ACCESS_MAX_DISTANCE точек нет
+def nearest_distances(cells, lat, lon):
+    index = nearest_index(lat, lon, ACCESS_MAX_DISTANCE)
+    _, distance = index.nearest(cells['lat'].to_numpy(), cells['lon'].to_numpy(), ACCESS_MAX_DISTANCE)
+    return distance
+
+# Клетки с расстоянием до ближайшего объекта и временем пешком
+def accessibility_grid(cells, distance):
+    return cells.assign(distance=distance.round(1), walk_minutes=(distance / WALK_SPEED).round(1))
+
+# Население каждого района дальше minutes минут пешком от ближайшего объекта (клетки без объекта
+# в пределах ACCESS_MAX_DISTANCE тоже считаются) и его доля
+def underserved_population(grid, minutes):
+    far = ~(grid['walk_minutes'] <= minutes)
+    summary = pd.DataFrame({
+        'population': grid.groupby('district', observed=False)['population'].sum(),
+        'underserved_population': grid['population'].where(far, 0).groupby(grid['district'], observed=False).sum(),
+    })
+    summary['underserved_share'] = (summary['underserved_population'] / summary['population'].replace(0, np.nan)).round(3)
+    summary.index = summary.index.astype(str)
+    return summary.rename_axis('district').reset_index()
@@ -1,22 +1,219 @@
+import hmac
+import os
+import threading
+import time
+import traceback
+
 import dash
 import dash_bootstrap_components as dbc
-from dash import dcc, html
+from flask import Response, jsonify, request
 
+import metrics
+from client_filtering import dataset_cache
+from data_loader import LOAD_RETRY_SECONDS, sport_data
+from figure_cache import figure_cache
 from layouts import create_layout
-from callbacks import setup_callbacks
+from callbacks import setup_callbacks, warm_caches
+
+# Сервер готов принимать пользователей: данные загружены и основные кеши прогреты
+ready = threading.Event()
+
+# Как часто наблюдатель проверяет файл запросов перезагрузки, секунды
+RELOAD_REQUEST_CHECK = 2
+
+# Последний запрос перезагрузки, который учтен в данных этого процесса (см. request_reload). Запоминает
+# процесс, который сам загрузил данные; воркеры gunicorn наследуют значение мастера вместе с его данными
+seen_reload_request = None
+
+def _env_flag(name):
+    return os.environ.get(name, '').lower() in ('1', 'true', 'yes')
+
+# Загрузка данных и прогрев кешей; True - сервер готов
+def load_and_warm():
+    global seen_reload_request
+    try:
+        if not ready.is_set():
+            # Запрос перезагрузки читаем до загрузки: данные будут не старше него
+            request_id = read_reload_request()
+            loaded = sport_data.loaded
+            if sport_data.load():
+                if not loaded:
+                    seen_reload_request = request_id
+                warm_caches()
+                ready.set()
+        return ready.is_set()
+    finally:
+        sport_data.release()
+
+# Загрузка в фоне, чтобы сервер сразу начал отвечать (запросы к данным дождутся загрузки).
+# После неудачи (CSV нет или он еще дописывается) повторяем раз в LOAD_RETRY_SECONDS, пока сервер не станет готов:
+# если данные тем временем загрузит запрос, повтор только прогреет кеши
+def load_until_ready():
+    while not load_and_warm():
+        time.sleep(LOAD_RETRY_SECONDS)
 
-def create_app():
+def start_background_load():
+    thread = threading.Thread(target=load_until_ready, name='sport-data-load', daemon=True)
+    thread.start()
+    return thread
+
+# Перезагрузка данных, если CSV изменился: новая версия собирается, пока запросы обслуживаются старой,
+# после подмены кеши новой версии прогреваются. True - версия подменена
+def reload_and_warm(force=False):
+    global seen_reload_request
+    try:
+        request_id = read_reload_request()
+        if not sport_data.reload(force):
+            return False
+        seen_reload_request = request_id
+        warm_caches()
+        ready.set()
+        return True
+    finally:
+        sport_data.release()
+
+# Файл запросов перезагрузки рядом с CSV: под gunicorn POST /reload попадает в один воркер,
+# остальные узнают о запросе из этого файла
+def reload_request_filename():
+    return sport_data.filename + '.reload'
+
+def read_reload_request():
+    try:
+        with open(reload_request_filename(), encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+# Новый запрос перезагрузки для всех процессов: уникальная строка, ' force' в конце - перезагрузить в любом случае
+def request_reload(force=False):
+    request_id = f'{time.time_ns()}-{os.getpid()}' + (' force' if force else '')
+    tmp_filename = f'{reload_request_filename()}.{os.getpid()}.tmp'
+    with open(tmp_filename, 'w', encoding='utf-8') as f:
+        f.write(request_id)
+    os.replace(tmp_filename, reload_request_filename())
+    return request_id
+
+# Наблюдатель за данными: раз в RELOAD_REQUEST_CHECK секунд выполняет новые запросы перезагрузки
+# из файла (их мог принять другой воркер), а если interval > 0 - раз в interval секунд проверяет CSV.
+# Перезагружаем, когда CSV изменился и не менялся с прошлой проверки, чтобы не читать файл, который еще дописывается.
+# Выполняются все запросы новее загруженных данных - и сделанные до запуска воркера, которым gunicorn заменил прежний
+def start_reload_watcher(interval, request_check=RELOAD_REQUEST_CHECK):
+    
+    def watch():
+        global seen_reload_request
+        previous = None
+        checked_at = time.monotonic()
+        # Первая проверка запросов - сразу при запуске: новый воркер не должен отвечать по устаревшим данным мастера
+        delay = 0
+        while True:
+            time.sleep(delay)
+            delay = min(interval, request_check) if interval > 0 else request_check
+            try:
+                current = read_reload_request()
+                if current is not None and current != seen_reload_request:
+                    seen_reload_request = current
+                    reload_and_warm(current.endswith(' force'))
+                
+                if interval <= 0 or time.monotonic() - checked_at < interval:
+                    continue
+                checked_at = time.monotonic()
+                signature = sport_data.source_changed()
+                if signature is not None and signature == previous:
+                    reload_and_warm()
+                    signature = None
+                previous = signature
+            except Exception:
+                traceback.print_exc()
+    
+    thread = threading.Thread(target=watch, name='sport-data-watch', daemon=True)
+    thread.start()
+    return thread
+
+# POST /reload - перезагрузить данные в фоне, не дожидаясь проверки по расписанию.
+# Доступен только если задан RELOAD_TOKEN, токен передается в заголовке X-Reload-Token.
+# Этот процесс перезагружается сразу, остальные воркеры - по файлу запросов (наблюдатель из post_fork)
+def setup_reload_route(server, token):
+    
+    @server.route('/reload', methods=['POST'])
+    def reload_data():
+        global seen_reload_request
+        if not hmac.compare_digest(request.headers.get('X-Reload-Token', ''), token):
+            return jsonify(error='forbidden'), 403
+        force = request.args.get('force', '').lower() in ('1', 'true', 'yes')
+        seen_reload_request = request_reload(force)
+        threading.Thread(target=reload_and_warm, args=(force,), name='sport-data-reload', daemon=True).start()
+        return jsonify(status='started', version=sport_data.version), 202
+
+# /metrics - время, размер ответов и исходы callback'ов, показатели кешей (формат Prometheus)
+def setup_metrics(app):
+    metrics.instrument_callbacks(app)
+    metrics.register_cache('filter', sport_data.filter_cache)
+    metrics.register_cache('figure', figure_cache)
+    metrics.register_cache('client_dataset', dataset_cache)
+    metrics.register_gauge('app_data_loaded', 'Данные загружены', lambda: int(sport_data.loaded))
+    metrics.register_gauge('app_ready', 'Данные загружены и кеши прогреты', lambda: int(ready.is_set()))
+    
+    @app.server.route('/metrics')
+    def metrics_endpoint():
+        return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+# /healthz - процесс жив; /readyz - 200 только после загрузки и прогрева, иначе 503 (для балансировщика и оркестратора)
+def setup_health_routes(server):
+    
+    @server.route('/healthz')
+    def healthz():
+        return jsonify(status='ok')
+    
+    @server.route('/readyz')
+    def readyz():
+        status = {
+            'ready': ready.is_set(),
+            'loaded': sport_data.loaded,
+            'version': sport_data.version,
+            'error': sport_data.load_error,
+        }
+        return jsonify(status), 200 if ready.is_set() else 503
+
+# Режим фильтрации на клиенте включается параметром или переменной окружения CLIENT_FILTERING=1,
+# загрузка данных в фоне при создании приложения - параметром eager_load или EAGER_LOAD=1,
+# проверка изменений CSV - параметром reload_interval или RELOAD_INTERVAL (секунды, 0 - не проверять)
+def create_app(client_filtering=None, eager_load=None, reload_interval=None):
+    if client_filtering is None:
+        client_filtering = _env_flag('CLIENT_FILTERING')
+    if eager_load is None:
+        eager_load = _env_flag('EAGER_LOAD')
+    if reload_interval is None:
+        reload_interval = float(os.environ.get('RELOAD_INTERVAL', 0))
   
     app = dash.Dash(
         __name__,
         external_stylesheets=[dbc.themes.BOOTSTRAP],
-        suppress_callback_exceptions=True
+        suppress_callback_exceptions=True,
+        # Ответы callback'ов сжимаем (Flask-Compress с настройками по умолчанию): brotli, если браузер
+        # его поддерживает, иначе gzip; ответы меньше 500 байт не сжимаются
+        compress=True
     )
     
     app.title = "🏙️ Информационно-аналитическая система для оценки обеспеченности районов Санкт-Петербурга объектами спортивной инфраструктуры"
-    app.layout = create_layout()
-
-    setup_callbacks(app)
+    app.layout = create_layout(client_filtering)
+    
+    setup_callbacks(app, client_filtering)
+    setup_metrics(app)
+    setup_health_routes(app.server)
+    # Версия данных закрепляется за потоком в sport_data.load() на время одного запроса
+    app.server.teardown_request(lambda exc: sport_data.release())
+    if os.environ.get('RELOAD_TOKEN'):
+        setup_reload_route(app.server, os.environ['RELOAD_TOKEN'])
+    
+    if eager_load:
+        start_background_load()
+    else:
+        # Без фоновой загрузки и прогрева сервер готов после первой успешной загрузки - по запросу или заранее
+        sport_data.reload_listeners.append(lambda previous, current: ready.set())
+        if sport_data.loaded:
+            ready.set()
+    if reload_interval > 0:
+        start_reload_watcher(reload_interval)
   
 
     return app
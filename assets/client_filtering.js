@@ -0,0 +1,251 @@
+// Режим фильтрации на клиенте (CLIENT_FILTERING=1): набор данных приходит один раз в dcc.Store 'client-dataset'
+// (см. client_filtering.py), таблицу и карту по фильтрам пересчитывают функции ниже.
+// Фильтры повторяют SportDataLoader.filter_data: объекты - по виду спорта и району, связи с инфраструктурой -
+// еще и по типу инфраструктуры и радиусу; в таблице при выбранном типе инфраструктуры или радиусе -
+// только объекты с подходящей инфраструктурой, в колонке типов - только инфраструктура в пределах радиуса
+
+(function () {
+    var EMPTY_INFRA = 'Нет инфраструктуры';
+
+    // Последний результат фильтрации - общий для таблицы и карты
+    var lastKey = null;
+    var lastResult = null;
+
+    // Типы инфраструктуры по объектам для таблицы - один раз на версию данных и радиус
+    var infraTypesKey = null;
+    var infraTypes = null;
+
+    // Значение фильтра -> множество кодов категорий; null - без фильтра
+    function normalizeFilter(value, categories) {
+        if (value === null || value === undefined) {
+            return null;
+        }
+        var values = Array.isArray(value) ? value : [value];
+        values = values.filter(function (v) { return v !== null && v !== '' && v !== 'all'; });
+        if (!values.length) {
+            return null;
+        }
+        var codes = new Set();
+        values.forEach(function (v) {
+            var code = categories.indexOf(String(v));
+            if (code >= 0) {
+                codes.add(code);
+            }
+        });
+        return codes;
+    }
+
+    // Радиус в единицах расстояний набора; null - без ограничения
+    function normalizeRadius(value, dataset) {
+        if (value === null || value === undefined || value === '' || value === 'all') {
+            return null;
+        }
+        var radius = Number(value);
+        if (radius >= dataset.max_distance) {
+            return null;
+        }
+        return radius * dataset.distance_scale;
+    }
+
+    function filterData(dataset, sportFilter, infraFilter, districtFilter, radiusFilter) {
+        var key = JSON.stringify([dataset.version, sportFilter, infraFilter, districtFilter, radiusFilter]);
+        if (key === lastKey) {
+            return lastResult;
+        }
+
+        var categories = dataset.categories;
+        var sports = normalizeFilter(sportFilter, categories.sport_types);
+        var infras = normalizeFilter(infraFilter, categories.infra_types);
+        var districts = normalizeFilter(districtFilter, categories.districts);
+        var radius = normalizeRadius(radiusFilter, dataset);
+
+        var objects = dataset.objects;
+        var objectPass = new Uint8Array(objects.type.length);
+        var objectRows = [];
+        for (var i = 0; i < objectPass.length; i++) {
+            if ((sports === null || sports.has(objects.type[i])) &&
+                    (districts === null || districts.has(objects.district[i]))) {
+                objectPass[i] = 1;
+                objectRows.push(i);
+            }
+        }
+
+        var links = dataset.links;
+        var infraTypeCodes = dataset.infra.type;
+        var withInfra = new Uint8Array(objectPass.length);
+        var linkRows = [];
+        for (var j = 0; j < links.object.length; j++) {
+            var object = links.object[j];
+            if (sports !== null || districts !== null) {
+                if (object < 0 || (sports !== null && !sports.has(objects.type[object])) ||
+                        (districts !== null && !districts.has(objects.district[object]))) {
+                    continue;
+                }
+            }
+            if (infras !== null && (links.infra[j] < 0 || !infras.has(infraTypeCodes[links.infra[j]]))) {
+                continue;
+            }
+            if (radius !== null && (links.distance[j] === null || links.distance[j] > radius)) {
+                continue;
+            }
+            linkRows.push(j);
+            if (object >= 0) {
+                withInfra[object] = 1;
+            }
+        }
+
+        var tableRows = objectRows;
+        if (infras !== null || radius !== null) {
+            tableRows = objectRows.filter(function (row) { return withInfra[row]; });
+        }
+
+        lastKey = key;
+        lastResult = {objects: objectRows, table: tableRows, links: linkRows};
+        return lastResult;
+    }
+
+    // Типы инфраструктуры объекта по его связям не дальше радиуса: уникальные, по алфавиту, через запятую
+    function objectInfraTypes(dataset, radiusFilter) {
+        var radius = normalizeRadius(radiusFilter, dataset);
+        var key = JSON.stringify([dataset.version, radius]);
+        if (infraTypesKey === key) {
+            return infraTypes;
+        }
+        var names = dataset.categories.infra_types;
+        var links = dataset.links;
+        var sets = {};
+        for (var j = 0; j < links.object.length; j++) {
+            var object = links.object[j];
+            var infra = links.infra[j];
+            if (object < 0 || infra < 0 || dataset.infra.type[infra] < 0) {
+                continue;
+            }
+            if (radius !== null && (links.distance[j] === null || links.distance[j] > radius)) {
+                continue;
+            }
+            (sets[object] = sets[object] || new Set()).add(names[dataset.infra.type[infra]]);
+        }
+        infraTypes = {};
+        Object.keys(sets).forEach(function (object) {
+            infraTypes[object] = Array.from(sets[object]).sort().join(', ');
+        });
+        infraTypesKey = key;
+        return infraTypes;
+    }
+
+    function truncate(text, limit) {
+        return text.length > limit ? text.slice(0, limit) : text;
+    }
+
+    function categoryName(categories, code) {
+        return code >= 0 ? categories[code] : 'nan';
+    }
+
+    function coordinate(origin, value, scale) {
+        return value === null ? null : origin + value / scale;
+    }
+
+    function counts(objectCount, infraCount) {
+        return [
+            {namespace: 'dash_html_components', type: 'Span',
+             props: {children: 'Спортивных объектов: ' + objectCount, className: 'mr-3'}},
+            {namespace: 'dash_html_components', type: 'Span',
+             props: {children: ' | Объектов инфраструктуры: ' + infraCount, className: 'mr-3'}}
+        ];
+    }
+
+    function mapFigure(dataset, filtered) {
+        var style = dataset.map;
+        if (!filtered.objects.length && !filtered.links.length) {
+            return style.empty_figure;
+        }
+
+        var lat0 = dataset.origin[0];
+        var lon0 = dataset.origin[1];
+        var scale = dataset.coord_scale;
+        var traces = [];
+
+        // Как на сервере: трасса на каждый вид спорта и тип инфраструктуры, пустые скрыты из легенды
+        var objects = dataset.objects;
+        dataset.categories.sport_types.forEach(function (sportType, code) {
+            var lat = [], lon = [], text = [];
+            filtered.objects.forEach(function (row) {
+                if (objects.type[row] === code && objects.lat[row] !== null && objects.lon[row] !== null) {
+                    lat.push(coordinate(lat0, objects.lat[row], scale));
+                    lon.push(coordinate(lon0, objects.lon[row], scale));
+                    text.push(objects.name[row]);
+                }
+            });
+            traces.push({
+                type: 'scattermapbox', lat: lat, lon: lon, mode: 'markers',
+                marker: {size: 12, color: style.sport_colors[code % style.sport_colors.length], opacity: 0.9},
+                name: sportType, showlegend: lat.length > 0, hovertext: text, hoverinfo: 'text'
+            });
+        });
+
+        // Объект инфраструктуры рядом с несколькими объектами рисуем один раз
+        var infra = dataset.infra;
+        var seen = new Set();
+        var infraRows = [];
+        filtered.links.forEach(function (row) {
+            var key = dataset.links.infra[row];
+            if (key >= 0 && !seen.has(key) && infra.lat[key] !== null && infra.lon[key] !== null) {
+                seen.add(key);
+                infraRows.push(key);
+            }
+        });
+        dataset.categories.infra_types.forEach(function (infraType, code) {
+            var lat = [], lon = [], text = [];
+            infraRows.forEach(function (row) {
+                if (infra.type[row] === code) {
+                    lat.push(coordinate(lat0, infra.lat[row], scale));
+                    lon.push(coordinate(lon0, infra.lon[row], scale));
+                    text.push(infra.name[row] + ' - ' + infraType);
+                }
+            });
+            traces.push({
+                type: 'scattermapbox', lat: lat, lon: lon, mode: 'markers',
+                marker: {size: 8, color: style.infra_colors[infraType] || style.infra_default_color, opacity: 0.7},
+                name: infraType, showlegend: lat.length > 0, hovertext: text, hoverinfo: 'text'
+            });
+        });
+
+        return {data: traces, layout: style.layout};
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        sport: {
+            filterTable: function (sportFilter, infraFilter, districtFilter, radius, dataset) {
+                if (!dataset) {
+                    throw window.dash_clientside.PreventUpdate;
+                }
+                var filtered = filterData(dataset, sportFilter, infraFilter, districtFilter, radius);
+                var types = objectInfraTypes(dataset, radius);
+                var objects = dataset.objects;
+                var categories = dataset.categories;
+                var limits = dataset.map.table_text_limits;
+                var infraLimit = dataset.map.table_infra_limit;
+
+                return filtered.table.map(function (row) {
+                    var infraText = types[row] || EMPTY_INFRA;
+                    return {
+                        'Название': truncate(objects.name[row], limits['Название']),
+                        'Тип спорта': categoryName(categories.sport_types, objects.type[row]),
+                        'Адрес': truncate(objects.address[row], limits['Адрес']),
+                        'Район': categoryName(categories.districts, objects.district[row]),
+                        'Типы инфраструктуры': infraText.length > infraLimit ?
+                            infraText.slice(0, infraLimit) + '...' : infraText
+                    };
+                });
+            },
+
+            renderMap: function (selectedTab, sportFilter, infraFilter, districtFilter, radius, dataset) {
+                if (selectedTab !== 'tab-map' || !dataset) {
+                    throw window.dash_clientside.PreventUpdate;
+                }
+                var filtered = filterData(dataset, sportFilter, infraFilter, districtFilter, radius);
+                return [counts(filtered.objects.length, filtered.links.length), mapFigure(dataset, filtered)];
+            }
+        }
+    });
+})();
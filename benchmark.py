@@ -0,0 +1,248 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import synthetic_data
+from data_loader import SportDataLoader, sport_data
+
+# Замеры загрузчика, таблицы, карты и графиков на синтетических датасетах разного размера.
+# Результаты сохраняются в JSON и сравниваются с сохраненным ранее (базовым) прогоном:
+#   python benchmark.py --objects 1000 10000 100000 --output benchmark_baseline.json
+#   python benchmark.py --objects 1000 10000 100000 --compare benchmark_baseline.json
+
+DATA_DIR = 'benchmark_data'
+OUTPUT_FILENAME = 'benchmark_results.json'
+
+# Замедление относительно базового прогона, после которого замер считается регрессией:
+# доля от базового времени и абсолютный порог, чтобы не реагировать на шум коротких замеров
+TOLERANCE = 0.25
+MIN_REGRESSION_SECONDS = 0.002
+
+# Точка и область запросов - центр города и его часть
+QUERY_POINT = (59.94, 30.31)
+QUERY_RADIUS = 1000
+QUERY_BBOX = (59.90, 30.20, 59.98, 30.40)
+
+def dataset_key(objects, links, districts, sport_types):
+    return f'objects={objects},links={links},districts={districts},sport_types={sport_types}'
+
+# CSV с параметрами в имени; уже сгенерированный с теми же параметрами используем повторно
+def dataset_file(data_dir, objects, links, districts, sport_types, seed):
+    os.makedirs(data_dir, exist_ok=True)
+    filename = os.path.join(data_dir, f'synthetic_{objects}_{links}_{districts}_{sport_types}_{seed}.csv')
+    if not os.path.exists(filename):
+        synthetic_data.generate(filename, objects, links, districts, sport_types, seed)
+    return filename
+
+# Время вызовов func: setup() перед каждым вызовом не входит в замер
+def measure(func, repeat, setup=None):
+    runs = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - started)
+    return {'median': statistics.median(runs), 'min': min(runs), 'runs': len(runs)}
+
+def _remove_snapshot(filename):
+    for path in (filename + '.snapshot.pkl',):
+        if os.path.exists(path):
+            os.remove(path)
+
+# Запрос к callback'у так, как его делает браузер: POST /_dash-update-component
+class CallbackClient:
+
+    def __init__(self, app):
+        self.client = app.server.test_client()
+        self.dependencies = {dep['output']: dep for dep in self.client.get('/_dash-dependencies').json}
+
+    def call(self, output_prefix, values, changed):
+        output, dep = next((key, dep) for key, dep in self.dependencies.items() if key.startswith(output_prefix))
+        outputs = [{'id': part.split('.')[0], 'property': part.split('.')[1]}
+                   for part in output.strip('.').split('...')]
+
+        def props(items):
+            return [dict(id=item['id'], property=item['property'],
+                         value=values.get(f"{item['id']}.{item['property']}")) for item in items]
+
+        body = {'output': output, 'outputs': outputs if len(outputs) > 1 else outputs[0],
+                'inputs': props(dep['inputs']), 'state': props(dep['state']), 'changedPropIds': changed}
+        response = self.client.post('/_dash-update-component', json=body)
+        if response.status_code not in (200, 204):
+            raise RuntimeError(f"{output}: HTTP {response.status_code}")
+        return len(response.data)
+
+def clear_caches():
+    from figure_cache import figure_cache
+    sport_data.filter_cache.clear()
+    figure_cache.clear()
+
+# Все замеры одного датасета. client - CallbackClient приложения, общего для всех датасетов
+def run_dataset(filename, repeat, client):
+    import callbacks
+
+    results = {}
+
+    # Загрузка: разбор CSV со сборкой снимка и чтение готового снимка
+    def load_fresh():
+        SportDataLoader(filename).load()
+    results['load.csv'] = measure(load_fresh, 1, setup=lambda: _remove_snapshot(filename))
+    results['load.snapshot'] = measure(load_fresh, repeat)
+
+    # Дальше работаем через общий загрузчик дашборда, переключив его на датасет
+    sport_data.filename = filename
+    sport_data.snapshot_filename = filename + '.snapshot.pkl'
+    if not sport_data.reload(force=True):
+        raise RuntimeError(f"Не удалось загрузить {filename}: {sport_data.load_error}")
+
+    objects = sport_data.get_objects()
+    object_ids = objects['sport_object_id'].to_numpy()
+    sample_sport = str(objects['sport_object_type'].iloc[0])
+    sample_infra = sport_data.get_infrastructure_types()[0]
+    filtered = sport_data.filter_data()
+
+    accessors = {
+        'get_objects': sport_data.get_objects,
+        'get_full_data': sport_data.get_full_data,
+        'get_infrastructure_by_object': lambda: sport_data.get_infrastructure_by_object(object_ids[0]),
+        'get_infrastructure_types_by_objects': lambda: sport_data.get_infrastructure_types_by_objects(object_ids),
+        'filter_data': lambda: sport_data.filter_data(),
+        'filter_data.filtered': lambda: sport_data.filter_data(sample_sport, sample_infra, None, 500),
+        'get_objects_in_bbox': lambda: sport_data.get_objects_in_bbox(*QUERY_BBOX),
+        'get_infrastructure_in_bbox': lambda: sport_data.get_infrastructure_in_bbox(*QUERY_BBOX),
+        'get_objects_within_radius': lambda: sport_data.get_objects_within_radius(*QUERY_POINT, QUERY_RADIUS),
+        'get_infrastructure_within_radius': lambda: sport_data.get_infrastructure_within_radius(*QUERY_POINT, QUERY_RADIUS),
+        'clip_to_bbox': lambda: sport_data.clip_to_bbox(filtered, QUERY_BBOX),
+        'get_sport_types_with_counts': sport_data.get_sport_types_with_counts,
+        'get_districts': sport_data.get_districts,
+        'get_infrastructure_types': sport_data.get_infrastructure_types,
+        'get_basic_statistics': sport_data.get_basic_statistics,
+        'get_district_metrics': sport_data.get_district_metrics,
+        'get_district_statistics': sport_data.get_district_statistics,
+        'get_provision_metrics': sport_data.get_provision_metrics,
+        'get_provision_metrics.filtered': lambda: sport_data.get_provision_metrics(sample_sport, sample_infra),
+        'get_accessibility_grid': lambda: sport_data.get_accessibility_grid(),
+        'get_accessibility_grid.filtered': lambda: sport_data.get_accessibility_grid(sample_sport),
+        'get_access_distances': sport_data.get_access_distances,
+    }
+    for name, func in accessors.items():
+        results[f'loader.{name}'] = measure(func, repeat, setup=sport_data.filter_cache.clear)
+
+    # Таблица - целиком через HTTP, как из браузера (фильтрация, страница, сериализация); кеши сброшены
+    table_values = {'objects-table.page_current': 0, 'objects-table.page_size': 10,
+                    'objects-table.sort_by': [], 'objects-table.filter_query': '',
+                    'map-radius-filter.value': 1500}
+    results['update_table_data'] = measure(
+        lambda: client.call('..objects-table.data', table_values, ['map-sport-filter.value']),
+        repeat, setup=clear_caches)
+    sorted_values = dict(table_values, **{'objects-table.sort_by': [{'column_id': 'Адрес', 'direction': 'desc'}],
+                                          'objects-table.filter_query': '{Название} icontains 1'})
+    results['update_table_data.sorted'] = measure(
+        lambda: client.call('..objects-table.data', sorted_values, ['objects-table.sort_by']),
+        repeat, setup=clear_caches)
+
+    results['create_combined_map_with_colors'] = measure(
+        lambda: callbacks.create_combined_map_with_colors(filtered.objects, filtered.infra), repeat)
+    visible = sport_data.clip_to_bbox(filtered, QUERY_BBOX)
+    results['create_combined_map_with_colors.bbox'] = measure(
+        lambda: callbacks.create_combined_map_with_colors(visible.objects, visible.infra, 13), repeat)
+    grid = sport_data.get_accessibility_grid()
+    access_cells = grid[~(grid['walk_minutes'] <= 15)]
+    results['create_combined_map_with_colors.access'] = measure(
+        lambda: callbacks.create_combined_map_with_colors(filtered.objects, filtered.infra, access_cells=access_cells), repeat)
+
+    for chart_id, chart_function, get_data in callbacks.ANALYTICS_CHARTS:
+        data = get_data()
+        results[chart_function.__name__] = measure(lambda: chart_function(data), repeat)
+    provision = sport_data.get_provision_metrics()
+    results['create_chart_provision_ranking'] = measure(lambda: callbacks.create_chart_provision_ranking(provision), repeat)
+
+    return results, {'rows': int(len(sport_data.model.links)), 'objects': int(len(objects)),
+                     'infrastructure': int(len(sport_data.model.infrastructure))}
+
+def environment():
+    return {
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+# Сравнение медиан с базовым прогоном: список (датасет, замер, было, стало, отношение) для регрессий
+def compare(results, baseline, tolerance=TOLERANCE):
+    regressions = []
+    for key, dataset in results['datasets'].items():
+        base = baseline.get('datasets', {}).get(key)
+        if base is None:
+            continue
+        for name, current in dataset['results'].items():
+            previous = base['results'].get(name)
+            if previous is None:
+                continue
+            before, after = previous['median'], current['median']
+            if after > before * (1 + tolerance) and after - before > MIN_REGRESSION_SECONDS:
+                regressions.append((key, name, before, after, after / before if before else float('inf')))
+    return regressions
+
+def report(results):
+    lines = []
+    for key, dataset in results['datasets'].items():
+        lines.append(f"{key}: строк {dataset['size']['rows']}, объектов {dataset['size']['objects']}, "
+                     f"инфраструктуры {dataset['size']['infrastructure']}")
+        for name, value in dataset['results'].items():
+            lines.append(f"  {name:<42} {value['median'] * 1000:10.2f} мс (мин. {value['min'] * 1000:.2f})")
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры загрузчика, таблицы, карты и графиков на синтетических данных")
+    parser.add_argument('--objects', type=int, nargs='+', default=[1000, 10000], help="размеры датасетов, объектов")
+    parser.add_argument('--links', type=int, default=30, help="связей с инфраструктурой на объект")
+    parser.add_argument('--districts', type=int, default=18, help="число районов")
+    parser.add_argument('--sport-types', type=int, default=3, help="число видов спорта")
+    parser.add_argument('--seed', type=int, default=0, help="зерно генератора")
+    parser.add_argument('--repeat', type=int, default=5, help="повторов каждого замера")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="каталог для сгенерированных CSV")
+    parser.add_argument('--output', default=OUTPUT_FILENAME, help="куда сохранить результаты (JSON)")
+    parser.add_argument('--compare', help="базовый прогон (JSON), с которым сравнить результаты")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help="допустимое замедление, доля")
+    args = parser.parse_args()
+
+    # Приложение создаем один раз: create_app добавляет слушателей перезагрузки sport_data и регистрирует метрики,
+    # а датасеты переключаются перезагрузкой общего загрузчика
+    from app import create_app
+    client = CallbackClient(create_app(eager_load=False, reload_interval=0))
+
+    results = {'environment': environment(), 'repeat': args.repeat, 'datasets': {}}
+    for objects in args.objects:
+        filename = dataset_file(args.data_dir, objects, args.links, args.districts, args.sport_types, args.seed)
+        timings, size = run_dataset(filename, args.repeat, client)
+        key = dataset_key(objects, args.links, args.districts, args.sport_types)
+        results['datasets'][key] = {'file': filename, 'size': size, 'results': timings}
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(report(results))
+    print(f"Результаты сохранены в {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for key, name, before, after, ratio in regressions:
+            print(f"РЕГРЕССИЯ {key} {name}: {before * 1000:.2f} -> {after * 1000:.2f} мс (x{ratio:.2f})")
+        if regressions:
+            raise SystemExit(1)
+        print(f"Регрессий относительно {args.compare} нет")
+
+if __name__ == '__main__':
+    main()
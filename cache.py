@@ -0,0 +1,73 @@
+from collections import OrderedDict
+import threading
+
+# LRU-кеш с ограничением по суммарному размеру значений в байтах
+class LRUCache:
+
+    def __init__(self, max_bytes, sizeof=None):
+        self.max_bytes = max_bytes
+        # Функция оценки размера значения; по умолчанию len() - подходит для bytes/str
+        self.sizeof = sizeof or len
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._items.move_to_end(key)
+            return self._items[key][0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+
+        with self._lock:
+            if key in self._items:
+                self.total_bytes -= self._items.pop(key)[1]
+
+            # Значение больше всего бюджета не кешируем
+            if size > self.max_bytes:
+                return value
+
+            self._items[key] = (value, size)
+            self.total_bytes += size
+
+            # Вытесняем самые давние записи, пока не уложимся в бюджет
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._items.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+        return value
+
+    # Значение из кеша или результат factory(), который сразу кладется в кеш
+    def get_or_create(self, key, factory):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = self.put(key, factory())
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        return {
+            'items': len(self._items),
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
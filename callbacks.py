@@ -1,13 +1,23 @@
-from dash import Input, Output, State, callback_context, html, dcc
-import dash_bootstrap_components as dbc
+from dash import ClientsideFunction, Input, Output, State, callback_context, html
+from dash.exceptions import PreventUpdate
 import plotly.graph_objects as go
-import plotly.express as px
 import pandas as pd
 import numpy as np
+import math
+import json
 
-from data_loader import sport_data
+from data_loader import sport_data, normalize_filter, normalize_radius
+from accessibility import ACCESS_CELL_SIZE
+from geo import EARTH_RADIUS
+from figure_cache import cached_figure, figure_patch, filter_key, peek_figure
+from map_clusters import cluster_points, marker_sizes
+from table_query import query_page
+from client_filtering import dataset_cache, dataset_payload
+from layouts import PROVISION_DEFAULT_METRIC, PROVISION_METRICS, RADIUS_MAX
+from metrics import record_rows
 
-def setup_callbacks(app): 
+# client_filtering - фильтрация карты и таблицы в браузере по данным из dcc.Store (см. client_filtering.py)
+def setup_callbacks(app, client_filtering=False):
     
     # Карточка
     @app.callback(
@@ -48,12 +58,14 @@ def setup_callbacks(app):
     @app.callback(
         [Output('map-sport-filter', 'options'),
          Output('map-infra-filter', 'options'),
-         Output('map-district-filter', 'options')],
+         Output('map-district-filter', 'options'),
+         Output('provision-sport-filter', 'options'),
+         Output('provision-infra-filter', 'options')],
         Input('url', 'pathname')
     )
     def update_filter_options(pathname):
         if not sport_data.load():
-            return [[] for _ in range(3)]
+            return [[] for _ in range(5)]
         
         # Фильтр видов спорта
         types_data = sport_data.get_sport_types_with_counts()
@@ -77,239 +89,398 @@ def setup_callbacks(app):
         district_options = [{'label': 'Все районы', 'value': 'all'}]
         district_options += [{'label': d, 'value': d} for d in districts]
         
-        return [sport_options, infra_options, district_options]
-    
-    # Список спортивных объектов
-    @app.callback(
-        Output('objects-table', 'data'),
-        [Input('map-sport-filter', 'value'),
-         Input('map-infra-filter', 'value'),
-         Input('map-district-filter', 'value')]
-    )
-    def update_table_data(sport_filter, infra_filter, district_filter):
-        sport_data.load()
-        df = sport_data.get_objects()
-        
-        filtered_df = df.copy()
-        
-        if sport_filter and sport_filter != 'all':
-            filtered_df = filtered_df[filtered_df['sport_object_type'] == sport_filter]
-        
-        if district_filter and district_filter != 'all':
-            filtered_df = filtered_df[filtered_df['district'] == district_filter]
-        
-        # Фильтрация по инфраструктуре
-        if infra_filter and infra_filter != 'all':
-            full_df = sport_data.get_full_data()
-            infra_filtered = full_df[full_df['infrastructure_type'] == infra_filter]
-            valid_ids = infra_filtered['sport_object_id'].unique()
-            filtered_df = filtered_df[filtered_df['sport_object_id'].isin(valid_ids)]
-        
-        # Создаем данные для таблицы
-        table_data = []
-        if not filtered_df.empty:
-            for _, row in filtered_df.iterrows():
-                obj_id = row['sport_object_id']
-                infra_list = sport_data.get_infrastructure_by_object(obj_id)
-                
-                # Получаем уникальные типы инфраструктуры
-                infra_types = set()
-                for item in infra_list:
-                    if 'type' in item:
-                        infra_types.add(item['type'])
-                
-                infra_types_str = ', '.join(sorted(infra_types)) if infra_types else 'Нет инфраструктуры'
-                
-                table_data.append({
-                    'Название': str(row.get('sport_object_name', 'Без названия'))[:40],
-                    'Тип спорта': str(row.get('sport_object_type', 'Не указан')),
-                    'Адрес': str(row.get('sport_object_address', 'Без адреса'))[:50],
-                    'Район': str(row.get('district', 'Не указан')),
-                    'Типы инфраструктуры': infra_types_str[:60] + ('...' if len(infra_types_str) > 60 else '')
-                })
-        
-        return table_data
+        # Фильтры рейтинга обеспеченности - те же виды спорта и типы инфраструктуры
+        return [sport_options, infra_options, district_options, sport_options, infra_options]
+    
+    # В режиме фильтрации на клиенте таблицу и карту обновляют clientside callback'и
+    if client_filtering:
+        setup_client_filtering(app)
+    
+    if not client_filtering:
+        # Список спортивных объектов - фильтр, сортировка и разбивка на страницы на сервере,
+        # в браузер уходит только текущая страница
+        @app.callback(
+            [Output('objects-table', 'data'),
+             Output('objects-table', 'page_count'),
+             Output('objects-table', 'page_current')],
+            [Input('map-sport-filter', 'value'),
+             Input('map-infra-filter', 'value'),
+             Input('map-district-filter', 'value'),
+             Input('map-radius-filter', 'value'),
+             Input('objects-table', 'page_current'),
+             Input('objects-table', 'page_size'),
+             Input('objects-table', 'sort_by'),
+             Input('objects-table', 'filter_query')]
+        )
+        def update_table_data(sport_filter, infra_filter, district_filter, radius,
+                              page_current, page_size, sort_by, filter_query):
+            sport_data.load()
+            
+            # Любое изменение, кроме перехода по страницам, возвращает на первую страницу
+            if 'objects-table.page_current' not in callback_context.triggered_prop_ids:
+                page_current = 0
+            
+            # Результат фильтрации общий с картой и кешируется в загрузчике
+            filtered = sport_data.filter_data(sport_filter, infra_filter, district_filter, radius)
+            record_rows('update_table_data', len(filtered.table_objects))
+            
+            # Создаем данные для таблицы
+            table_df = build_objects_table(filtered.table_objects, radius)
+            page, page_count, page_current = query_page(table_df, page_current, page_size, sort_by, filter_query)
+            return [table_records(page), page_count, page_current]
     
-    # Вкладки
+    # Вкладки - только переключение видимости, контент грузится отдельными callback'ами
     @app.callback(
-        [Output('tab-content', 'children'),
+        [Output('map-tab-content', 'style'),
+         Output('charts-tab-content', 'style'),
          Output('map-filters-container', 'style'),
          Output('objects-table-container', 'style')],
-        [Input('main-tabs', 'value'),
-         Input('map-sport-filter', 'value'),
-         Input('map-infra-filter', 'value'),
-         Input('map-district-filter', 'value')]
+        Input('main-tabs', 'value')
     )
-    def handle_tabs(selected_tab, sport_filter, infra_filter, district_filter):
-        
-        # Фильтры карты
-        filter_style = {'display': 'block'} if selected_tab == 'tab-map' else {'display': 'none'}
-        table_style = {'display': 'block'} if selected_tab == 'tab-map' else {'display': 'none'}
+    def handle_tabs(selected_tab):
+        map_style = {'display': 'block'} if selected_tab == 'tab-map' else {'display': 'none'}
+        charts_style = {'display': 'block'} if selected_tab == 'tab-charts' else {'display': 'none'}
         
-        # Загружаем данные
-        sport_data.load()
-        df = sport_data.get_objects()
-        full_df = sport_data.get_full_data()
-        
-        # Обработка контента для каждой вкладки
-        if selected_tab == 'tab-map':
-            # Фильтрация данных для карты
-            filtered_df = df.copy()
-            filtered_infra_df = full_df.copy()
+        # Фильтры карты и таблица видны только на вкладке карты
+        return [map_style, charts_style, map_style, map_style]
+    
+    if not client_filtering:
+        # Карта - пересчитывается только на видимой вкладке и только при смене фильтров или данных
+        @app.callback(
+            [Output('map-counts', 'children'),
+             Output('combined-map', 'figure'),
+             Output('map-rendered-key', 'data')],
+            [Input('main-tabs', 'value'),
+             Input('map-sport-filter', 'value'),
+             Input('map-infra-filter', 'value'),
+             Input('map-district-filter', 'value'),
+             Input('map-radius-filter', 'value'),
+             Input('map-access-layer', 'value'),
+             Input('combined-map', 'relayoutData')],
+            State('map-rendered-key', 'data')
+        )
+        def update_map(selected_tab, sport_filter, infra_filter, district_filter, radius, access, relayout_data,
+                       rendered_key):
+            if selected_tab != 'tab-map':
+                raise PreventUpdate
             
-            if sport_filter and sport_filter != 'all':
-                filtered_df = filtered_df[filtered_df['sport_object_type'] == sport_filter]
-                filtered_infra_df = filtered_infra_df[filtered_infra_df['sport_object_type'] == sport_filter]
+            # Загружаем данные
+            sport_data.load()
+            filters = filter_key(sport_filter, infra_filter, district_filter)
+            radius = normalize_radius(radius)
+            access = int(access) if access else None
             
-            if infra_filter and infra_filter != 'all':
-                filtered_infra_df = filtered_infra_df[filtered_infra_df['infrastructure_type'] == infra_filter]
+            # Кластеры пересчитываем только при переходе на другой целый уровень зума,
+            # а видимую область - когда карту сдвинули за пределы уже отправленной
+            zoom, bbox = map_view(relayout_data, rendered_key)
             
-            if district_filter and district_filter != 'all':
-                filtered_df = filtered_df[filtered_df['district'] == district_filter]
-                filtered_infra_df = filtered_infra_df[filtered_infra_df['district'] == district_filter]
+            # Ключ в JSON-виде, так его и вернет dcc.Store
+            map_key = {
+                'version': sport_data.version,
+                'filters': [list(values) if values else None for values in filters],
+                'radius': radius,
+                'zoom': zoom,
+                'bbox': bbox,
+                'access': access,
+            }
+            if rendered_key == map_key:
+                raise PreventUpdate
             
-            # Карта с маркерами
-            combined_map = create_combined_map_with_colors(filtered_df, filtered_infra_df)
+            # Фильтрация данных для карты (тот же закешированный результат, что и у таблицы) и карта видимой области
+            filtered, combined_map = render_map(sport_filter, infra_filter, district_filter, radius, zoom, bbox, access)
+            filtered_df = filtered.objects
+            filtered_infra_df = filtered.infra
+            record_rows('update_map', len(filtered_df) + len(filtered_infra_df))
             
-            content = html.Div([
-                html.H4("Карта спортивных объектов и инфраструктуры", className="mb-3"),
-                html.P([
-                    html.Span(f"Спортивных объектов: {len(filtered_df)}", className="mr-3"),
-                    html.Span(f" | Объектов инфраструктуры: {len(filtered_infra_df)}", className="mr-3"),
-                ], className="text-muted mb-2"),
-                dcc.Graph(
-                    figure=combined_map,
-                    style={'height': '500px', 'border': '1px solid #ddd', 'borderRadius': '5px'}
-                ),
-            ])
+            # Если в браузере уже есть карта той же версии данных, отправляем только изменившиеся трассы
+            if rendered_key and rendered_key.get('version') == sport_data.version:
+                previous = peek_figure(create_combined_map_with_colors, map_figure_key(rendered_key))
+                patch = figure_patch(previous, combined_map)
+                if patch is not None:
+                    combined_map = patch
             
-        elif selected_tab == 'tab-charts':
-            # Создаем аналитические графики
-            fig1 = create_chart_sport_type_distribution(df)
-            fig2 = create_chart_schedule_by_sport(df)
-            fig3 = create_chart_density_vs_objects(full_df)
-            fig4 = create_chart_salary_vs_objects(full_df)
-            fig5 = create_chart_infra_vs_objects(full_df)
-            fig6 = create_chart_gender_vs_objects(full_df)
+            counts = [
+                html.Span(f"Спортивных объектов: {len(filtered_df)}", className="mr-3"),
+                html.Span(f" | Объектов инфраструктуры: {len(filtered_infra_df)}", className="mr-3"),
+            ]
+            if access is not None:
+                counts.append(html.Span(underserved_text(sport_filter, district_filter, access), className="mr-3"))
             
-            content = html.Div([
-                html.H4("Аналитика данных", className="mb-4"),
-                
-                dbc.Row([
-                    dbc.Col(dcc.Graph(figure=fig1, style={'height': '400px'}), width=12),
-                ], className="mb-4"),
-                
-                dbc.Row([
-                    dbc.Col(dcc.Graph(figure=fig2, style={'height': '400px'}), width=12),
-                ], className="mb-4"),
-                
-                dbc.Row([
-                    dbc.Col(dcc.Graph(figure=fig3, style={'height': '400px'}), width=12),
-                ], className="mb-4"),
-                
-                dbc.Row([
-                    dbc.Col(dcc.Graph(figure=fig4, style={'height': '400px'}), width=12),
-                ], className="mb-4"),
-                
-                dbc.Row([
-                    dbc.Col(dcc.Graph(figure=fig5, style={'height': '400px'}), width=12),
-                ], className="mb-4"),
-                
-                dbc.Row([
-                    dbc.Col(dcc.Graph(figure=fig6, style={'height': '400px'}), width=12),
-                ]),
-            ])
+            return [counts, combined_map, map_key]
+    
+    # Графики аналитики - по callback'у на график, от фильтров карты не зависят
+    for chart_id, chart_function, get_data in ANALYTICS_CHARTS:
+        register_chart_callback(app, chart_id, chart_function, get_data)
+    
+    # Рейтинг обеспеченности районов - по своим фильтрам и выбранному показателю
+    @app.callback(
+        Output('chart-provision', 'figure'),
+        [Input('main-tabs', 'value'),
+         Input('provision-sport-filter', 'value'),
+         Input('provision-infra-filter', 'value'),
+         Input('provision-metric', 'value')],
+        State('charts-rendered-version', 'data')
+    )
+    def update_provision_chart(selected_tab, sport_filter, infra_filter, metric, rendered_version):
+        if selected_tab != 'tab-charts':
+            raise PreventUpdate
+        
+        sport_data.load()
         
-        else:
-            content = html.Div("Выберите вкладку для отображения данных")
+        # При возврате на вкладку график этой версии данных уже в браузере
+        if list(callback_context.triggered_prop_ids) == ['main-tabs.value'] and \
+                rendered_version is not None and rendered_version == sport_data.version:
+            raise PreventUpdate
         
-        return [content, filter_style, table_style]
-
-# Графики
+        return provision_chart(sport_filter, infra_filter, metric)
+    
+    # Запоминаем версию данных, для которой графики уже отправлены в браузер
+    @app.callback(
+        Output('charts-rendered-version', 'data'),
+        Input('main-tabs', 'value')
+    )
+    def mark_charts_rendered(selected_tab):
+        if selected_tab != 'tab-charts' or not sport_data.load():
+            raise PreventUpdate
+        return sport_data.version
 
-def create_combined_map_with_colors(sport_df, infra_df):
-    if sport_df.empty and infra_df.empty:
-        return create_empty_chart("Нет данных для карты")
+# Режим фильтрации на клиенте: сервер один раз отдает набор данных, остальное считает браузер
+# (функции namespace 'sport' в assets/client_filtering.js)
+def setup_client_filtering(app):
+    sport_data.reload_listeners.append(lambda previous, current: dataset_cache.clear())
     
-    fig = go.Figure()
+    # После перезагрузки данных браузер получит новый набор при следующем открытии страницы
+    @app.callback(
+        Output('client-dataset', 'data'),
+        Input('url', 'pathname')
+    )
+    def update_client_dataset(pathname):
+        if not sport_data.load():
+            raise PreventUpdate
+        return dataset_payload(sport_data, map_style)
     
-    # Маркеры
-    sport_colors = [
-        '#FF0000', '#00FF00', '#0000FF', '#FFFF00', '#FF00FF', '#00FFFF',
-        '#FF4500', '#32CD32', '#1E90FF', '#FFD700', '#DA70D6', '#00CED1',
-        '#FF6347', '#7CFC00', '#4169E1', '#FFA500', '#BA55D3', '#5F9EA0'
-    ]
+    filters = [Input('map-sport-filter', 'value'),
+               Input('map-infra-filter', 'value'),
+               Input('map-district-filter', 'value'),
+               Input('map-radius-filter', 'value')]
     
-    # Разные цвета для разных типов инфраструктуры - иначе сливается
-    infra_colors = {
-        'кафе': '#FF6B6B',           # Красный
-        'торговый_центр': '#4ECDC4',  # Бирюзовый
-        'супермаркет': '#FFD166',     # Желтый
-        'фитнес': '#06D6A0',         # Зеленый
-        'остановка': '#118AB2',       # Синий
-        'офис': '#EF476F',           # Розовый
-        'метро': '#073B4C',          # Темно-синий
-        'магазин': '#4361EE',        # Голубой
-        'ресторан': '#4CC9F0',       # Светло-голубой
+    # Таблица целиком уходит в DataTable, страницы, сортировка и фильтр по колонкам - встроенные
+    app.clientside_callback(
+        ClientsideFunction(namespace='sport', function_name='filterTable'),
+        Output('objects-table', 'data'),
+        filters + [Input('client-dataset', 'data')]
+    )
+    
+    app.clientside_callback(
+        ClientsideFunction(namespace='sport', function_name='renderMap'),
+        [Output('map-counts', 'children'),
+         Output('combined-map', 'figure')],
+        [Input('main-tabs', 'value')] + filters + [Input('client-dataset', 'data')]
+    )
+
+# Оформление карты для браузера: те же layout, цвета и заглушка, что у карты с сервера
+def map_style():
+    return {
+        'layout': json.loads(go.Figure(layout=map_layout()).to_json())['layout'],
+        'sport_colors': SPORT_COLORS,
+        'infra_colors': INFRA_COLORS,
+        'infra_default_color': INFRA_DEFAULT_COLOR,
+        'empty_figure': json.loads(create_empty_chart("Нет данных для карты").to_json()),
+        'table_text_limits': TABLE_TEXT_LIMITS,
+        'table_infra_limit': TABLE_INFRA_LIMIT,
     }
+
+# Отфильтрованные данные и карта с маркерами. На карту отправляем только видимую область bbox,
+# сериализованная фигура кешируется по фильтрам и области.
+# access - слой клеток, откуда до объекта выбранных видов спорта дальше access минут пешком (None - без слоя)
+def render_map(sport_filter, infra_filter, district_filter, radius, zoom, bbox, access=None):
+    filtered = sport_data.filter_data(sport_filter, infra_filter, district_filter, radius)
+    visible = sport_data.clip_to_bbox(filtered, bbox)
+    access_cells = None
+    if access is not None:
+        grid = sport_data.get_accessibility_grid(sport_filter)
+        access_cells = clip_cells(grid[~(grid['walk_minutes'] <= access)], bbox)
+    combined_map = cached_figure(
+        create_combined_map_with_colors,
+        filter_key(sport_filter, infra_filter, district_filter) + (radius, zoom, tuple(bbox or ()), access),
+        visible.objects, visible.infra, zoom, access_cells
+    )
+    return filtered, combined_map
+
+# Клетки сетки доступности внутри видимой области
+def clip_cells(cells, bbox):
+    if not bbox:
+        return cells
+    south, west, north, east = bbox
+    inside = cells['lat'].between(south, north) & cells['lon'].between(west, east)
+    return cells[inside]
+
+# Сколько жителей (выбранных районов) живет дальше access минут пешком от объекта выбранных видов спорта
+def underserved_text(sport_filter, district_filter, access):
+    summary = sport_data.get_underserved_population(sport_filter, access)
+    districts = normalize_filter(district_filter)
+    if districts:
+        summary = summary[summary['district'].isin(districts)]
+    population = summary['population'].sum()
+    underserved = summary['underserved_population'].sum()
+    share = underserved / population if population else 0.0
+    return f" | Жителей дальше {access} мин пешком: {underserved:,.0f} ({share:.0%})".replace(',', ' ')
+
+# Рейтинг обеспеченности: показатели по фильтрам из кеша загрузчика, фигура - из кеша фигур
+def provision_chart(sport_filter, infra_filter, metric):
+    metric = metric if metric in PROVISION_METRICS else PROVISION_DEFAULT_METRIC
+    metrics = sport_data.get_provision_metrics(sport_filter, infra_filter)
+    return cached_figure(create_chart_provision_ranking, filter_key(sport_filter, infra_filter) + (metric,),
+                         metrics, metric)
+
+# Прогрев кешей до того, как сервер объявит готовность: фильтрация и карта при фильтрах по умолчанию
+# (их же использует первая страница таблицы) и графики аналитики
+def warm_caches():
+    render_map(None, None, None, normalize_radius(RADIUS_MAX), MAP_ZOOM, None)
+    sport_data.get_accessibility_grid()
+    sport_data.get_access_distances()
+    for chart_id, chart_function, get_data in ANALYTICS_CHARTS:
+        cached_figure(chart_function, (), get_data())
+    provision_chart(None, None, PROVISION_DEFAULT_METRIC)
+
+# Ключ кеша фигуры карты по ключу отрисованной карты из dcc.Store (списки после JSON снова кортежи)
+def map_figure_key(rendered_key):
+    filters = tuple(tuple(values) if values else None for values in rendered_key['filters'])
+    return filters + (rendered_key['radius'], rendered_key['zoom'], tuple(rendered_key['bbox'] or ()),
+                      rendered_key.get('access'))
+
+# Вид карты из relayoutData (иначе последний отрисованный): целый уровень зума и видимая область.
+# Область расширяем до сетки с шагом в один тайл текущего зума, чтобы небольшие сдвиги не вызывали перерисовку
+def map_view(relayout_data, rendered_key):
+    zoom, bbox = MAP_ZOOM, None
+    if rendered_key:
+        zoom, bbox = rendered_key['zoom'], rendered_key['bbox']
+    
+    if not relayout_data:
+        return zoom, bbox
+    
+    if 'mapbox.zoom' in relayout_data:
+        zoom = int(relayout_data['mapbox.zoom'])
+    
+    corners = (relayout_data.get('mapbox._derived') or {}).get('coordinates')
+    if corners:
+        lons = [corner[0] for corner in corners]
+        lats = [corner[1] for corner in corners]
+        step = 360 / 2 ** zoom
+        bbox = [
+            round(math.floor(min(lats) / step) * step, 6),
+            round(math.floor(min(lons) / step) * step, 6),
+            round(math.ceil(max(lats) / step) * step, 6),
+            round(math.ceil(max(lons) / step) * step, 6),
+        ]
+    
+    return zoom, bbox
+
+# Отдельный callback для графика: строится при первом открытии вкладки аналитики
+def register_chart_callback(app, chart_id, chart_function, get_data):
     
-    # Добавляем спортивные объекты
-    if not sport_df.empty and 'sport_object_lat' in sport_df.columns:
-        sport_with_coords = sport_df.dropna(subset=['sport_object_lat', 'sport_object_lon'])
+    @app.callback(
+        Output(chart_id, 'figure'),
+        Input('main-tabs', 'value'),
+        State('charts-rendered-version', 'data')
+    )
+    def update_chart(selected_tab, rendered_version):
+        if selected_tab != 'tab-charts':
+            raise PreventUpdate
         
-        if not sport_with_coords.empty:
-            # Группируем по типам спорта для разных цветов
-            sport_types = sport_with_coords['sport_object_type'].unique()
-            
-            for i, sport_type in enumerate(sport_types[:8]):  # Ограничиваем 8 типами
-                type_data = sport_with_coords[sport_with_coords['sport_object_type'] == sport_type]
-                color = sport_colors[i % len(sport_colors)]
-                
-                fig.add_trace(go.Scattermapbox(
-                    lat=type_data['sport_object_lat'],
-                    lon=type_data['sport_object_lon'],
-                    mode='markers',
-                    marker=dict(size=12, color=color, opacity=0.9),
-                    name=f'{sport_type}',
-                    hovertext=type_data['sport_object_name'],
-                    hoverinfo='text'
-                ))
-    
-   # Добавляем инфраструктуру (разные цвета по типам инфраструктуры)
-    if not infra_df.empty and 'infrastructure_lat' in infra_df.columns:
-        infra_with_coords = infra_df.dropna(subset=['infrastructure_lat', 'infrastructure_lon'])
-    
-        if not infra_with_coords.empty:
-        # Группируем по типам инфраструктуры
-            infra_types = infra_with_coords['infrastructure_type'].unique()
+        sport_data.load()
         
-            for infra_type in infra_types:
-                type_data = infra_with_coords[infra_with_coords['infrastructure_type'] == infra_type]
-            
-            # Ограничиваем количество маркеров каждого типа для производительности
-                type_sample = type_data.head(50)
-            
-                if not type_sample.empty:
-                # Получаем цвет для данного типа инфраструктуры
-                    color = infra_colors.get(infra_type, '#808080')  # Серый по умолчанию
-                
-                fig.add_trace(go.Scattermapbox(
-                    lat=type_sample['infrastructure_lat'],
-                    lon=type_sample['infrastructure_lon'],
-                    mode='markers',
-                    marker=dict(size=8, color=color, opacity=0.7),
-                    name=infra_type,  # Убрали эмодзи из названия
-                    hovertext=type_sample['infrastructure_name'] + ' - ' + type_sample['infrastructure_type'],
-                    hoverinfo='text'
-                ))
+        # Графики этой версии данных уже в браузере - повторно не отправляем
+        if rendered_version is not None and rendered_version == sport_data.version:
+            raise PreventUpdate
+        
+        return cached_figure(chart_function, (), get_data())
 
-    # Настройки карты
-    fig.update_layout(
+# Колонки таблицы объектов и ограничения длины текста при показе
+TABLE_COLUMNS = ['Название', 'Тип спорта', 'Адрес', 'Район', 'Типы инфраструктуры']
+TABLE_TEXT_LIMITS = {'Название': 40, 'Адрес': 50}
+TABLE_INFRA_LIMIT = 60
+
+# Строки таблицы объектов - одним векторизованным проходом.
+# Значения полные: фильтр и сортировка работают по ним, обрезаем только отправляемую страницу
+# radius - в колонке типов только инфраструктура не дальше radius метров от объекта, как на карте
+def build_objects_table(objects_df, radius=None):
+    if objects_df.empty:
+        return pd.DataFrame(columns=TABLE_COLUMNS)
+    
+    def text(column, default):
+        if column not in objects_df.columns:
+            return pd.Series(default, index=objects_df.index)
+        return objects_df[column].astype(str)
+    
+    infra_types = sport_data.get_infrastructure_types_by_objects(objects_df['sport_object_id'].to_numpy(), radius=radius)
+    
+    return pd.DataFrame({
+        'Название': text('sport_object_name', 'Без названия'),
+        'Тип спорта': text('sport_object_type', 'Не указан'),
+        'Адрес': text('sport_object_address', 'Без адреса'),
+        'Район': text('district', 'Не указан'),
+        'Типы инфраструктуры': infra_types.to_numpy(),
+    }, index=objects_df.index)
+
+# Записи для DataTable с обрезанными длинными значениями
+def table_records(table_df):
+    page = table_df.copy()
+    for column, limit in TABLE_TEXT_LIMITS.items():
+        page[column] = page[column].str[:limit]
+    
+    infra_types = page['Типы инфраструктуры']
+    page['Типы инфраструктуры'] = np.where(
+        infra_types.str.len() > TABLE_INFRA_LIMIT, infra_types.str[:TABLE_INFRA_LIMIT] + '...', infra_types
+    )
+    return page.to_dict('records')
+
+# Графики
+
+# Значения для трасс карты: все категории колонки (не только оставшиеся после фильтра), иначе встречающиеся значения
+def trace_values(frame, column):
+    if column not in frame.columns:
+        return []
+    values = frame[column]
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return [str(value) for value in values.cat.categories]
+    return [str(value) for value in values.dropna().unique()]
+
+# Начальный вид карты
+MAP_CENTER = dict(lat=59.94, lon=30.31)
+MAP_ZOOM = 10
+
+# Маркеры (общие для карты с сервера и карты, которую строит браузер в режиме фильтрации на клиенте)
+SPORT_COLORS = [
+    '#FF0000', '#00FF00', '#0000FF', '#FFFF00', '#FF00FF', '#00FFFF',
+    '#FF4500', '#32CD32', '#1E90FF', '#FFD700', '#DA70D6', '#00CED1',
+    '#FF6347', '#7CFC00', '#4169E1', '#FFA500', '#BA55D3', '#5F9EA0'
+]
+
+# Разные цвета для разных типов инфраструктуры - иначе сливается
+INFRA_COLORS = {
+    'кафе': '#FF6B6B',           # Красный
+    'торговый_центр': '#4ECDC4',  # Бирюзовый
+    'супермаркет': '#FFD166',     # Желтый
+    'фитнес': '#06D6A0',         # Зеленый
+    'остановка': '#118AB2',       # Синий
+    'офис': '#EF476F',           # Розовый
+    'метро': '#073B4C',          # Темно-синий
+    'магазин': '#4361EE',        # Голубой
+    'ресторан': '#4CC9F0',       # Светло-голубой
+}
+INFRA_DEFAULT_COLOR = '#808080'  # Серый по умолчанию
+
+# Настройки карты
+def map_layout():
+    return dict(
         mapbox_style="open-street-map",
         mapbox=dict(
-            center=dict(lat=59.94, lon=30.31),
-            zoom=10
+            center=MAP_CENTER,
+            zoom=MAP_ZOOM
         ),
+        # Сохраняем масштаб и положение, выбранные пользователем, при обновлении данных
+        uirevision='combined-map',
         margin={"r": 0, "t": 0, "l": 0, "b": 0},
         height=500,
         showlegend=True,
@@ -324,8 +495,96 @@ def create_combined_map_with_colors(sport_df, infra_df):
             borderwidth=1
         )
     )
+
+def create_combined_map_with_colors(sport_df, infra_df, zoom=MAP_ZOOM, access_cells=None):
+    if sport_df.empty and infra_df.empty:
+        return create_empty_chart("Нет данных для карты")
+    
+    fig = go.Figure()
+    
+    # Слой пешей доступности - под маркерами: тепловая карта клеток вне доступности, вес - население клетки
+    if access_cells is not None:
+        fig.add_trace(go.Densitymapbox(
+            lat=access_cells['lat'].round(5),
+            lon=access_cells['lon'].round(5),
+            z=access_cells['population'].round(1),
+            radius=access_radius(zoom),
+            zmin=0,
+            colorscale='YlOrRd',
+            opacity=0.6,
+            name='Вне пешей доступности',
+            showscale=not access_cells.empty,
+            colorbar=dict(title='Жителей', thickness=12),
+            hoverinfo='skip'
+        ))
+    
+    # Набор трасс не зависит от фильтров: у каждого вида спорта и типа инфраструктуры своя трасса,
+    # отфильтрованные остаются пустыми и скрыты из легенды. Тогда смена фильтра меняет только данные трасс,
+    # и карту можно обновить частично (см. figure_patch)
+    
+    # Добавляем спортивные объекты
+    if 'sport_object_lat' in sport_df.columns:
+        sport_with_coords = sport_df.dropna(subset=['sport_object_lat', 'sport_object_lon'])
+        
+        # Группируем по типам спорта для разных цветов
+        for i, sport_type in enumerate(trace_values(sport_df, 'sport_object_type')):
+            type_data = sport_with_coords[sport_with_coords['sport_object_type'] == sport_type]
+            color = SPORT_COLORS[i % len(SPORT_COLORS)]
+            
+            # При большом числе точек объединяем соседние в кластеры под текущий зум
+            points = cluster_points(type_data, 'sport_object_lat', 'sport_object_lon',
+                                    type_data['sport_object_name'].astype(str), zoom)
+            
+            fig.add_trace(go.Scattermapbox(
+                lat=points['lat'],
+                lon=points['lon'],
+                mode='markers',
+                marker=dict(size=marker_sizes(points['count'], 12), color=color, opacity=0.9),
+                name=f'{sport_type}',
+                showlegend=not points.empty,
+                hovertext=points['label'],
+                hoverinfo='text'
+            ))
+    
+    # Добавляем инфраструктуру (разные цвета по типам инфраструктуры)
+    if 'infrastructure_lat' in infra_df.columns:
+        infra_with_coords = infra_df.dropna(subset=['infrastructure_lat', 'infrastructure_lon'])
+        
+        # Один и тот же объект инфраструктуры встречается рядом с несколькими кортами - рисуем один раз
+        if 'infrastructure_id' in infra_with_coords.columns:
+            infra_with_coords = infra_with_coords.drop_duplicates(subset=['infrastructure_id', 'infrastructure_type'])
+        
+        # Группируем по типам инфраструктуры
+        for infra_type in trace_values(infra_df, 'infrastructure_type'):
+            type_data = infra_with_coords[infra_with_coords['infrastructure_type'] == infra_type]
+            
+            # Получаем цвет для данного типа инфраструктуры
+            color = INFRA_COLORS.get(infra_type, INFRA_DEFAULT_COLOR)
+            
+            # Вместо обрезки до первых N точек - кластеры с количеством
+            points = cluster_points(type_data, 'infrastructure_lat', 'infrastructure_lon',
+                                    type_data['infrastructure_name'].astype(str) + ' - ' + str(infra_type), zoom)
+            
+            fig.add_trace(go.Scattermapbox(
+                lat=points['lat'],
+                lon=points['lon'],
+                mode='markers',
+                marker=dict(size=marker_sizes(points['count'], 8), color=color, opacity=0.7),
+                name=infra_type,  # Убрали эмодзи из названия
+                showlegend=not points.empty,
+                hovertext=points['label'],
+                hoverinfo='text'
+            ))
+
+    # Настройки карты
+    fig.update_layout(**map_layout())
     
     return fig
+# Радиус точки тепловой карты в пикселях - чуть больше клетки сетки доступности на текущем зуме
+def access_radius(zoom):
+    meters_per_pixel = 2 * math.pi * EARTH_RADIUS * math.cos(math.radians(MAP_CENTER['lat'])) / (256 * 2 ** zoom)
+    return max(int(round(ACCESS_CELL_SIZE * 1.5 / meters_per_pixel)), 2)
+
 # Количество объектов по видам спорта
 def create_chart_sport_type_distribution(df):
     if df.empty:
@@ -360,7 +619,7 @@ def create_chart_schedule_by_sport(df):
     if df.empty or 'schedule' not in df.columns:
         return create_empty_chart("Нет данных о графике работы")
     
-    schedule_data = df.groupby(['sport_object_type', 'schedule']).size().unstack(fill_value=0)
+    schedule_data = df.groupby(['sport_object_type', 'schedule'], observed=True).size().unstack(fill_value=0)
     
     fig = go.Figure()
     
@@ -393,26 +652,12 @@ def create_chart_schedule_by_sport(df):
     return fig
 
 # Плотность населения и количество спортивных объектов по районам
-def create_chart_density_vs_objects(df):
-    if df.empty or 'district' not in df.columns or 'Плотность_населения' not in df.columns:
+def create_chart_density_vs_objects(district_metrics):
+    if district_metrics.empty or 'Плотность_населения' not in district_metrics.columns:
         return create_empty_chart("Нет данных для анализа")
     
-    # Получаем данные по районам
-    district_stats = sport_data.get_district_statistics()
-    
-    if district_stats.empty:
-        return create_empty_chart("Нет данных о районах")
-    
-    # Считаем количество спортивных объектов по районам
-    sport_objects = sport_data.get_objects()
-    if sport_objects.empty or 'district' not in sport_objects.columns:
-        return create_empty_chart("Нет данных о спортивных объектах")
-    
-    object_counts = sport_objects.groupby('district').size().reset_index(name='sport_objects_count')
-    
-    # Объединяем с данными о плотности
-    merged_data = pd.merge(district_stats[['district', 'Плотность_населения']], 
-                          object_counts, on='district')
+    # Районы, где есть спортивные объекты
+    merged_data = district_metrics[district_metrics['sport_objects_count'] > 0]
     
     if merged_data.empty:
         return create_empty_chart("Нет данных для анализа")
@@ -461,26 +706,12 @@ def create_chart_density_vs_objects(df):
     return fig
 
 # Зарплата и количество спортивных объектов по районам
-def create_chart_salary_vs_objects(df):
-    if df.empty or 'district' not in df.columns or 'Зарплата' not in df.columns:
+def create_chart_salary_vs_objects(district_metrics):
+    if district_metrics.empty or 'Зарплата' not in district_metrics.columns:
         return create_empty_chart("Нет данных для анализа")
     
-    # Получаем данные по районам
-    district_stats = sport_data.get_district_statistics()
-    
-    if district_stats.empty:
-        return create_empty_chart("Нет данных о районах")
-    
-    # Считаем количество спортивных объектов по районам
-    sport_objects = sport_data.get_objects()
-    if sport_objects.empty or 'district' not in sport_objects.columns:
-        return create_empty_chart("Нет данных о спортивных объектах")
-    
-    object_counts = sport_objects.groupby('district').size().reset_index(name='sport_objects_count')
-    
-    # Объединяем с данными о зарплате
-    merged_data = pd.merge(district_stats[['district', 'Зарплата']], 
-                          object_counts, on='district')
+    # Районы, где есть спортивные объекты
+    merged_data = district_metrics[district_metrics['sport_objects_count'] > 0]
     
     if merged_data.empty:
         return create_empty_chart("Нет данных для анализа")
@@ -529,22 +760,14 @@ def create_chart_salary_vs_objects(df):
     return fig
 
 # Количество объектов инфраструктуры и спортивных объектов по районам
-def create_chart_infra_vs_objects(df):
-    if df.empty or 'district' not in df.columns:
+def create_chart_infra_vs_objects(district_metrics):
+    if district_metrics.empty:
         return create_empty_chart("Нет данных для анализа")
     
-    # Считаем количество инфраструктуры по районам
-    infra_counts = df.groupby('district').size().reset_index(name='infra_count')
-    
-    # Считаем количество спортивных объектов по районам
-    sport_objects = sport_data.get_objects()
-    if sport_objects.empty or 'district' not in sport_objects.columns:
-        return create_empty_chart("Нет данных о спортивных объектах")
-    
-    object_counts = sport_objects.groupby('district').size().reset_index(name='sport_objects_count')
-    
-    # Объединяем данные
-    merged_data = pd.merge(infra_counts, object_counts, on='district')
+    # Районы, где есть и спортивные объекты, и инфраструктура
+    merged_data = district_metrics[
+        (district_metrics['sport_objects_count'] > 0) & (district_metrics['infra_count'] > 0)
+    ]
     
     if merged_data.empty:
         return create_empty_chart("Нет данных для анализа")
@@ -581,32 +804,18 @@ def create_chart_infra_vs_objects(df):
     return fig
 
 # Соотношение мужчин/женщин и количество спортивных объектов по районам
-def create_chart_gender_vs_objects(df):
-    if df.empty or 'district' not in df.columns or 'Соотношение_М_Ж' not in df.columns:
+def create_chart_gender_vs_objects(district_metrics):
+    if district_metrics.empty or 'Соотношение_М_Ж' not in district_metrics.columns:
         return create_empty_chart("Нет данных для анализа")
     
-    # Получаем данные по районам
-    district_stats = sport_data.get_district_statistics()
-    
-    if district_stats.empty:
-        return create_empty_chart("Нет данных о районах")
-    
-    # Считаем количество спортивных объектов по районам
-    sport_objects = sport_data.get_objects()
-    if sport_objects.empty or 'district' not in sport_objects.columns:
-        return create_empty_chart("Нет данных о спортивных объектах")
-    
-    object_counts = sport_objects.groupby('district').size().reset_index(name='sport_objects_count')
-    
-    # Объединяем с данными о соотношении полов
-    merged_data = pd.merge(district_stats[['district', 'Соотношение_М_Ж']], 
-                          object_counts, on='district')
+    # Районы, где есть спортивные объекты
+    merged_data = district_metrics[district_metrics['sport_objects_count'] > 0]
     
     if merged_data.empty:
         return create_empty_chart("Нет данных для анализа")
     
     # Рассчитываем процент мужчин
-    merged_data['Процент_мужчин'] = merged_data['Соотношение_М_Ж'] * 100
+    merged_data = merged_data.assign(Процент_мужчин=merged_data['Соотношение_М_Ж'] * 100)
     
     # Сортируем по проценту мужчин
     merged_data = merged_data.sort_values('Процент_мужчин', ascending=False)
@@ -650,6 +859,43 @@ def create_chart_gender_vs_objects(df):
     
     return fig
 
+# Рейтинг районов по показателю обеспеченности, пунктир - среднее по районам
+def create_chart_provision_ranking(provision_metrics, metric=PROVISION_DEFAULT_METRIC):
+    if provision_metrics.empty or metric not in provision_metrics.columns:
+        return create_empty_chart("Нет данных для анализа")
+    
+    ranking = provision_metrics.dropna(subset=[metric]).sort_values(metric, ascending=False)
+    
+    if ranking.empty:
+        return create_empty_chart("Нет данных для анализа")
+    
+    fig = go.Figure()
+    
+    fig.add_trace(go.Bar(
+        x=ranking['district'],
+        y=ranking[metric],
+        name=PROVISION_METRICS[metric],
+        marker=dict(color=ranking[metric], colorscale='RdYlGn'),
+        text=ranking[metric],
+        textposition='auto'
+    ))
+    
+    average = ranking[metric].mean()
+    fig.add_hline(y=average, line_dash='dash', line_color='gray',
+                  annotation_text=f"Среднее: {average:.2f}", annotation_position='top right')
+    
+    fig.update_layout(
+        title=f"Рейтинг районов: {PROVISION_METRICS[metric].lower()}",
+        xaxis_title="Район",
+        yaxis_title=PROVISION_METRICS[metric],
+        height=450,
+        showlegend=False,
+        xaxis_tickangle=-45,
+        margin=dict(l=50, r=50, t=50, b=100)
+    )
+    
+    return fig
+
 def create_empty_chart(message):
     fig = go.Figure()
     fig.update_layout(
@@ -663,4 +909,14 @@ def create_empty_chart(message):
         }],
         margin=dict(l=50, r=50, t=50, b=50)
     )
-    return fig
\ No newline at end of file
+    return fig
+
+# Графики вкладки аналитики: id компонента (см. CHART_IDS в layouts), функция построения, источник данных
+ANALYTICS_CHARTS = [
+    ('chart-sport-types', create_chart_sport_type_distribution, sport_data.get_objects),
+    ('chart-schedule', create_chart_schedule_by_sport, sport_data.get_objects),
+    ('chart-density', create_chart_density_vs_objects, sport_data.get_district_metrics),
+    ('chart-salary', create_chart_salary_vs_objects, sport_data.get_district_metrics),
+    ('chart-infra', create_chart_infra_vs_objects, sport_data.get_district_metrics),
+    ('chart-gender', create_chart_gender_vs_objects, sport_data.get_district_metrics),
+]
\ No newline at end of file
@@ -0,0 +1,104 @@
+import argparse
+import random
+
+from aiohttp import web
+import numpy as np
+
+from geo import haversine
+
+# Локальная заглушка 2GIS Catalog API для проверки harvester.py без ключа и лимитов.
+# Отвечает на /3.0/items (поиск по q и по rubric_id + point + radius) и /3.0/items/byid
+# с пагинацией page/page_size и result.total, может имитировать сбои (--fail-rate).
+# Запуск:
+#   python catalog_stub.py --port 8080
+
+DISTRICTS = ['Адмиралтейский район', 'Выборгский район', 'Московский район', 'Невский район', 'Приморский район']
+
+class CatalogStub:
+
+    def __init__(self, objects_per_keyword=120, infrastructure=5000, fail_rate=0.0, seed=0):
+        rng = np.random.default_rng(seed)
+        self.fail_rate = fail_rate
+        self.requests = 0
+
+        self.objects = {}
+        for k, keyword in enumerate(['теннисный корт', 'сквош корт', 'падел']):
+            self.objects[keyword] = [
+                self._item(f'{7000000 + k * 10000 + i}', f'{keyword.capitalize()} {i}', rng)
+                for i in range(objects_per_keyword)
+            ]
+        self.by_id = {item['id']: item for items in self.objects.values() for item in items}
+
+        self.infra = [self._item(f'{9000000 + i}', f'Организация {i}', rng) for i in range(infrastructure)]
+        self.infra_lat = np.array([item['point']['lat'] for item in self.infra])
+        self.infra_lon = np.array([item['point']['lon'] for item in self.infra])
+        self.infra_rubric = rng.integers(0, 7, infrastructure)
+
+    @staticmethod
+    def _item(item_id, name, rng):
+        return {
+            'id': item_id,
+            'name': name,
+            'address_name': f'ул. Тестовая, {item_id[-3:]}',
+            'point': {'lat': float(59.85 + rng.random() * 0.2), 'lon': float(30.15 + rng.random() * 0.35)},
+            'adm_div': [
+                {'type': 'region', 'name': 'Санкт-Петербург'},
+                {'type': 'district_area', 'name': DISTRICTS[int(rng.integers(len(DISTRICTS)))]},
+            ],
+        }
+
+    @staticmethod
+    def _page(items, query):
+        page = int(query.get('page', 1))
+        page_size = int(query.get('page_size', 20))
+        start = (page - 1) * page_size
+        return web.json_response({
+            'meta': {'code': 200},
+            'result': {'total': len(items), 'items': items[start:start + page_size]},
+        })
+
+    async def items(self, request):
+        self.requests += 1
+        if random.random() < self.fail_rate:
+            return web.json_response({'meta': {'code': 503}}, status=503)
+
+        query = request.query
+        if 'q' in query:
+            return self._page(self.objects.get(query['q'], []), query)
+
+        # Поиск по рубрике в радиусе: рубрику определяет первый id из списка
+        lon, lat = (float(value) for value in query['point'].split(','))
+        radius = float(query.get('radius', 1000))
+        rubric = sum(int(r) for r in query['rubric_id'].split(',')) % 7
+        distances = haversine(lat, lon, self.infra_lat, self.infra_lon)
+        rows = np.flatnonzero((distances <= radius) & (self.infra_rubric == rubric))
+        rows = rows[np.argsort(distances[rows])]
+        return self._page([self.infra[row] for row in rows], query)
+
+    async def byid(self, request):
+        self.requests += 1
+        if random.random() < self.fail_rate:
+            return web.json_response({'meta': {'code': 503}}, status=503)
+
+        item = self.by_id.get(request.query.get('id'))
+        schedule = {'Mon': {'working_hours': [{'from': '00:00', 'to': '24:00'}]}}
+        items = [dict(item, schedule=schedule, rubrics=[{'name': 'Спортивный клуб'}])] if item else []
+        return web.json_response({'meta': {'code': 200}, 'result': {'total': len(items), 'items': items}})
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get('/3.0/items', self.items)
+        app.router.add_get('/3.0/items/byid', self.byid)
+        return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Заглушка 2GIS Catalog API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="доля ответов 503")
+    args = parser.parse_args()
+
+    web.run_app(CatalogStub(fail_rate=args.fail_rate).app(), host=args.host, port=args.port)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from cache import LRUCache
+
+# Режим фильтрации на клиенте: браузер один раз получает компактный набор данных в dcc.Store,
+# дальше фильтры, таблицу и карту пересчитывают clientside callback'и (assets/client_filtering.js).
+# Подходит для наборов масштаба города: карта строится из точек без серверной кластеризации
+
+# Координаты передаем целыми числами - смещение от минимальной точки в 1e-5 градуса (около метра)
+COORD_SCALE = 100000
+# Расстояния до инфраструктуры - в дециметрах
+DISTANCE_SCALE = 10
+
+# Набор данных кешируется по версии данных, как фигуры в figure_cache: уже приведенным к типам JSON
+# (dict и list) вместе с длиной JSON для бюджета кеша. Повторная отдача не собирает и не разбирает его заново -
+# остается только кодирование ответа в Dash. Значение общее для всех запросов - его не изменяем
+DATASET_CACHE_BYTES = 64 * 1024 * 1024
+dataset_cache = LRUCache(DATASET_CACHE_BYTES, sizeof=lambda entry: entry[1])
+
+# Значения как у astype(str) на сервере - таблица в обоих режимах выглядит одинаково
+def _text(frame, column, default):
+    if column not in frame.columns:
+        return [default] * len(frame)
+    return frame[column].astype(str).tolist()
+
+# Категории колонки и коды значений (-1 - пусто)
+def _codes(frame, column):
+    if column not in frame.columns:
+        return [], [-1] * len(frame)
+    values = frame[column]
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype('category')
+    return [str(value) for value in values.cat.categories], values.cat.codes.astype(int).tolist()
+
+# Целые значения с масштабом scale от origin; NaN -> None
+def _quantize(values, origin, scale):
+    values = np.asarray(values, dtype=np.float64)
+    quantized = np.round((values - origin) * scale)
+    return [None if np.isnan(value) else int(value) for value in quantized]
+
+def _origin(*columns):
+    values = np.concatenate([np.asarray(column, dtype=np.float64) for column in columns])
+    values = values[~np.isnan(values)]
+    return float(np.floor(values.min() * 100) / 100) if len(values) else 0.0
+
+def _coords(frame, lat_col, lon_col, lat0, lon0):
+    if lat_col not in frame.columns or lon_col not in frame.columns:
+        return [None] * len(frame), [None] * len(frame)
+    return _quantize(frame[lat_col], lat0, COORD_SCALE), _quantize(frame[lon_col], lon0, COORD_SCALE)
+
+# Колоночный набор данных: объекты, уникальная инфраструктура и связи между ними по позициям.
+# map_style() - оформление карты с сервера (layout, цвета, пустая фигура), чтобы браузер рисовал ту же карту
+def build_dataset(loader, map_style):
+    objects = loader.get_objects()
+    infrastructure = loader.model.infrastructure
+    links = loader.model.links
+
+    sport_types, sport_codes = _codes(objects, 'sport_object_type')
+    districts, district_codes = _codes(objects, 'district')
+    infra_types, infra_codes = _codes(infrastructure, 'infrastructure_type')
+
+    lat0 = _origin(objects.get('sport_object_lat', []), infrastructure.get('infrastructure_lat', []))
+    lon0 = _origin(objects.get('sport_object_lon', []), infrastructure.get('infrastructure_lon', []))
+    object_lat, object_lon = _coords(objects, 'sport_object_lat', 'sport_object_lon', lat0, lon0)
+    infra_lat, infra_lon = _coords(infrastructure, 'infrastructure_lat', 'infrastructure_lon', lat0, lon0)
+
+    return {
+        'version': loader.version,
+        'origin': [lat0, lon0],
+        'coord_scale': COORD_SCALE,
+        'distance_scale': DISTANCE_SCALE,
+        'max_distance': loader.max_link_distance,
+        'categories': {
+            'sport_types': sport_types,
+            'districts': districts,
+            'infra_types': infra_types,
+        },
+        'objects': {
+            'name': _text(objects, 'sport_object_name', 'Без названия'),
+            'address': _text(objects, 'sport_object_address', 'Без адреса'),
+            'type': sport_codes,
+            'district': district_codes,
+            'lat': object_lat,
+            'lon': object_lon,
+        },
+        'infra': {
+            'name': _text(infrastructure, 'infrastructure_name', ''),
+            'type': infra_codes,
+            'lat': infra_lat,
+            'lon': infra_lon,
+        },
+        'links': {
+            'object': links['object_key'].astype(int).tolist(),
+            'infra': links['infra_key'].astype(int).tolist(),
+            'distance': _quantize(loader.link_distances, 0.0, DISTANCE_SCALE),
+        },
+        'map': map_style(),
+    }
+
+# Набор данных для текущей версии (из кеша или собранный заново)
+def dataset_payload(loader, map_style):
+    key = loader.version
+    entry = dataset_cache.get(key)
+    if entry is None:
+        payload_json = json.dumps(build_dataset(loader, map_style), ensure_ascii=False)
+        entry = (json.loads(payload_json), len(payload_json.encode('utf-8')))
+        dataset_cache.put(key, entry)
+    return entry[0]
@@ -1,69 +1,578 @@
 import pandas as pd
+import numpy as np
+from collections import namedtuple
+import hashlib
+import pickle
 import os
+import threading
+import time
+
+from accessibility import accessibility_grid, city_cells, nearest_distances, underserved_population
+from cache import LRUCache
+from data_model import DataModel, build_model, link_view, lookup, object_view
+from filter_index import build_indexes, intersect_rows, resolve_filters
+from geo import haversine
+from schema import DISTRICT_COLUMNS, read_csv, required_columns
+from spatial_index import GridIndex
+
+# Версия формата снимка - увеличиваем при изменении структуры сохраняемых данных
+SNAPSHOT_FORMAT = 8
+
+# CSV читаем чанками по столько строк - пиковая память ограничена размером чанка в типах по умолчанию
+LOAD_CHUNKSIZE = 100000
+
+# Колонки фильтров - храним как категории и строим по ним инвертированные индексы
+OBJECT_FILTER_COLUMNS = ['sport_object_type', 'district']
+INFRA_FILTER_COLUMNS = ['sport_object_type', 'district', 'infrastructure_type']
+
+# Колонки связей в результате фильтрации: карте нужны инфраструктура и расстояния, а не вся широкая строка
+INFRA_RESULT_COLUMNS = ['sport_object_id', 'sport_object_type', 'district', 'infrastructure_type',
+                        'infrastructure_name', 'infrastructure_address', 'infrastructure_lat', 'infrastructure_lon',
+                        'infrastructure_id', 'distance_meters']
+
+# Бюджет памяти под закешированные результаты фильтрации
+FILTER_CACHE_BYTES = 64 * 1024 * 1024
+
+# После неудачной загрузки следующая попытка - не раньше чем через столько секунд
+LOAD_RETRY_SECONDS = 30
+
+# Результат фильтрации:
+#   objects - объекты по виду спорта и району (для карты)
+#   table_objects - то же, но только объекты с выбранным типом инфраструктуры (для таблицы)
+#   infra - строки инфраструктуры по всем трем фильтрам
+FilterResult = namedtuple('FilterResult', ['objects', 'table_objects', 'infra'])
+
+# Значения фильтра приводим к кортежу: None/'all' - без фильтра, строка или список - набор значений
+def normalize_filter(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = [value]
+    values = tuple(sorted({str(v) for v in value if v not in (None, '', 'all')}))
+    return values or None
+
+# Радиус пешей доступности в метрах; None - без ограничения
+def normalize_radius(value):
+    if value in (None, '', 'all'):
+        return None
+    return float(value)
+
+# Загруженная версия данных - все производное от одного CSV. Подменяется целиком одним присваиванием,
+# поэтому при перезагрузке никто не увидит модель новой версии с индексами старой:
+#   source - размер, время изменения и хеш CSV
+#   memory - память при загрузке: исходные чанки, сжатая таблица и итоговая модель, байты
+#   model - нормализованная модель: объекты, инфраструктура, связи и районы (см. data_model.py)
+#   df - объекты вместе с характеристиками районов - представление для графиков и таблицы
+#   object_link_rows, object_link_bounds - связи каждого объекта: позиции в links, отсортированные по объекту,
+#       и границы групп по object_key
+#   object_infra_types - типы инфраструктуры объекта одной строкой
+#   object_index, infra_index - инвертированные индексы фильтров для объектов и связей
+#   infra_object_pos - позиция объекта в df для каждой связи
+#   district_metrics - сводная таблица показателей по районам
+#   object_spatial, infra_spatial - пространственные индексы по координатам объектов и уникальной инфраструктуры
+#   link_distances, max_link_distance - расстояние объект-инфраструктура для каждой связи, пересчитанное по координатам
+#   version - версия данных (начало хеша CSV), ключ всех кешей
+LoadedData = namedtuple('LoadedData', [
+    'source', 'memory', 'model', 'df', 'object_link_rows', 'object_link_bounds', 'object_infra_types',
+    'object_index', 'infra_index', 'infra_object_pos', 'district_metrics', 'object_spatial', 'infra_spatial',
+    'link_distances', 'max_link_distance', 'version',
+])
+
+EMPTY_DATA = LoadedData(
+    source=None,
+    memory={},
+    model=None,
+    df=None,
+    object_link_rows=np.empty(0, dtype=np.int32),
+    object_link_bounds=np.zeros(1, dtype=np.int64),
+    object_infra_types=pd.Series(dtype=object),
+    object_index={},
+    infra_index={},
+    infra_object_pos=np.empty(0, dtype=np.int32),
+    district_metrics=pd.DataFrame(),
+    object_spatial=GridIndex([], []),
+    infra_spatial=GridIndex([], []),
+    link_distances=np.empty(0, dtype=np.float32),
+    max_link_distance=0.0,
+    version=None,
+)
+
+def _frames_nbytes(result):
+    # Series - новые склеенные строки (типы инфраструктуры объектов), их считаем целиком
+    if isinstance(result, pd.Series):
+        return int(result.memory_usage(index=True, deep=True))
+    # Строки в object-колонках общие с исходной таблицей, поэтому считаем без deep
+    frames = (result,) if isinstance(result, pd.DataFrame) else result
+    return sum(int(frame.memory_usage(index=True).sum()) for frame in frames)
+
+# Показатели обеспеченности из количеств по районам: на 100 тыс. жителей и инфраструктура на спортивный объект
+def _provision_ratios(metrics):
+    metrics['infrastructure_per_sport_object'] = (
+        metrics['infrastructure_count'] / metrics['sport_objects_count'].replace(0, np.nan)
+    ).round(2)
+    
+    if 'Население' in metrics.columns:
+        population = metrics['Население'].replace(0, np.nan)
+        metrics['sport_objects_per_100k'] = (metrics['sport_objects_count'] / population * 100000).round(2)
+        metrics['infrastructure_per_100k'] = (metrics['infrastructure_count'] / population * 100000).round(2)
+    return metrics
+
+# Число уникальных значений values в каждой группе groups (0..count-1) - через уникальные пары группа-значение.
+# Отрицательные группы и значения (нет района, пропуск) не считаются
+def _unique_per_group(groups, values, count):
+    valid = (groups >= 0) & (values >= 0)
+    width = int(values.max()) + 1 if valid.any() else 1
+    pairs = np.unique(groups[valid].astype(np.int64) * width + values[valid])
+    return np.bincount(pairs // width, minlength=count)
 
 class SportDataLoader:
     
-    def __init__(self, filename='sport_objects_final_full_data.csv'):
+    def __init__(self, filename='sport_objects_final_full_data.csv', snapshot_filename=None,
+                 accessors=None, chunksize=LOAD_CHUNKSIZE):
         self.filename = filename
-        self.df = None  
-        self.full_df = None 
+        # Бинарный снимок рядом с CSV, чтобы не парсить CSV при каждом старте
+        self.snapshot_filename = snapshot_filename or filename + '.snapshot.pkl'
+        # Читаем только колонки, нужные перечисленным методам (None - всем), см. schema.py
+        self.columns = required_columns(accessors)
+        self.chunksize = chunksize
+        # Текущая версия данных (см. LoadedData); поля читаются как атрибуты загрузчика
+        self._data = EMPTY_DATA
+        # Версия, закрепленная за потоком на время запроса
+        self._pinned = threading.local()
+        self.filter_cache = LRUCache(FILTER_CACHE_BYTES, sizeof=_frames_nbytes)
         self.loaded = False
-        
+        # Загрузка и перезагрузка выполняются одним потоком, остальные ждут ее результата
+        self._load_lock = threading.Lock()
+        # Ошибка последней неудачной загрузки и ее время (для паузы перед повтором)
+        self.load_error = None
+        self.load_failed_at = None
+        # Функции, которые вызываются после подмены версии данных (сброс кешей по версии и т.п.)
+        self.reload_listeners = []
+    
+    # model, df, индексы и прочие поля LoadedData - из версии, закрепленной за потоком, иначе из текущей
+    def __getattr__(self, name):
+        if name in LoadedData._fields and '_data' in self.__dict__:
+            pinned = getattr(self._pinned, 'data', None)
+            return getattr(pinned if pinned is not None else self._data, name)
+        raise AttributeError(name)
+    
+    # Загрузка один раз на процесс: потоки, пришедшие во время загрузки, ждут ее и получают общий результат.
+    # После неудачи повтор не раньше чем через LOAD_RETRY_SECONDS, чтобы каждый запрос не перечитывал CSV.
+    # Каждый callback начинается с load(), поэтому здесь же закрепляем за потоком текущую версию данных:
+    # запрос, начатый до перезагрузки, дочитывает старую версию, даже если новую подменили посреди запроса
     def load(self):
-        if self.loaded:
-            return True
-            
-        try:            
-            if not os.path.exists(self.filename):
+        if not self.loaded:
+            with self._load_lock:
+                if not self.loaded:
+                    if self.load_failed_at is not None and time.monotonic() - self.load_failed_at < LOAD_RETRY_SECONDS:
+                        return False
+                    self._swap(self._read_data())
+        
+        self._pinned.data = self._data
+        return self.loaded
+    
+    # Снять закрепление версии с потока - в конце запроса или фоновой задачи
+    def release(self):
+        self._pinned.data = None
+    
+    # Перезагрузка, если CSV изменился (force - в любом случае): новая версия собирается в вызывающем
+    # (фоновом) потоке, пока запросы обслуживаются старой, и подменяется целиком. True - версия подменена
+    def reload(self, force=False):
+        with self._load_lock:
+            if not force and self.loaded and self.source_changed() is None:
                 return False
+            data = self._read_data()
+            if data is None:
+                return False
+            self._swap(data)
+        
+        self._pinned.data = self._data
+        return True
+    
+    # Размер и время изменения CSV, если он изменился с момента загрузки текущей версии, иначе None
+    def source_changed(self):
+        if not os.path.exists(self.filename):
+            return None
+        source = self._data.source or {}
+        signature = self._source_signature()
+        if (source.get('size'), source.get('mtime')) == (signature['size'], signature['mtime']):
+            return None
+        return signature
+    
+    # Подмена версии данных; None - загрузка не удалась, текущая версия остается
+    def _swap(self, data):
+        if data is None:
+            self.load_failed_at = time.monotonic()
+            return
+        
+        previous = self._data
+        self._data = data
+        self.loaded = True
+        self.load_failed_at = None
+        if previous.version != data.version:
+            # Результаты фильтрации старой версии больше не понадобятся
+            self.filter_cache.clear()
+            for listener in self.reload_listeners:
+                listener(previous.version, data.version)
+    
+    # Версия данных из снимка (или CSV, если снимок устарел); None - загрузить не удалось
+    def _read_data(self):
+        try:
+            if not os.path.exists(self.filename):
+                self.load_error = f"Файл не найден: {self.filename}"
+                return None
             
-            # Загружаем файл
-            self.full_df = pd.read_csv(self.filename, encoding='utf-8')
-            
-            # Уникальные спортивные объекты
-            if 'sport_object_id' in self.full_df.columns:
-                # Группируем по ID объекта и берем первую строку для каждого - так как есть дублирование по object_id
-                grouped = self.full_df.groupby('sport_object_id').first().reset_index()
-                self.df = grouped
-            else:
-                self.df = self.full_df.drop_duplicates()
+            signature = self._source_signature()
             
-            self.loaded = True
-            return True
+            # Сначала пробуем готовый снимок, CSV читаем только если он изменился
+            snapshot = self._read_snapshot(signature)
+            if snapshot is None:
+                snapshot = self._build_snapshot(signature)
+                self._write_snapshot(snapshot)
             
+            model = DataModel(**snapshot['model'])
+            df = object_view(model)
+            object_link_rows, object_link_bounds = snapshot['object_links']
+            link_distances = model.links['distance'].to_numpy()
+            known = link_distances[~np.isnan(link_distances)]
+            self.load_error = None
+            return LoadedData(
+                source=snapshot['source'],
+                memory=dict(snapshot.get('read_memory', {}), model_bytes=self._model_nbytes(model, df)),
+                model=model,
+                df=df,
+                object_link_rows=object_link_rows,
+                object_link_bounds=object_link_bounds,
+                object_infra_types=snapshot['object_infra_types'],
+                object_index=snapshot['object_index'],
+                infra_index=snapshot['infra_index'],
+                infra_object_pos=model.links['object_key'].to_numpy(),
+                district_metrics=snapshot['district_metrics'],
+                object_spatial=snapshot['object_spatial'],
+                infra_spatial=snapshot['infra_spatial'],
+                link_distances=link_distances,
+                max_link_distance=float(known.max()) if len(known) else 0.0,
+                version=snapshot['source']['sha1'][:12],
+            )
+        
         except Exception as e:
             import traceback
             traceback.print_exc()
-            return False
+            self.load_error = f"{type(e).__name__}: {e}"
+            return None
+    
+    # Размер и время изменения исходного CSV - быстрая проверка без чтения файла
+    def _source_signature(self):
+        stat = os.stat(self.filename)
+        return {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+    
+    # Хеш содержимого CSV - на случай, если файл перезаписали без изменений
+    def _source_hash(self):
+        digest = hashlib.sha1()
+        with open(self.filename, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    # Парсим CSV и собираем снимок
+    def _build_snapshot(self, signature):
+        source = dict(signature, sha1=self._source_hash())
+        
+        # Загружаем только нужные колонки в компактных типах и раскладываем по сущностям
+        # (объекты, инфраструктура, связи, районы)
+        full_df, read_memory = read_csv(self.filename, self.columns, self.chunksize)
+        model = build_model(full_df)
+        del full_df
+        df = object_view(model)
+        
+        # Колонки связей, нужные индексам и агрегатам, - узкое представление вместо полной широкой таблицы
+        links = link_view(model, df, columns=['sport_object_id', 'infrastructure_id'] + INFRA_FILTER_COLUMNS + DISTRICT_COLUMNS)
+        model.links['distance'] = self._build_link_distances(model, df)
+        
+        return {
+            'source': source,
+            'read_memory': read_memory,
+            # Модель сохраняем словарем, чтобы снимок не зависел от определения namedtuple
+            'model': model._asdict(),
+            'object_links': self._build_object_links(model),
+            'object_infra_types': self._build_object_infra_types(links),
+            'object_index': build_indexes(df, OBJECT_FILTER_COLUMNS),
+            'infra_index': build_indexes(links, INFRA_FILTER_COLUMNS),
+            'district_metrics': self._build_district_metrics(links, df),
+            'object_spatial': self._build_spatial_index(df, 'sport_object_lat', 'sport_object_lon'),
+            'infra_spatial': self._build_spatial_index(model.infrastructure, 'infrastructure_lat', 'infrastructure_lon'),
+        }
+    
+    # Расстояния для всех пар объект-инфраструктура одним векторным проходом
+    def _build_link_distances(self, model, df):
+        object_coords = ['sport_object_lat', 'sport_object_lon']
+        infra_coords = ['infrastructure_lat', 'infrastructure_lon']
+        if not all(col in df.columns for col in object_coords) or \
+                not all(col in model.infrastructure.columns for col in infra_coords):
+            # Без координат берем расстояния, посчитанные при сборе данных
+            distances = model.links.get('distance_meters', pd.Series(np.nan, index=model.links.index))
+            return pd.to_numeric(distances, errors='coerce').to_numpy(dtype=np.float32)
+        
+        objects = lookup(df[object_coords], model.links['object_key'].to_numpy())
+        infra = lookup(model.infrastructure[infra_coords], model.links['infra_key'].to_numpy())
+        return haversine(*(objects[col] for col in object_coords), *(infra[col] for col in infra_coords)).astype(np.float32)
+    
+    def _build_spatial_index(self, frame, lat_col, lon_col):
+        if lat_col not in frame.columns or lon_col not in frame.columns:
+            return GridIndex([], [])
+        return GridIndex(frame[lat_col], frame[lon_col])
+    
+    # Показатели по районам одной агрегацией: количества объектов и инфраструктуры, характеристики и нормированные значения
+    def _build_district_metrics(self, links, df):
+        if 'district' not in links.columns:
+            return pd.DataFrame()
+        
+        district_cols = [col for col in DISTRICT_COLUMNS if col in links.columns]
+        rows = links.dropna(subset=['district'])
+        metrics = rows[['district'] + district_cols].drop_duplicates(subset=['district']).set_index('district')
+        
+        objects_by_district = df.groupby('district', observed=True)
+        infra_by_district = rows.groupby('district', observed=True)
+        metrics['sport_objects_count'] = objects_by_district.size()
+        if 'sport_object_type' in df.columns:
+            metrics['sport_types_count'] = objects_by_district['sport_object_type'].nunique()
+        # infra_count - строки связей объект-инфраструктура, infrastructure_count - уникальные объекты инфраструктуры
+        metrics['infra_count'] = infra_by_district.size()
+        if 'infrastructure_id' in rows.columns:
+            metrics['infrastructure_count'] = infra_by_district['infrastructure_id'].nunique()
+        else:
+            metrics['infrastructure_count'] = metrics['infra_count']
+        
+        counts = {'sport_objects_count': int, 'infra_count': int, 'infrastructure_count': int}
+        metrics = _provision_ratios(metrics.fillna(dict.fromkeys(counts, 0)).astype(counts))
+        
+        metrics.index = metrics.index.astype(str)
+        return metrics.reset_index()
+    
+    # Связи, сгруппированные по объекту: позиции в links по возрастанию object_key и границы групп
+    def _build_object_links(self, model):
+        object_key = model.links['object_key'].to_numpy()
+        rows = np.argsort(object_key, kind='stable').astype(np.int32)
+        bounds = np.searchsorted(object_key[rows], np.arange(len(model.objects) + 1))
+        return rows, bounds
+    
+    # Отсортированный список типов инфраструктуры каждого объекта одной строкой
+    def _build_object_infra_types(self, links):
+        if 'sport_object_id' not in links.columns or 'infrastructure_type' not in links.columns:
+            return pd.Series(dtype=object)
+        
+        # Уникальные пары объект-тип, отсортированные по типу, склеиваем одной агрегацией
+        pairs = links[['sport_object_id', 'infrastructure_type']].dropna().drop_duplicates()
+        pairs = pairs.assign(infrastructure_type=pairs['infrastructure_type'].astype(str))
+        pairs = pairs.sort_values('infrastructure_type', kind='stable')
+        return pairs.groupby('sport_object_id', sort=False)['infrastructure_type'].agg(', '.join)
+    
+    # Читаем снимок, если он соответствует текущему CSV, иначе None
+    def _read_snapshot(self, signature):
+        if not os.path.exists(self.snapshot_filename):
+            return None
+        
+        try:
+            with open(self.snapshot_filename, 'rb') as f:
+                # Заголовок лежит отдельно от данных, чтобы проверить актуальность без загрузки таблиц
+                header = pickle.load(f)
+                if header.get('format') != SNAPSHOT_FORMAT or header.get('columns') != self.columns:
+                    return None
+                
+                source = header['source']
+                touched = source['mtime'] != signature['mtime']
+                if source['size'] != signature['size']:
+                    return None
+                if touched and source['sha1'] != self._source_hash():
+                    return None
+                
+                snapshot = pickle.load(f)
+        except Exception:
+            # Битый или несовместимый снимок просто пересобираем
+            return None
+        
+        snapshot['source'] = dict(source, mtime=signature['mtime'])
+        if touched:
+            # Содержимое то же - обновляем время, чтобы в следующий раз не считать хеш
+            self._write_snapshot(snapshot)
+        return snapshot
+    
+    # Сохраняем снимок атомарно: пишем во временный файл и подменяем
+    def _write_snapshot(self, snapshot):
+        header = {'format': SNAPSHOT_FORMAT, 'source': snapshot['source'], 'columns': self.columns}
+        payload = {key: value for key, value in snapshot.items() if key != 'source'}
+        # Временный файл свой у каждого процесса: воркеры могут пересобирать снимок одновременно
+        tmp_filename = f'{self.snapshot_filename}.{os.getpid()}.tmp'
+        
+        try:
+            with open(tmp_filename, 'wb') as f:
+                pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_filename, self.snapshot_filename)
+        except OSError:
+            # Нет прав на запись рядом с CSV - работаем без снимка
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+    
+    def _model_nbytes(self, model, df):
+        frames = [df] + [frame for frame in model[:4]]
+        return sum(int(frame.memory_usage(index=True, deep=True).sum()) for frame in frames)
+    
+    # Отчет о памяти: сколько заняли бы прочитанные колонки в типах по умолчанию и сколько занимают теперь
+    def memory_report(self):
+        megabytes = lambda value: f"{value / 2 ** 20:8.1f} МБ"
+        lines = []
+        if 'raw_bytes' in self.memory:
+            lines += [
+                f"{'CSV, типы по умолчанию':<28} {megabytes(self.memory['raw_bytes'])}",
+                f"{'наибольший чанк':<28} {megabytes(self.memory['peak_chunk_bytes'])}",
+                f"{'CSV, компактные типы':<28} {megabytes(self.memory['compact_bytes'])}",
+            ]
+        if 'model_bytes' in self.memory:
+            lines.append(f"{'модель и представления':<28} {megabytes(self.memory['model_bytes'])}")
+        return '\n'.join(lines)
     
     # df с уникальными объектами
     def get_objects(self):
         return self.df if self.df is not None else pd.DataFrame()
     
-    # df со всеми записями
+    # df со всеми записями - широкое представление связей, собирается по запросу
     def get_full_data(self):
-        return self.full_df if self.full_df is not None else pd.DataFrame()
+        return self._links(None) if self.model is not None else pd.DataFrame()
+    
+    # Строки связей rows (None - все) в колонках исходного CSV
+    def _links(self, rows, columns=None):
+        return link_view(self.model, self.df, rows, columns)
     
     # инфра для конкретного объекта
     def get_infrastructure_by_object(self, object_id):
-        if self.full_df is None:
+        if self.model is None or 'sport_object_id' not in self.df.columns:
+            return []
+        
+        # Связи объекта берем из индекса, без прохода по всей таблице
+        object_key = pd.Index(self.df['sport_object_id']).get_indexer([object_id])[0]
+        if object_key < 0:
             return []
+        rows = self.object_link_rows[self.object_link_bounds[object_key]:self.object_link_bounds[object_key + 1]]
+        infra_rows = self._links(rows, ['infrastructure_type', 'infrastructure_name', 'infrastructure_address',
+                                        'distance_meters'])
         
-        # Фильтруем строки для данного объекта
-        infra_rows = self.full_df[self.full_df['sport_object_id'] == object_id]
+        def column(name, default):
+            if name in infra_rows.columns:
+                return infra_rows[name].tolist()
+            return [default] * len(infra_rows)
         
         # Возвращаем список с инфраструктурой
-        result = []
-        for _, row in infra_rows.iterrows():
-            infra_item = {
-                'type': str(row.get('infrastructure_type', 'Неизвестно')),
-                'name': str(row.get('infrastructure_name', 'Без названия')),
-                'address': str(row.get('infrastructure_address', 'Без адреса')),
-                'distance': row.get('distance_meters', 0)
-            }
-            result.append(infra_item)
+        return [
+            {'type': str(infra_type), 'name': str(name), 'address': str(address), 'distance': distance}
+            for infra_type, name, address, distance in zip(
+                column('infrastructure_type', 'Неизвестно'),
+                column('infrastructure_name', 'Без названия'),
+                column('infrastructure_address', 'Без адреса'),
+                column('distance_meters', 0)
+            )
+        ]
+    
+    # Типы инфраструктуры для набора объектов одной строкой (выровнено по переданным id).
+    # С радиусом - только инфраструктура не дальше radius метров от объекта (кешируется по радиусу)
+    def get_infrastructure_types_by_objects(self, object_ids, empty='Нет инфраструктуры', radius=None):
+        object_ids = pd.Series(object_ids)
+        radius = self._link_radius(radius)
+        types = self.object_infra_types
+        if radius is not None:
+            types = self.filter_cache.get_or_create(('infra_types', self.version, radius),
+                                                    lambda: self._object_infra_types_within(radius))
+        return object_ids.map(types).fillna(empty)
+    
+    def _object_infra_types_within(self, radius):
+        rows = np.flatnonzero(self.link_distances <= radius)
+        return self._build_object_infra_types(self._links(rows, ['sport_object_id', 'infrastructure_type']))
+    
+    # Радиус больше любого расстояния ничего не отсекает - None, чтобы делить кеш с запросом без радиуса
+    def _link_radius(self, radius):
+        radius = normalize_radius(radius)
+        if radius is not None and radius >= self.max_link_distance:
+            return None
+        return radius
+    
+    # Отфильтрованные объекты и инфраструктура - общий результат для таблицы и карты
+    # radius - максимальное расстояние от объекта до инфраструктуры, метры
+    def filter_data(self, sport_filter=None, infra_filter=None, district_filter=None, radius=None):
+        key = (
+            self.version,
+            normalize_filter(sport_filter),
+            normalize_filter(infra_filter),
+            normalize_filter(district_filter),
+            self._link_radius(radius),
+        )
+        return self.filter_cache.get_or_create(key, lambda: self._filter(*key[1:]))
+    
+    # Фильтры разрешаются через индексы: объединение позиций по значениям и пересечение по колонкам
+    def _filter(self, sports, infras, districts, radius=None):
+        object_rows = resolve_filters(self.object_index, {
+            'sport_object_type': sports,
+            'district': districts,
+        })
+        infra_rows = resolve_filters(self.infra_index, {
+            'sport_object_type': sports,
+            'district': districts,
+            'infrastructure_type': infras,
+        })
         
-        return result
+        if radius is not None:
+            # Сравнение по всему массиву расстояний - один векторный проход
+            infra_rows = intersect_rows([infra_rows, np.flatnonzero(self.link_distances <= radius).astype(np.int32)])
+        
+        table_rows = object_rows
+        if infras or radius is not None:
+            # В таблице оставляем только объекты, у которых есть инфраструктура выбранного типа в пределах радиуса
+            with_infra = np.unique(self.infra_object_pos[infra_rows])
+            table_rows = with_infra[with_infra >= 0] if object_rows is None else \
+                np.intersect1d(object_rows, with_infra, assume_unique=True)
+        
+        return FilterResult(
+            self._take(self.get_objects(), object_rows),
+            self._take(self.get_objects(), table_rows),
+            self._links(infra_rows, INFRA_RESULT_COLUMNS),
+        )
+    
+    @staticmethod
+    def _take(frame, rows):
+        return frame if rows is None else frame.iloc[rows]
+    
+    # Объекты в прямоугольнике координат (видимая область карты)
+    def get_objects_in_bbox(self, south, west, north, east):
+        return self.get_objects().iloc[self.object_spatial.query_bbox(south, west, north, east)]
+    
+    # Связи с инфраструктурой, которая попадает в прямоугольник координат
+    def get_infrastructure_in_bbox(self, south, west, north, east):
+        infra_keys = self.infra_spatial.query_bbox(south, west, north, east)
+        return self._links(np.flatnonzero(np.isin(self.model.links['infra_key'].to_numpy(), infra_keys)))
+    
+    # Объекты в радиусе radius метров от точки, с расстоянием до нее
+    def get_objects_within_radius(self, lat, lon, radius):
+        rows, distances = self.object_spatial.query_radius(lat, lon, radius)
+        return self.get_objects().iloc[rows].assign(distance_to_point=distances)
+    
+    # Инфраструктура в радиусе radius метров от точки, каждый объект инфраструктуры один раз
+    def get_infrastructure_within_radius(self, lat, lon, radius):
+        rows, distances = self.infra_spatial.query_radius(lat, lon, radius)
+        return self.model.infrastructure.iloc[rows].assign(distance_to_point=distances)
+    
+    # Оставляем в результате фильтрации только то, что попадает в прямоугольник (south, west, north, east).
+    # Индекс объектов - позиции в df, индекс связей - позиции в links; инфраструктуру проверяем по infra_key
+    def clip_to_bbox(self, result, bbox):
+        if bbox is None:
+            return result
+        
+        object_rows = self.object_spatial.query_bbox(*bbox)
+        infra_keys = self.infra_spatial.query_bbox(*bbox)
+        link_infra = self.model.links['infra_key'].to_numpy()[result.infra.index.to_numpy()]
+        return FilterResult(
+            result.objects[np.isin(result.objects.index, object_rows)],
+            result.table_objects[np.isin(result.table_objects.index, object_rows)],
+            result.infra[np.isin(link_infra, infra_keys)],
+        )
     
     # Получить список типов спорта с количеством объектов
     def get_sport_types_with_counts(self):
@@ -93,8 +602,8 @@ class SportDataLoader:
     
     # Cписок уникальных типов инфраструктуры
     def get_infrastructure_types(self):
-        if self.full_df is not None and 'infrastructure_type' in self.full_df.columns:
-            types = self.full_df['infrastructure_type'].dropna().unique().tolist()
+        if self.model is not None and 'infrastructure_type' in self.model.infrastructure.columns:
+            types = self.model.infrastructure['infrastructure_type'].dropna().unique().tolist()
             return sorted([str(t) for t in types])
         return []
     
@@ -110,31 +619,120 @@ class SportDataLoader:
         
         return stats
     
+    # Сводные показатели по районам (считаются один раз при загрузке)
+    def get_district_metrics(self):
+        return self.district_metrics
+    
     # Cтатистикf по районам для анализа гипотез
     def get_district_statistics(self):
-        if self.full_df is None or self.full_df.empty:
+        if self.district_metrics.empty:
             return pd.DataFrame()
         
-        # Список колонок для анализа
-        district_cols = []
+        district_cols = ['district'] + [col for col in DISTRICT_COLUMNS if col in self.district_metrics.columns]
+        return self.district_metrics[district_cols]
+    
+    def get_cluster_analysis_data(self):
+        return self.get_district_statistics()
+    
+    # Обеспеченность районов с учетом фильтров: спортивные объекты выбранных видов спорта,
+    # инфраструктура выбранных типов у этих объектов. Кешируется по фильтрам вместе с результатами filter_data
+    def get_provision_metrics(self, sport_filter=None, infra_filter=None):
+        key = ('provision', self.version, normalize_filter(sport_filter), normalize_filter(infra_filter))
+        return self.filter_cache.get_or_create(key, lambda: self._provision_metrics(*key[2:]))
+    
+    # Все показатели одним проходом по кодам: строки берем из индексов фильтров,
+    # количества и уникальные значения по районам считаем через bincount
+    def _provision_metrics(self, sports, infras):
+        if self.model is None or self.model.districts.empty:
+            return pd.DataFrame()
         
-        # Проверяем наличие каждой колонки
-        possible_cols = ['district', 'Плотность_населения', 'Зарплата', 
-                        'Население', 'Соотношение_М_Ж', 'Кластер', 'Тип_кластера_района']
+        objects = self.model.objects
+        districts = self.model.districts
+        count = len(districts)
+        object_district = objects['district'].cat.codes.to_numpy()
         
-        for col in possible_cols:
-            if col in self.full_df.columns:
-                district_cols.append(col)
+        object_rows = resolve_filters(self.object_index, {'sport_object_type': sports})
+        infra_rows = resolve_filters(self.infra_index, {'sport_object_type': sports, 'infrastructure_type': infras})
+        if object_rows is None:
+            object_rows = np.arange(len(objects))
+        if infra_rows is None:
+            infra_rows = np.arange(len(self.model.links))
         
-        if len(district_cols) < 1:  # Нужен хотя бы district
-            return pd.DataFrame()
+        metrics = districts[['district'] + [col for col in ['Население'] if col in districts.columns]].copy()
         
-        # Берем только нужные колонки и удаляем дубликаты по районам
-        district_stats = self.full_df[district_cols].drop_duplicates(subset=['district'])
+        rows_district = object_district[object_rows]
+        metrics['sport_objects_count'] = np.bincount(rows_district[rows_district >= 0], minlength=count)
+        if 'sport_object_type' in objects.columns:
+            sport_codes = objects['sport_object_type'].cat.codes.to_numpy()[object_rows]
+            metrics['sport_types_count'] = _unique_per_group(rows_district, sport_codes, count)
         
-        return district_stats
+        # Район связи - район ее объекта; инфраструктуру считаем по уникальным infrastructure_id
+        object_keys = self.infra_object_pos[infra_rows]
+        link_district = np.where(object_keys >= 0, object_district[object_keys], -1)
+        infra_keys = self.model.links['infra_key'].to_numpy()[infra_rows]
+        if 'infrastructure_id' in self.model.infrastructure.columns:
+            infra_ids, _ = pd.factorize(self.model.infrastructure['infrastructure_id'])
+            infra_keys = np.where(infra_keys >= 0, infra_ids[infra_keys], -1)
+        metrics['infrastructure_count'] = _unique_per_group(link_district, infra_keys, count)
+        
+        metrics = _provision_ratios(metrics)
+        metrics['district'] = metrics['district'].astype(str)
+        return metrics.reset_index(drop=True)
     
-    def get_cluster_analysis_data(self):
-        return self.get_district_statistics()
+    # Сетка пешей доступности (см. accessibility.py): клетки города с районом, населением,
+    # расстоянием до ближайшего объекта выбранных видов спорта и временем пешком. Кешируется по фильтру
+    def get_accessibility_grid(self, sport_filter=None):
+        key = ('accessibility', self.version, normalize_filter(sport_filter))
+        return self.filter_cache.get_or_create(key, lambda: self._accessibility_grid(key[2]))
+    
+    # Население районов дальше minutes минут пешком от объектов выбранных видов спорта и его доля
+    def get_underserved_population(self, sport_filter=None, minutes=15):
+        return underserved_population(self.get_accessibility_grid(sport_filter), minutes)
+    
+    # Расстояния от клеток города до ближайшего объекта каждого вида спорта (колонка на вид) - считаются
+    # один раз на версию данных и прогреваются вместе с кешами, фильтр по видам спорта берет из них минимум
+    def get_access_distances(self):
+        return self.filter_cache.get_or_create(('access_distances', self.version), self._access_distances)
+    
+    def _accessibility_grid(self, sports):
+        cells = self._city_cells_cached()
+        if cells.empty:
+            return cells.assign(distance=np.empty(0), walk_minutes=np.empty(0))
+        
+        objects = self.get_objects()
+        if sports is None or 'sport_object_type' not in self.object_index:
+            distance = nearest_distances(cells, objects['sport_object_lat'], objects['sport_object_lon'])
+        else:
+            by_type = self.get_access_distances()
+            columns = [by_type[sport].to_numpy() for sport in sports if sport in by_type.columns]
+            distance = np.fmin.reduce(np.vstack(columns), axis=0) if columns else np.full(len(cells), np.nan)
+        return accessibility_grid(cells, distance)
+    
+    def _access_distances(self):
+        cells = self._city_cells_cached()
+        index = self.object_index.get('sport_object_type')
+        if cells.empty or index is None:
+            return pd.DataFrame(index=cells.index)
+        
+        objects = self.get_objects()
+        lat, lon = objects['sport_object_lat'].to_numpy(), objects['sport_object_lon'].to_numpy()
+        return pd.DataFrame({sport: nearest_distances(cells, lat[rows], lon[rows]) for sport, rows in index.rows.items()},
+                            index=cells.index)
+    
+    def _city_cells_cached(self):
+        return self.filter_cache.get_or_create(('city_cells', self.version), self._city_cells)
+    
+    # Клетки города с районом и населением - общие для всех фильтров версии данных
+    def _city_cells(self):
+        districts = self.model.districts if self.model is not None else pd.DataFrame()
+        if districts.empty or 'district' not in self.model.objects.columns:
+            return pd.DataFrame(columns=['lat', 'lon', 'district', 'population'])
+        
+        population = districts['Население'].fillna(0).to_numpy() if 'Население' in districts.columns \
+            else np.zeros(len(districts))
+        objects = self.get_objects()
+        return city_cells(objects['sport_object_lat'], objects['sport_object_lon'],
+                          self.model.objects['district'].cat.codes.to_numpy(),
+                          districts['district'].astype(str), population)
 
 sport_data = SportDataLoader()
\ No newline at end of file
@@ -0,0 +1,145 @@
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+# Нормализованная модель данных вместо широкой таблицы, где каждая строка - связь объект-инфраструктура
+# со всеми колонками объекта и района:
+#   objects - спортивные объекты, ключ - позиция строки (порядок по sport_object_id)
+#   infrastructure - уникальные объекты инфраструктуры, ключ - позиция строки
+#   links - связи: object_key, infra_key, расстояния; порядок строк как в исходном CSV
+#   districts - характеристики районов, ключ - код категории district у объектов
+#   columns - порядок колонок исходного CSV для широких представлений
+DataModel = namedtuple('DataModel', ['objects', 'infrastructure', 'links', 'districts', 'columns'])
+
+OBJECT_ID = 'sport_object_id'
+OBJECT_PREFIX = 'sport_object_'
+INFRA_PREFIX = 'infrastructure_'
+
+# Характеристики объекта без общего префикса
+OBJECT_COLUMNS = ['schedule', 'district']
+
+# Колонки, которые относятся к паре объект-инфраструктура
+LINK_COLUMNS = ['distance_meters', 'distance_kilometers', 'walk_time_minutes']
+
+# Колонки, которые храним категориями
+CATEGORY_COLUMNS = ['sport_object_type', 'infrastructure_type']
+
+# Колонка зависит только от key, если внутри каждой группы у нее не больше одного значения
+def _depends_on(frame, key, columns):
+    if not columns:
+        return []
+    counts = frame.groupby(key, observed=True, dropna=True)[columns].nunique(dropna=False)
+    return [column for column in columns if (counts[column] <= 1).all()]
+
+# Раскладываем колонки широкой таблицы по сущностям.
+# Все, что не подошло под объект или район, остается в связях - так ничего не теряется
+def split_columns(full_df):
+    infra_cols = [col for col in full_df.columns if col.startswith(INFRA_PREFIX)]
+    link_cols = [col for col in full_df.columns if col in LINK_COLUMNS]
+    object_cols = [col for col in full_df.columns
+                   if col.startswith(OBJECT_PREFIX) or col in OBJECT_COLUMNS]
+    other_cols = [col for col in full_df.columns
+                  if col not in infra_cols and col not in link_cols and col not in object_cols]
+
+    district_cols = []
+    if 'district' in full_df.columns:
+        # Колонки кластеров районов: одно значение на район и пусто у строк без района
+        without_district = full_df['district'].isna()
+        district_cols = [col for col in _depends_on(full_df, 'district', other_cols)
+                         if not full_df.loc[without_district, col].notna().any()]
+
+    if OBJECT_ID in full_df.columns:
+        candidates = object_cols + [col for col in other_cols if col not in district_cols]
+        object_cols = [col for col in _depends_on(full_df, OBJECT_ID, candidates) if col != OBJECT_ID]
+        object_cols = [OBJECT_ID] + object_cols
+    link_cols = [col for col in full_df.columns
+                 if col not in infra_cols and col not in object_cols and col not in district_cols]
+
+    return object_cols, infra_cols, link_cols, district_cols
+
+# Номер группы для каждой строки и позиции первых строк групп (в порядке первого появления)
+def _factorize_rows(frame):
+    if frame.columns.empty:
+        return np.full(len(frame), -1, dtype=np.int32), np.empty(0, dtype=np.int64)
+    codes = frame.groupby(list(frame.columns), observed=True, dropna=False, sort=False).ngroup().to_numpy()
+    _, first = np.unique(codes, return_index=True)
+    return codes.astype(np.int32), first
+
+def build_model(full_df):
+    object_cols, infra_cols, link_cols, district_cols = split_columns(full_df)
+
+    # Объекты - по sport_object_id в порядке сортировки, как раньше давал groupby
+    if OBJECT_ID in full_df.columns:
+        object_key, _ = pd.factorize(full_df[OBJECT_ID], sort=True)
+        valid = object_key >= 0
+        objects = full_df.loc[valid, object_cols].groupby(object_key[valid]).first()
+    else:
+        object_key, first = _factorize_rows(full_df[object_cols])
+        objects = full_df[object_cols].iloc[first]
+    objects = objects.reset_index(drop=True)
+
+    infra_key, first = _factorize_rows(full_df[infra_cols])
+    infrastructure = full_df[infra_cols].iloc[first].reset_index(drop=True)
+
+    # Районы по алфавиту - так же упорядочены категории district
+    if 'district' in full_df.columns:
+        districts = full_df[['district'] + district_cols].dropna(subset=['district'])
+        districts = districts.drop_duplicates(subset=['district']).sort_values('district')
+        districts = districts.reset_index(drop=True)
+        objects['district'] = pd.Categorical(objects['district'], categories=districts['district'])
+    else:
+        districts = pd.DataFrame()
+
+    for frame in (objects, infrastructure):
+        for column in CATEGORY_COLUMNS:
+            if column in frame.columns:
+                frame[column] = frame[column].astype('category')
+
+    links = pd.DataFrame({'object_key': object_key.astype(np.int32), 'infra_key': infra_key})
+    for column in link_cols:
+        links[column] = full_df[column].to_numpy()
+
+    return DataModel(objects, infrastructure, links, districts, list(full_df.columns))
+
+# Строки frame по ключам; ключ -1 (нет сущности) дает пустую строку
+def lookup(frame, keys, index=None):
+    keys = np.asarray(keys)
+    rows = frame.reindex(keys) if (keys < 0).any() else frame.take(keys)
+    rows.index = index if index is not None else pd.RangeIndex(len(keys))
+    return rows
+
+# Объекты вместе с характеристиками своего района
+def object_view(model):
+    objects = model.objects
+    district_cols = [col for col in model.districts.columns if col != 'district']
+    if district_cols:
+        codes = objects['district'].cat.codes.to_numpy()
+        objects = pd.concat([objects, lookup(model.districts[district_cols], codes, objects.index)], axis=1)
+    return objects[[col for col in model.columns if col in objects.columns]]
+
+# Широкое представление связей rows (None - все) в колонках исходного CSV.
+# Индекс - позиции строк в links, как был индекс у полной таблицы
+def link_view(model, objects, rows=None, columns=None):
+    links = model.links if rows is None else model.links.iloc[rows]
+    columns = model.columns if columns is None else columns
+
+    object_cols = [col for col in columns if col in objects.columns]
+    infra_cols = [col for col in columns if col in model.infrastructure.columns]
+    link_cols = [col for col in columns if col in links.columns]
+
+    view = pd.concat([
+        lookup(objects[object_cols], links['object_key'].to_numpy(), links.index),
+        lookup(model.infrastructure[infra_cols], links['infra_key'].to_numpy(), links.index),
+        links[link_cols],
+    ], axis=1)
+    return view[[col for col in columns if col in view.columns]]
+
+# Память по таблицам модели, байты
+def memory_usage(model):
+    frames = {
+        'objects': model.objects,
+        'infrastructure': model.infrastructure,
+        'links': model.links,
+        'districts': model.districts,
+    }
+    return {name: int(frame.memory_usage(index=True, deep=True).sum()) for name, frame in frames.items()}
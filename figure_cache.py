@@ -0,0 +1,63 @@
+import json
+
+from dash import Patch, no_update
+
+from cache import LRUCache
+from data_loader import sport_data, normalize_filter
+
+# Бюджет памяти под фигуры, по длине их JSON
+FIGURE_CACHE_BYTES = 32 * 1024 * 1024
+
+# Фигуры храним уже разобранными из JSON plotly - обычными dict и list, вместе с длиной JSON для бюджета кеша.
+# Повторный показ не строит фигуру, не прогоняет ее через сериализатор plotly и не разбирает JSON заново:
+# Dash только кодирует готовый dict в ответ. Значения из кеша общие для всех запросов - их не изменяем
+figure_cache = LRUCache(FIGURE_CACHE_BYTES, sizeof=lambda entry: entry[1])
+
+# Фигуры прежней версии данных после перезагрузки не понадобятся
+sport_data.reload_listeners.append(lambda previous, current: figure_cache.clear())
+
+# Ключ фильтров для кеша: нормализованные значения в том же виде, что и в кеше фильтрации
+def filter_key(*filters):
+    return tuple(normalize_filter(value) for value in filters)
+
+# Фигура из кеша по (функция графика, фильтры, версия данных) или построенная chart_function(*args)
+def cached_figure(chart_function, filters, *args):
+    key = (chart_function.__name__, filters, sport_data.version)
+
+    entry = figure_cache.get(key)
+    if entry is None:
+        figure_json = chart_function(*args).to_json()
+        entry = (json.loads(figure_json), len(figure_json.encode('utf-8')))
+        figure_cache.put(key, entry)
+
+    return entry[0]
+
+# Закешированная фигура без построения; None - ее нет в кеше (вытеснена или версия данных другая)
+def peek_figure(chart_function, filters):
+    entry = figure_cache.get((chart_function.__name__, filters, sport_data.version))
+    return entry[0] if entry is not None else None
+
+# Частичное обновление уже отрисованной фигуры previous до current: только изменившиеся поля трасс.
+# Если поменялся layout или набор трасс - None, фигуру нужно отправить целиком
+def figure_patch(previous, current):
+    if previous is None or previous.get('layout') != current.get('layout'):
+        return None
+
+    old_traces, new_traces = previous.get('data', []), current.get('data', [])
+    if [(trace.get('type'), trace.get('name')) for trace in old_traces] != \
+            [(trace.get('type'), trace.get('name')) for trace in new_traces]:
+        return None
+
+    patch = Patch()
+    changed = False
+    for i, (old, new) in enumerate(zip(old_traces, new_traces)):
+        if old == new:
+            continue
+        if set(old) != set(new):
+            return None
+        for field, value in new.items():
+            if old[field] != value:
+                patch['data'][i][field] = value
+                changed = True
+
+    return patch if changed else no_update
@@ -0,0 +1,59 @@
+from functools import reduce
+import numpy as np
+import pandas as pd
+
+EMPTY_ROWS = np.empty(0, dtype=np.int32)
+
+# Инвертированный индекс по категориальной колонке: значение -> отсортированный массив позиций строк
+class InvertedIndex:
+
+    def __init__(self, values):
+        values = pd.Series(values)
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy()
+            categories = values.cat.categories
+        else:
+            codes, categories = pd.factorize(values, sort=True)
+
+        # Стабильная сортировка по коду - внутри каждого значения позиции остаются по возрастанию
+        order = np.argsort(codes, kind='stable').astype(np.int32)
+        bounds = np.searchsorted(codes[order], np.arange(len(categories) + 1))
+
+        self.size = len(values)
+        self.rows = {
+            str(category): order[bounds[code]:bounds[code + 1]]
+            for code, category in enumerate(categories)
+        }
+
+    def values(self):
+        return list(self.rows.keys())
+
+    # Позиции строк, у которых значение входит в набор (объединение для мультивыбора)
+    def lookup(self, values):
+        arrays = [self.rows[value] for value in values if value in self.rows]
+        if not arrays:
+            return EMPTY_ROWS
+        if len(arrays) == 1:
+            return arrays[0]
+        # Значения разные, поэтому массивы не пересекаются - достаточно слить и отсортировать
+        return np.sort(np.concatenate(arrays))
+
+# Пересечение отсортированных массивов позиций; None - фильтров нет, подходят все строки
+def intersect_rows(arrays):
+    arrays = [rows for rows in arrays if rows is not None]
+    if not arrays:
+        return None
+    arrays.sort(key=len)
+    return reduce(lambda left, right: np.intersect1d(left, right, assume_unique=True), arrays)
+
+# Индексы по набору колонок таблицы
+def build_indexes(frame, columns):
+    return {column: InvertedIndex(frame[column]) for column in columns if column in frame.columns}
+
+# Применяем фильтры {колонка: кортеж значений} к индексам; None - фильтров нет
+def resolve_filters(indexes, filters):
+    return intersect_rows([
+        indexes[column].lookup(values)
+        for column, values in filters.items()
+        if values and column in indexes
+    ])
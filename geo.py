@@ -0,0 +1,29 @@
+import numpy as np
+
+# Радиус Земли в метрах (как в расчете расстояний при сборе данных)
+EARTH_RADIUS = 6371000
+
+# Скорость пешехода, м/мин: 1.4 м/с, как в расчете walk_time_minutes при сборе данных
+WALK_SPEED = 1.4 * 60
+
+# Расстояние по формуле гаверсинуса для массивов координат, метры
+def haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(value, dtype=np.float64)) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+# Локальная равнопромежуточная проекция в метры относительно опорной широты - для сеток в пределах города
+def project(lat, lon, lat0):
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    x = np.radians(lon) * EARTH_RADIUS * np.cos(np.radians(lat0))
+    y = np.radians(lat) * EARTH_RADIUS
+    return x, y
+
+# Обратное преобразование локальной проекции в широту и долготу
+def unproject(x, y, lat0):
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    lat = np.degrees(y / EARTH_RADIUS)
+    lon = np.degrees(x / (EARTH_RADIUS * np.cos(np.radians(lat0))))
+    return lat, lon
@@ -0,0 +1,29 @@
+import gc
+import multiprocessing
+import os
+
+# Настройки gunicorn для wsgi.py; запуск: gunicorn wsgi:server (файл подхватывается из текущего каталога).
+# Число воркеров и потоков - переменные окружения WEB_WORKERS и WEB_THREADS
+
+bind = os.environ.get('WEB_BIND', '0.0.0.0:8050')
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Приложение и данные загружаются в мастере один раз, воркеры получают их через fork
+preload_app = True
+
+# Первая загрузка без готового снимка читает CSV - даем воркерам время на медленный первый запрос
+timeout = int(os.environ.get('WEB_TIMEOUT', 120))
+
+# Загруженные данные переносим в постоянное поколение сборщика мусора: иначе его проходы в воркерах
+# пишут в заголовки объектов и копируют общие с мастером страницы
+def when_ready(server):
+    gc.freeze()
+
+# Каждый воркер сам перезагружает данные: по запросам POST /reload, принятым любым воркером (файл запросов),
+# и, если задан RELOAD_INTERVAL (секунды), при изменении CSV. Новая версия уже не общая с мастером -
+# у каждого воркера своя копия
+def post_fork(server, worker):
+    from app import start_reload_watcher
+    start_reload_watcher(float(os.environ.get('RELOAD_INTERVAL', 0)))
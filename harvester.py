@@ -0,0 +1,452 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+
+import aiohttp
+import pandas as pd
+
+from geo import WALK_SPEED, haversine
+from tiles import TILE_SIZE, link_infrastructure, plan_tiles
+
+# Асинхронный сбор данных из 2GIS Catalog API (замена последовательных запросов из ноутбука 2_Main_DataLoader_objects).
+# Прогресс сохраняется в каталог чекпоинтов, прерванный запуск продолжается с того же места.
+# Запуск:
+#   python harvester.py --api-key KEY --output all_sport_objects_with_infrastructure.csv
+# Локальная проверка на заглушке API (см. catalog_stub.py):
+#   python harvester.py --api-key test --api-url http://127.0.0.1:8080/3.0/items
+# Инфраструктура по умолчанию запрашивается по тайлам (см. tiles.py), ответы API кешируются на диске.
+
+API_URL = 'https://catalog.api.2gis.com/3.0/items'
+REGION_ID = 38  # ID Санкт-Петербурга
+
+KEYWORDS = [
+    "теннисный корт",
+    "сквош корт",
+    "падел",
+]
+
+# Рубрики инфраструктуры и радиус поиска вокруг объекта, метры
+INFRASTRUCTURE_RUBRICS = {
+    'метро': {'rubric_id': '535', 'radius': 1000},
+    'кафе': {'rubric_id': '161,165,162,112658,538,164', 'radius': 1000},
+    'торговый_центр': {'rubric_id': '19499,611,110346', 'radius': 1000},
+    'супермаркет': {'rubric_id': '350,9777,12127,112647', 'radius': 1000},
+    'фитнес': {'rubric_id': '268,643,267,20228,110427', 'radius': 1000},
+    'остановка': {'rubric_id': '10792,113080,11081,422,416,9505,420,113081', 'radius': 1000},
+    'офис': {'rubric_id': '492,13796', 'radius': 1000},
+}
+
+OBJECT_FIELDS = ['items.point', 'items.address', 'items.adm_div', 'items.address_name',
+                 'items.full_address_name', 'items.rubrics', 'items.name_ex', 'items.caption', 'items.region_id']
+DETAIL_FIELDS = ['items.contacts', 'items.contact_groups', 'items.schedule', 'items.rubrics',
+                 'items.description', 'items.adm_div']
+INFRA_FIELDS = ['items.point', 'items.address', 'items.rubrics']
+
+PAGE_SIZE = 50
+CONCURRENCY = 8
+RATE = 10  # запросов в секунду
+RETRIES = 5
+TIMEOUT = 30
+CHECKPOINT_DIR = 'harvest_state'
+CACHE_DIR = 'harvest_cache'
+CACHE_TTL = 7 * 24 * 3600  # секунды
+OUTPUT_FILENAME = 'all_sport_objects_with_infrastructure.csv'
+
+# Ответы, после которых имеет смысл повторить запрос
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class HarvestError(Exception):
+    pass
+
+# Ограничение частоты запросов: rate токенов в секунду, не больше capacity подряд
+class TokenBucket:
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+# Чекпоинты: по JSONL-файлу на этап, строка - завершенная единица работы
+class Checkpoint:
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, stage):
+        return os.path.join(self.directory, f'{stage}.jsonl')
+
+    def load(self, stage):
+        done = {}
+        if not os.path.exists(self._path(stage)):
+            return done
+        with open(self._path(stage), encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Недописанная строка после аварийного завершения
+                    continue
+                done[record['key']] = record['value']
+        return done
+
+    def save(self, stage, key, value):
+        with open(self._path(stage), 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'key': key, 'value': value}, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+# Кеш ответов API на диске: файл на запрос, ключ - хеш URL и параметров без ключа API
+class ResponseCache:
+
+    def __init__(self, directory, ttl=CACHE_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self.hits = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url, params):
+        params = {name: value for name, value in params.items() if name != 'key'}
+        digest = hashlib.sha1(json.dumps([url, params], sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + '.json')
+
+    def get(self, url, params):
+        path = self._path(url, params)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, encoding='utf-8') as f:
+                response = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self.hits += 1
+        return response
+
+    def put(self, url, params, response):
+        path = self._path(url, params)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(response, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+class Harvester:
+
+    def __init__(self, api_key, api_url=API_URL, region_id=REGION_ID, concurrency=CONCURRENCY,
+                 rate=RATE, retries=RETRIES, checkpoint_dir=CHECKPOINT_DIR,
+                 cache_dir=CACHE_DIR, cache_ttl=CACHE_TTL, tiled=True, tile_size=TILE_SIZE):
+        self.api_key = api_key
+        self.api_url = api_url
+        self.region_id = region_id
+        self.concurrency = concurrency
+        self.retries = retries
+        self.bucket = TokenBucket(rate)
+        self.checkpoint = Checkpoint(checkpoint_dir)
+        self.cache = ResponseCache(cache_dir, cache_ttl) if cache_dir else None
+        self.tiled = tiled
+        self.tile_size = tile_size
+        self.requests = 0
+        self.session = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def __aenter__(self):
+        # Один пул соединений на весь сбор
+        connector = aiohttp.TCPConnector(limit=self.concurrency, ttl_dns_cache=300)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=TIMEOUT))
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    # GET с ограничением частоты и повторами с экспоненциальной задержкой
+    async def fetch(self, params, url=None):
+        url = url or self.api_url
+        if self.cache is not None:
+            cached = self.cache.get(url, params)
+            if cached is not None:
+                return cached
+
+        response = await self._fetch(url, dict(params, key=self.api_key))
+        # Ответы с ошибкой и о превышении лимита (meta.code не 200) не кешируем - иначе они повторялись бы при каждом запуске
+        if self.cache is not None and response.get('meta', {}).get('code') == 200:
+            self.cache.put(url, params, response)
+        return response
+
+    async def _fetch(self, url, params):
+
+        for attempt in range(self.retries + 1):
+            await self.bucket.acquire()
+            async with self._semaphore:
+                self.requests += 1
+                try:
+                    async with self.session.get(url, params=params) as response:
+                        if response.status == 200:
+                            return await response.json(content_type=None)
+                        if response.status not in RETRY_STATUSES:
+                            raise HarvestError(f"HTTP {response.status} для {params}")
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    if attempt == self.retries:
+                        raise
+
+            if attempt < self.retries:
+                await asyncio.sleep(min(2 ** attempt, 30) * (0.5 + random.random()))
+
+        raise HarvestError(f"Не удалось получить ответ после {self.retries + 1} попыток: {params}")
+
+    # Все страницы выдачи: первая страница дает result.total, остальные запрашиваются параллельно
+    async def fetch_all(self, params):
+        first = await self.fetch(dict(params, page=1, page_size=PAGE_SIZE))
+        result = first.get('result', {})
+        items = list(result.get('items', []))
+        total = result.get('total', 0)
+
+        pages = range(2, (total + PAGE_SIZE - 1) // PAGE_SIZE + 1)
+        responses = await asyncio.gather(*(self.fetch(dict(params, page=page, page_size=PAGE_SIZE)) for page in pages))
+        for response in responses:
+            items.extend(response.get('result', {}).get('items', []))
+        return items
+
+    async def search_objects(self, keyword, done):
+        if keyword in done:
+            return done[keyword]
+
+        items = await self.fetch_all({
+            'q': keyword,
+            'region_id': self.region_id,
+            'search_type': 'discovery',
+            'fields': ','.join(OBJECT_FIELDS),
+        })
+        self.checkpoint.save('objects', keyword, items)
+        return items
+
+    async def fetch_details(self, object_id, done):
+        if object_id in done:
+            return done[object_id]
+
+        response = await self.fetch({'id': object_id, 'fields': ','.join(DETAIL_FIELDS)}, url=self.api_url + '/byid')
+        items = response.get('result', {}).get('items', [])
+        details = items[0] if items else {}
+        self.checkpoint.save('details', object_id, details)
+        return details
+
+    async def search_infrastructure(self, object_id, lat, lon, infra_type, done):
+        key = f'{object_id}|{infra_type}'
+        if key in done:
+            return done[key]
+
+        rubric = INFRASTRUCTURE_RUBRICS[infra_type]
+        items = await self.fetch_all({
+            'rubric_id': rubric['rubric_id'],
+            'point': f'{lon},{lat}',
+            'radius': rubric['radius'],
+            'sort': 'distance',
+            'fields': ','.join(INFRA_FIELDS),
+        })
+        self.checkpoint.save('infrastructure', key, items)
+        return items
+
+    # Один тайл одной рубрики; завершенные тайлы сохраняются в чекпоинт, как и запросы по объектам
+    async def search_tile(self, tile, infra_type, done):
+        key = f'{infra_type}|{tile.lat:.6f},{tile.lon:.6f}|{tile.radius}'
+        if key in done:
+            return done[key]
+
+        items = await self.fetch_all({
+            'rubric_id': INFRASTRUCTURE_RUBRICS[infra_type]['rubric_id'],
+            'point': f'{tile.lon},{tile.lat}',
+            'radius': tile.radius,
+            'sort': 'distance',
+            'fields': ','.join(INFRA_FIELDS),
+        })
+        self.checkpoint.save('tiles', key, items)
+        return items
+
+    # Инфраструктура по тайлам: каждый тайл и рубрика запрашиваются один раз,
+    # связи с объектами считаются локально по расстоянию
+    async def search_infrastructure_tiled(self, object_ids, points, infra_types):
+        lat = [points[object_id]['lat'] for object_id in object_ids]
+        lon = [points[object_id]['lon'] for object_id in object_ids]
+
+        done = self.checkpoint.load('tiles')
+        infrastructure = {object_id: {} for object_id in object_ids}
+        for infra_type in infra_types:
+            rubric = INFRASTRUCTURE_RUBRICS[infra_type]
+            tiles = plan_tiles(lat, lon, rubric['radius'], self.tile_size)
+            found = await asyncio.gather(*(self.search_tile(tile, infra_type, done) for tile in tiles))
+
+            # Соседние тайлы перекрываются - дубликаты убираем по id
+            items = {}
+            for tile_items in found:
+                for item in tile_items:
+                    if item.get('point'):
+                        items.setdefault(item.get('id'), item)
+            links = link_infrastructure(lat, lon, list(items.values()), rubric['radius'])
+
+            for object_id, object_items in zip(object_ids, links):
+                infrastructure[object_id][infra_type] = object_items
+        return infrastructure
+
+    # Полный сбор: объекты по ключевым словам, детали и инфраструктура по всем рубрикам
+    async def run(self, keywords=KEYWORDS, infra_types=None):
+        infra_types = infra_types or list(INFRASTRUCTURE_RUBRICS)
+
+        done_objects = self.checkpoint.load('objects')
+        found = await asyncio.gather(*(self.search_objects(keyword, done_objects) for keyword in keywords))
+
+        # Объекты с дубликатами по ключевым словам, как в ноутбуке
+        objects = []
+        for keyword, items in zip(keywords, found):
+            for item in items:
+                if item.get('id') and item.get('point'):
+                    objects.append(dict(item, search_keyword=keyword))
+        unique_ids = list(dict.fromkeys(item['id'] for item in objects))
+
+        done_details = self.checkpoint.load('details')
+        details = await asyncio.gather(*(self.fetch_details(object_id, done_details) for object_id in unique_ids))
+        details = dict(zip(unique_ids, details))
+
+        points = {item['id']: item['point'] for item in objects}
+        if self.tiled:
+            infrastructure = await self.search_infrastructure_tiled(unique_ids, points, infra_types)
+            return build_rows(objects, details, infrastructure)
+
+        done_infra = self.checkpoint.load('infrastructure')
+        tasks = [
+            (object_id, infra_type)
+            for object_id in unique_ids
+            for infra_type in infra_types
+        ]
+        infra = await asyncio.gather(*(
+            self.search_infrastructure(object_id, points[object_id]['lat'], points[object_id]['lon'], infra_type, done_infra)
+            for object_id, infra_type in tasks
+        ))
+        infrastructure = {}
+        for (object_id, infra_type), items in zip(tasks, infra):
+            infrastructure.setdefault(object_id, {})[infra_type] = items
+
+        return build_rows(objects, details, infrastructure)
+
+# Название административной единицы нужного типа из adm_div
+def adm_div_name(item, *types):
+    for adm_type in types:
+        for division in item.get('adm_div') or []:
+            if division.get('type') == adm_type:
+                return division.get('name', '')
+    return ''
+
+def sport_type_by_name(name):
+    name = str(name).lower()
+    if 'теннис' in name:
+        return 'теннис'
+    if 'сквош' in name:
+        return 'сквош'
+    if any(word in name for word in ['паддл', 'падл', 'padel', 'падел', 'паддел']):
+        return 'паддл'
+    return 'другое'
+
+# Строки в формате all_sport_objects_with_infrastructure.csv: объект x каждая найденная инфраструктура
+def build_rows(objects, details, infrastructure):
+    rows = []
+    for obj in objects:
+        full = {**obj, **details.get(obj['id'], {})}
+        point = obj['point']
+
+        base = {
+            'sport_object_id': obj['id'],
+            'sport_object_name': full.get('name', ''),
+            'sport_object_address': full.get('address_name', full.get('address', '')),
+            'sport_object_lat': point.get('lat'),
+            'sport_object_lon': point.get('lon'),
+            'sport_object_type': sport_type_by_name(full.get('name', '')),
+            'search_keyword': obj['search_keyword'],
+            'schedule': json.dumps(full['schedule'], ensure_ascii=False) if full.get('schedule') else '',
+            'rubrics': ' | '.join(r.get('name', '') for r in full.get('rubrics') or [] if r.get('name')),
+            # Район и регион из административного деления 2GIS
+            'district': adm_div_name(full, 'district_area', 'district'),
+            'region': adm_div_name(full, 'region', 'city'),
+        }
+
+        object_infra = infrastructure.get(obj['id'], {})
+        base['sport_object_total_infrastructure'] = sum(len(items) for items in object_infra.values())
+
+        for infra_type, items in object_infra.items():
+            items = [item for item in items if item.get('point')]
+            if not items:
+                continue
+            lats = [item['point']['lat'] for item in items]
+            lons = [item['point']['lon'] for item in items]
+            distances = haversine(point['lat'], point['lon'], lats, lons)
+
+            for item, lat, lon, distance in zip(items, lats, lons, distances):
+                rows.append(dict(
+                    base,
+                    infrastructure_type=infra_type,
+                    infrastructure_name=item.get('name', ''),
+                    infrastructure_address=item.get('address_name', ''),
+                    infrastructure_lat=lat,
+                    infrastructure_lon=lon,
+                    distance_meters=round(float(distance)),
+                    distance_kilometers=round(float(distance) / 1000, 2),
+                    walk_time_minutes=round(float(distance) / WALK_SPEED, 1),
+                    infrastructure_id=item.get('id', ''),
+                ))
+
+    return pd.DataFrame(rows)
+
+async def harvest(api_key, output_filename=OUTPUT_FILENAME, **options):
+    started = time.perf_counter()
+    async with Harvester(api_key, **options) as harvester:
+        df = await harvester.run()
+        requests = harvester.requests
+        if harvester.cache is not None:
+            requests = f"{requests} (из кеша: {harvester.cache.hits})"
+
+    df.to_csv(output_filename, index=False, encoding='utf-8-sig')
+    return df, requests, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description="Сбор спортивных объектов и инфраструктуры из 2GIS")
+    parser.add_argument('--api-key', default=os.environ.get('DGIS_API_KEY'), help="ключ API (или DGIS_API_KEY)")
+    parser.add_argument('--api-url', default=API_URL)
+    parser.add_argument('--output', default=OUTPUT_FILENAME)
+    parser.add_argument('--checkpoint-dir', default=CHECKPOINT_DIR)
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help="одновременных запросов")
+    parser.add_argument('--rate', type=float, default=RATE, help="запросов в секунду")
+    parser.add_argument('--retries', type=int, default=RETRIES)
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help="кеш ответов API (пустая строка - без кеша)")
+    parser.add_argument('--cache-ttl', type=float, default=CACHE_TTL / 3600, help="срок жизни кеша, часы")
+    parser.add_argument('--tile-size', type=int, default=TILE_SIZE, help="сторона тайла, метры")
+    parser.add_argument('--per-object', action='store_true', help="запрашивать инфраструктуру по каждому объекту")
+    args = parser.parse_args()
+
+    if not args.api_key:
+        parser.error("не указан ключ API")
+
+    df, requests, seconds = asyncio.run(harvest(
+        args.api_key, args.output,
+        api_url=args.api_url, concurrency=args.concurrency, rate=args.rate,
+        retries=args.retries, checkpoint_dir=args.checkpoint_dir,
+        cache_dir=args.cache_dir or None, cache_ttl=args.cache_ttl * 3600,
+        tiled=not args.per_object, tile_size=args.tile_size,
+    ))
+    print(f"Строк: {len(df)}, запросов к API: {requests}, время: {seconds:.1f} с")
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,121 @@ from dash import dcc, html
 import dash_bootstrap_components as dbc
 import dash_table
 
-def create_layout():
+# Графики вкладки аналитики - каждый грузится своим callback'ом
+CHART_IDS = [
+    'chart-sport-types',
+    'chart-schedule',
+    'chart-density',
+    'chart-salary',
+    'chart-infra',
+    'chart-gender',
+]
+
+# Показатели рейтинга обеспеченности районов (колонки get_provision_metrics) и подписи к ним
+PROVISION_METRICS = {
+    'sport_objects_per_100k': 'Спортивных объектов на 100 тыс. жителей',
+    'infrastructure_per_100k': 'Объектов инфраструктуры на 100 тыс. жителей',
+    'infrastructure_per_sport_object': 'Объектов инфраструктуры на спортивный объект',
+    'sport_types_count': 'Видов спорта в районе',
+}
+PROVISION_DEFAULT_METRIC = 'sport_objects_per_100k'
+
+# Шкала радиуса пешей доступности, метры
+RADIUS_MIN = 250
+RADIUS_MAX = 1500
+RADIUS_STEP = 250
+
+# Пороги слоя пешей доступности на карте, минуты
+ACCESS_MINUTES = [10, 15, 20, 30]
+
+# Страницы, сортировка и фильтр по колонкам таблицы: на сервере или, в режиме фильтрации на клиенте, встроенные
+SERVER_TABLE_ACTIONS = dict(page_count=1, page_action='custom', sort_action='custom', filter_action='custom')
+CLIENT_TABLE_ACTIONS = dict(page_action='native', sort_action='native', filter_action='native')
+
+def create_map_tab(client_filtering=False):
+    if client_filtering:
+        # Компактный набор данных для фильтрации в браузере, приходит один раз
+        stores = [dcc.Store(id='client-dataset')]
+    else:
+        # Ключ последней отрисованной на сервере карты, чтобы не пересылать ее повторно
+        stores = [dcc.Store(id='map-rendered-key')]
+    
+    return html.Div(id='map-tab-content', className="mt-3", style={'display': 'none'}, children=[
+        *stores,
+        html.H4("Карта спортивных объектов и инфраструктуры", className="mb-3"),
+        html.P(id='map-counts', className="text-muted mb-2"),
+        dcc.Graph(
+            id='combined-map',
+            style={'height': '500px', 'border': '1px solid #ddd', 'borderRadius': '5px'}
+        ),
+    ])
+
+# Слой карты с районами, откуда до спортивного объекта дальше выбранного времени пешком
+# (считается на сервере, поэтому только без фильтрации на клиенте)
+def create_access_filter():
+    return dbc.Col([
+        html.Label("Пешая доступность объектов:", className="font-weight-bold"),
+        dcc.Dropdown(
+            id='map-access-layer',
+            options=[{'label': f"Дальше {minutes} мин пешком", 'value': minutes} for minutes in ACCESS_MINUTES],
+            placeholder="Не показывать",
+            clearable=True,
+            className="mb-3"
+        ),
+    ], width=4)
+
+def create_charts_tab():
+    rows = []
+    for i, chart_id in enumerate(CHART_IDS):
+        rows.append(dbc.Row([
+            dbc.Col(dcc.Loading(dcc.Graph(id=chart_id, style={'height': '400px'})), width=12),
+        ], className="mb-4" if i < len(CHART_IDS) - 1 else None))
+    
+    # Рейтинг обеспеченности районов - со своими фильтрами и выбором показателя
+    provision = html.Div(className="mt-4", children=[
+        html.H5("Обеспеченность районов", className="mb-3"),
+        dbc.Row([
+            dbc.Col([
+                html.Label("Вид спорта:", className="font-weight-bold"),
+                dcc.Dropdown(
+                    id='provision-sport-filter',
+                    placeholder="Все виды спорта",
+                    clearable=True,
+                    className="mb-3"
+                ),
+            ], width=4),
+            dbc.Col([
+                html.Label("Тип инфраструктуры:", className="font-weight-bold"),
+                dcc.Dropdown(
+                    id='provision-infra-filter',
+                    placeholder="Все типы инфраструктуры",
+                    clearable=True,
+                    className="mb-3"
+                ),
+            ], width=4),
+            dbc.Col([
+                html.Label("Показатель:", className="font-weight-bold"),
+                dcc.Dropdown(
+                    id='provision-metric',
+                    options=[{'label': label, 'value': value} for value, label in PROVISION_METRICS.items()],
+                    value=PROVISION_DEFAULT_METRIC,
+                    clearable=False,
+                    className="mb-3"
+                ),
+            ], width=4),
+        ]),
+        dcc.Loading(dcc.Graph(id='chart-provision', style={'height': '450px'})),
+    ])
+    
+    return html.Div(id='charts-tab-content', className="mt-3", style={'display': 'none'}, children=[
+        # Версия данных, для которой графики уже отрисованы
+        dcc.Store(id='charts-rendered-version'),
+        html.H4("Аналитика данных", className="mb-4"),
+        *rows,
+        provision,
+    ])
+
+def create_layout(client_filtering=False):
     
     layout = dbc.Container([
         dcc.Location(id='url', refresh=False),
@@ -65,8 +179,9 @@ def create_layout():
                 )
             ),
             dbc.CardBody([
-                # Контейнер для контента вкладок
-                html.Div(id='tab-content', className="mt-3"),
+                # Контент вкладок - структура статичная, данные подгружаются только для видимой вкладки
+                create_map_tab(client_filtering),
+                create_charts_tab(),
                 
                 # Фильтры для карты
                 html.Div(id='map-filters-container', style={'display': 'none'}, children=[
@@ -100,6 +215,23 @@ def create_layout():
                         ], width=4),
                     ], className="mb-4"),
                     
+                    # Радиус пешей доступности: инфраструктура не дальше выбранного расстояния от объекта
+                    dbc.Row([
+                        dbc.Col([
+                            html.Label("Радиус пешей доступности, м:", className="font-weight-bold"),
+                            dcc.Slider(
+                                id='map-radius-filter',
+                                min=RADIUS_MIN,
+                                max=RADIUS_MAX,
+                                step=RADIUS_STEP,
+                                value=RADIUS_MAX,
+                                marks={r: str(r) for r in range(RADIUS_MIN, RADIUS_MAX + 1, RADIUS_STEP)},
+                                className="mb-3"
+                            ),
+                        ], width=12 if client_filtering else 8),
+                        *([] if client_filtering else [create_access_filter()]),
+                    ], className="mb-4"),
+                    
                     # Таблица объектов под картой
                     html.Div(id='objects-table-container', style={'display': 'none'}, children=[
                         html.H4("Список спортивных объектов", className="mb-3 mt-4"),  # Изменено название
@@ -112,7 +244,13 @@ def create_layout():
                                 {'name': 'Район', 'id': 'Район'},
                                 {'name': 'Типы инфраструктуры', 'id': 'Типы инфраструктуры'}
                             ],
+                            page_current=0,
                             page_size=10,
+                            sort_mode='single',
+                            sort_by=[],
+                            filter_query='',
+                            filter_options={'case': 'insensitive'},
+                            **(CLIENT_TABLE_ACTIONS if client_filtering else SERVER_TABLE_ACTIONS),
                             style_table={'overflowX': 'auto'},
                             style_cell={
                                 'textAlign': 'left',
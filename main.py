@@ -7,6 +7,7 @@ from app import create_app
 
 if __name__ == '__main__':
     
-    app = create_app()
+    # Данные грузятся в фоне сразу при старте, а не на первом запросе
+    app = create_app(eager_load=True)
     server = app.server
     app.run_server(debug=False, host='0.0.0.0', port=8050)
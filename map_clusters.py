@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+# Размер тайла веб-меркатора в пикселях
+TILE_SIZE = 256
+
+# Размер ячейки кластера на экране, пиксели
+CLUSTER_CELL_PX = 48
+
+# Небольшие наборы и крупный зум показываем без кластеризации
+RAW_POINTS_LIMIT = 200
+RAW_ZOOM = 16
+
+# Верхняя граница маркеров в одном слое - если ячеек больше, укрупняем сетку
+MAX_MARKERS = 500
+
+# Координаты в проекции веб-меркатора, нормированные на [0, 1)
+def mercator(lat, lon):
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -85.05112878, 85.05112878)
+    lon = np.asarray(lon, dtype=np.float64)
+    x = (lon + 180.0) / 360.0
+    sin_lat = np.sin(np.radians(lat))
+    y = 0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * np.pi)
+    return x, y
+
+# Точки -> кластеры по сетке для данного зума.
+# Возвращает DataFrame lat, lon, count, label: у одиночных точек label - подпись точки, у кластеров - количество
+def cluster_points(frame, lat_col, lon_col, labels, zoom):
+    points = pd.DataFrame({
+        'lat': frame[lat_col].to_numpy(dtype=np.float64),
+        'lon': frame[lon_col].to_numpy(dtype=np.float64),
+        'label': np.asarray(labels, dtype=object),
+    }).dropna(subset=['lat', 'lon'])
+
+    if len(points) <= RAW_POINTS_LIMIT or (zoom >= RAW_ZOOM and len(points) <= MAX_MARKERS):
+        return points.assign(count=1)
+
+    x, y = mercator(points['lat'], points['lon'])
+
+    # Размер ответа ограничен: при слишком большом числе ячеек переходим на уровень крупнее
+    level = int(zoom)
+    while True:
+        clusters = _grid_clusters(points, x, y, level)
+        if len(clusters) <= MAX_MARKERS or level <= 0:
+            return clusters
+        level -= 1
+
+def _grid_clusters(points, x, y, level):
+    # Номер ячейки сетки: чем больше зум, тем мельче ячейки
+    cells_per_side = int(TILE_SIZE * 2 ** level / CLUSTER_CELL_PX) + 1
+    cell = np.floor(x * cells_per_side).astype(np.int64) * cells_per_side + \
+        np.floor(y * cells_per_side).astype(np.int64)
+
+    _, first, inverse, counts = np.unique(cell, return_index=True, return_inverse=True, return_counts=True)
+
+    # Центр кластера - среднее координат его точек
+    lat = np.bincount(inverse, weights=points['lat'].to_numpy()) / counts
+    lon = np.bincount(inverse, weights=points['lon'].to_numpy()) / counts
+    label = np.where(counts == 1, points['label'].to_numpy()[first], [f"{count} объектов" for count in counts])
+
+    return pd.DataFrame({'lat': lat, 'lon': lon, 'label': label, 'count': counts})
+
+# Размер маркера растет логарифмически с числом точек в кластере
+def marker_sizes(counts, base_size):
+    counts = np.asarray(counts, dtype=np.float64)
+    return np.minimum(base_size + 4 * np.log2(counts), base_size * 3)
@@ -0,0 +1,170 @@
+import bisect
+import threading
+import time
+
+from dash.exceptions import PreventUpdate
+
+# Метрики callback'ов и кешей в текстовом формате Prometheus (/metrics).
+# Счетчики живут в памяти процесса: под gunicorn у каждого воркера свои
+
+# Границы корзин гистограмм: время ответа, секунды, и размер сериализованного ответа, байты
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+ROWS_BUCKETS = (0, 10, 100, 1000, 10000, 100000)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Counter:
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), value=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def lines(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} counter'
+        for labels, value in values:
+            yield f'{self.name}{_labels(self.label_names, labels)} {value}'
+
+class Histogram:
+
+    def __init__(self, name, help_text, buckets, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label_names = label_names
+        # По набору меток: количество в каждой корзине (последняя - +Inf), сумма
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][position] += 1
+            state[1] += value
+
+    def lines(self):
+        with self._lock:
+            values = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} histogram'
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                bucket_labels = _labels(self.label_names + ('le',), labels + (bound,))
+                yield f'{self.name}_bucket{bucket_labels} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.label_names, labels)} {total}'
+            yield f'{self.name}_count{_labels(self.label_names, labels)} {cumulative}'
+
+CALLBACK_LABELS = ('callback', 'output')
+
+callback_calls = Counter(
+    'dash_callback_calls_total', 'Вызовы callback по исходу: ok, prevented (PreventUpdate), error',
+    CALLBACK_LABELS + ('outcome',))
+callback_latency = Histogram(
+    'dash_callback_duration_seconds', 'Время выполнения callback вместе с сериализацией ответа',
+    LATENCY_BUCKETS, CALLBACK_LABELS)
+callback_bytes = Histogram(
+    'dash_callback_response_bytes', 'Размер ответа callback в JSON до сжатия',
+    BYTES_BUCKETS, CALLBACK_LABELS)
+callback_rows = Histogram(
+    'dash_callback_rows', 'Число строк данных, из которых callback собрал ответ',
+    ROWS_BUCKETS, ('callback',))
+
+# Кеши, показатели которых отдаются на /metrics: имя -> LRUCache
+caches = {}
+
+# Показатели, которые считываются в момент запроса /metrics: имя -> (описание, функция без аргументов)
+gauges = {}
+
+def register_cache(name, cache):
+    caches[name] = cache
+
+def register_gauge(name, help_text, read):
+    gauges[name] = (help_text, read)
+
+# Число строк, обработанных callback'ом (например, отфильтрованных объектов таблицы)
+def record_rows(callback, rows):
+    callback_rows.observe((callback,), rows)
+
+# Обертка функции из app.callback_map: Dash вызывает ее на каждый запрос и получает уже сериализованный ответ,
+# поэтому размер - просто длина строки. На горячем пути - два вызова perf_counter и запись под блокировкой
+def _instrument(name, output, func):
+    labels = (name, output)
+
+    def instrumented(*args, **kwargs):
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            response = func(*args, **kwargs)
+            outcome = 'ok'
+            callback_bytes.observe(labels, len(response))
+            return response
+        except PreventUpdate:
+            outcome = 'prevented'
+            raise
+        finally:
+            callback_latency.observe(labels, time.perf_counter() - started)
+            callback_calls.inc(labels + (outcome,))
+
+    instrumented.__wrapped__ = getattr(func, '__wrapped__', func)
+    return instrumented
+
+# Оборачиваем все серверные callback'и приложения (clientside в callback_map без функции)
+def instrument_callbacks(app):
+    for output, entry in app.callback_map.items():
+        func = entry.get('callback')
+        if func is None:
+            continue
+        name = getattr(getattr(func, '__wrapped__', func), '__name__', output)
+        entry['callback'] = _instrument(name, output, func)
+
+def _cache_lines():
+    cache_metrics = [
+        ('app_cache_hits_total', 'counter', 'Попадания в кеш', 'hits'),
+        ('app_cache_misses_total', 'counter', 'Промахи кеша', 'misses'),
+        ('app_cache_items', 'gauge', 'Записей в кеше', 'items'),
+        ('app_cache_bytes', 'gauge', 'Размер значений в кеше, байты', 'bytes'),
+        ('app_cache_hit_ratio', 'gauge', 'Доля попаданий в кеш', None),
+    ]
+    stats = {name: cache.stats() for name, cache in sorted(caches.items())}
+    for metric, kind, help_text, key in cache_metrics:
+        yield f'# HELP {metric} {help_text}'
+        yield f'# TYPE {metric} {kind}'
+        for name, values in stats.items():
+            if key is None:
+                lookups = values['hits'] + values['misses']
+                value = values['hits'] / lookups if lookups else 0.0
+            else:
+                value = values[key]
+            yield f'{metric}{_labels(("cache",), (name,))} {value}'
+
+# Все метрики в текстовом формате Prometheus
+def render():
+    lines = []
+    for metric in (callback_calls, callback_latency, callback_bytes, callback_rows):
+        lines.extend(metric.lines())
+    lines.extend(_cache_lines())
+    for name, (help_text, read) in sorted(gauges.items()):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {read()}']
+    return '\n'.join(lines) + '\n'
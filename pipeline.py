@@ -0,0 +1,181 @@
+import argparse
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# Сборка итогового датасета для дашборда из сырой выгрузки 2GIS (повторяет шаги ноутбука 3_Sport_objects_analysis).
+# Запуск:
+#   python pipeline.py --input all_sport_objects_with_infrastructure.csv --output sport_objects_final_full_data.csv
+
+RAW_FILENAME = 'all_sport_objects_with_infrastructure.csv'
+CLUSTERS_FILENAME = 'full_cluster_analysis.csv'
+OUTPUT_FILENAME = 'sport_objects_final_full_data.csv'
+CHUNKSIZE = 100000
+
+REGION = 'Санкт-Петербург'
+
+# Вид спорта по поисковому запросу, которым нашли объект
+KEYWORD_SPORT_TYPES = {
+    'теннисный корт': 'теннис',
+    'сквош корт': 'сквош',
+    'падел': 'падел',
+}
+SPORT_TYPE_RENAMES = {'паддл': 'падел'}
+
+# Служебные колонки, которые в итоговый датасет не попадают
+RAW_DROP_COLUMNS = ['search_keyword', 'rubrics']
+FINAL_DROP_COLUMNS = ['Тип_кластера_кластера', 'Порядковый_номер_в_кластере', 'Населенный_пункт', 'region']
+
+# Время по этапам, суммируется по всем чанкам
+class StageTimer:
+
+    def __init__(self):
+        self.seconds = OrderedDict()
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - started
+
+    def report(self):
+        total = sum(self.seconds.values())
+        lines = [f"{name:<12} {seconds * 1000:10.1f} мс" for name, seconds in self.seconds.items()]
+        lines.append(f"{'итого':<12} {total * 1000:10.1f} мс")
+        return '\n'.join(lines)
+
+# Круглосуточный график: есть "00:00" и окончание в "24:00"
+def schedule_flags(schedule):
+    schedule = schedule.astype('string')
+    has_00_00 = schedule.str.contains('00:00', regex=False)
+    has_to_24_00 = schedule.str.contains('"to": "24:00"', regex=False) | \
+        schedule.str.contains("'to': '24:00'", regex=False)
+    return (has_00_00 & has_to_24_00).fillna(False).astype(np.int64)
+
+# Вид спорта: по ключевому слову запроса, иначе исходное значение
+def sport_types(chunk):
+    sport_type = chunk['sport_object_type']
+    if 'search_keyword' in chunk.columns:
+        sport_type = chunk['search_keyword'].map(KEYWORD_SPORT_TYPES).fillna(sport_type)
+    return sport_type.replace(SPORT_TYPE_RENAMES)
+
+# Таблица районов, индексированная по названию района
+def load_clusters(filename):
+    clusters = pd.read_csv(filename)
+    return clusters.drop_duplicates(subset=['Населенный_пункт']).set_index('Населенный_пункт', drop=False)
+
+# Присоединяем показатели района через map по категориальному ключу - без пересортировки чанка
+def join_clusters(chunk, clusters):
+    district = chunk['district'].astype(pd.CategoricalDtype(clusters.index))
+    codes = district.cat.codes.to_numpy()
+    matched = codes >= 0
+
+    for column in clusters.columns:
+        if column in chunk.columns:
+            continue
+        values = clusters[column].to_numpy()
+        if values.dtype.kind in 'fiub':
+            joined = np.full(len(chunk), np.nan)
+        else:
+            joined = np.full(len(chunk), np.nan, dtype=object)
+        joined[matched] = values[codes[matched]]
+        chunk[column] = joined
+    return chunk
+
+# Оставляем объекты Санкт-Петербурга с названием, без района '0'. Как и в ноутбуке,
+# объекты без района (NaN) сохраняются - показатели района у них пустые
+def filter_rows(chunk):
+    keep = chunk['sport_object_name'].notna()
+    if 'region' in chunk.columns:
+        keep &= chunk['region'] == REGION
+    if 'district' in chunk.columns:
+        keep &= chunk['district'].astype(str) != '0'
+    return chunk[keep]
+
+def transform_chunk(chunk, clusters, timer):
+    with timer.stage('schedule'):
+        if 'schedule' in chunk.columns:
+            chunk['schedule'] = schedule_flags(chunk['schedule'])
+
+    with timer.stage('sport_type'):
+        chunk['sport_object_type'] = sport_types(chunk)
+        chunk = chunk.drop(columns=[col for col in RAW_DROP_COLUMNS if col in chunk.columns])
+
+    with timer.stage('filter'):
+        chunk = filter_rows(chunk)
+
+    with timer.stage('clusters'):
+        chunk = join_clusters(chunk.copy(), clusters)
+        chunk = chunk.drop(columns=[col for col in FINAL_DROP_COLUMNS if col in chunk.columns])
+
+    return chunk
+
+# Полный прогон: читаем сырой CSV чанками, преобразуем и дописываем в итоговый файл
+def run(input_filename=RAW_FILENAME, clusters_filename=CLUSTERS_FILENAME, output_filename=OUTPUT_FILENAME,
+        chunksize=CHUNKSIZE, build_snapshot=False):
+    timer = StageTimer()
+    rows_in = rows_out = 0
+
+    with timer.stage('clusters'):
+        clusters = load_clusters(clusters_filename)
+
+    # Пишем во временный файл, чтобы работающий дашборд не увидел недописанный CSV
+    tmp_filename = output_filename + '.tmp'
+    reader = pd.read_csv(input_filename, chunksize=chunksize)
+    first_chunk = True
+
+    try:
+        while True:
+            with timer.stage('read'):
+                chunk = next(reader, None)
+            if chunk is None:
+                break
+            rows_in += len(chunk)
+
+            chunk = transform_chunk(chunk, clusters, timer)
+            rows_out += len(chunk)
+
+            with timer.stage('write'):
+                chunk.to_csv(tmp_filename, mode='w' if first_chunk else 'a', header=first_chunk,
+                             index=False, encoding='utf-8-sig' if first_chunk else 'utf-8')
+            first_chunk = False
+
+        os.replace(tmp_filename, output_filename)
+    finally:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+
+    loader = None
+    if build_snapshot:
+        from data_loader import SportDataLoader
+
+        with timer.stage('snapshot'):
+            loader = SportDataLoader(output_filename)
+            loader.load()
+
+    return rows_in, rows_out, timer, loader
+
+def main():
+    parser = argparse.ArgumentParser(description="Сборка sport_objects_final_full_data.csv из сырой выгрузки")
+    parser.add_argument('--input', default=RAW_FILENAME, help="сырой CSV (результат ноутбука 2)")
+    parser.add_argument('--clusters', default=CLUSTERS_FILENAME, help="CSV с кластерами районов")
+    parser.add_argument('--output', default=OUTPUT_FILENAME, help="итоговый CSV для дашборда")
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE, help="строк в одном чанке")
+    parser.add_argument('--snapshot', action='store_true', help="сразу собрать бинарный снимок загрузчика")
+    args = parser.parse_args()
+
+    rows_in, rows_out, timer, loader = run(args.input, args.clusters, args.output, args.chunksize, args.snapshot)
+
+    print(f"Строк на входе: {rows_in}, в итоговом датасете: {rows_out}")
+    print(timer.report())
+    if loader is not None:
+        print(loader.memory_report())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Схема загрузки итогового CSV: какие колонки нужны каждому методу загрузчика и в каких типах их хранить.
+# Колонки, которых нет ни у одного метода (отклонения и классы кластеров, расстояние в км и т.п.), не читаются.
+
+# Компактные типы: координаты float32, повторяющиеся строки - категории.
+# Идентификаторы 2GIS не помещаются в int32 и записаны в CSV в виде float, поэтому остаются float64 -
+# целочисленные ключи объектов и инфраструктуры (int32) появляются в нормализованной модели
+DTYPES = {
+    'sport_object_id': 'float64',
+    'sport_object_name': 'category',
+    'sport_object_address': 'category',
+    'sport_object_lat': 'float32',
+    'sport_object_lon': 'float32',
+    'sport_object_type': 'category',
+    'schedule': 'float32',
+    'district': 'category',
+    'infrastructure_id': 'float64',
+    'infrastructure_type': 'category',
+    'infrastructure_name': 'category',
+    'infrastructure_address': 'category',
+    'infrastructure_lat': 'float32',
+    'infrastructure_lon': 'float32',
+    'distance_meters': 'float32',
+    'Плотность_населения': 'float64',
+    'Зарплата': 'float64',
+    'Население': 'float64',
+    'Соотношение_М_Ж': 'float64',
+    'Кластер': 'float32',
+    'Тип_кластера_района': 'category',
+}
+
+OBJECT_COLUMNS = ['sport_object_id', 'sport_object_name', 'sport_object_address', 'sport_object_lat',
+                  'sport_object_lon', 'sport_object_type', 'district']
+INFRA_COLUMNS = ['infrastructure_id', 'infrastructure_type', 'infrastructure_name', 'infrastructure_address',
+                 'infrastructure_lat', 'infrastructure_lon']
+DISTRICT_COLUMNS = ['Плотность_населения', 'Зарплата', 'Население', 'Соотношение_М_Ж',
+                    'Кластер', 'Тип_кластера_района']
+
+# Колонки по методам загрузчика
+ACCESSOR_COLUMNS = {
+    'get_objects': OBJECT_COLUMNS + ['schedule'],
+    'filter_data': OBJECT_COLUMNS + INFRA_COLUMNS + ['distance_meters'],
+    'get_infrastructure_by_object': ['sport_object_id', 'infrastructure_type', 'infrastructure_name',
+                                     'infrastructure_address', 'distance_meters'],
+    'get_district_metrics': ['district', 'sport_object_id', 'sport_object_type', 'infrastructure_id'] + DISTRICT_COLUMNS,
+    'get_provision_metrics': ['district', 'sport_object_id', 'sport_object_type', 'infrastructure_id',
+                              'infrastructure_type', 'Население'],
+    'get_accessibility_grid': ['district', 'sport_object_id', 'sport_object_lat', 'sport_object_lon',
+                               'sport_object_type', 'Население'],
+}
+
+# Колонки для набора методов (None - для всех), в порядке схемы
+def required_columns(accessors=None):
+    accessors = ACCESSOR_COLUMNS if accessors is None else accessors
+    needed = {column for accessor in accessors for column in ACCESSOR_COLUMNS[accessor]}
+    return [column for column in DTYPES if column in needed]
+
+# Приводим колонки к типам схемы; нечисловые значения в числовых колонках становятся NaN
+def compact(frame):
+    for column in frame.columns:
+        dtype = DTYPES.get(column)
+        if dtype is None or frame[column].dtype == dtype:
+            continue
+        if dtype == 'category':
+            frame[column] = frame[column].astype('category')
+        else:
+            frame[column] = pd.to_numeric(frame[column], errors='coerce').astype(dtype)
+    return frame
+
+# Склейка чанков: категории объединяем, иначе pandas превратит колонку обратно в строки
+def concat_chunks(chunks):
+    if len(chunks) == 1:
+        return chunks[0]
+
+    columns = {}
+    for column in chunks[0].columns:
+        parts = [chunk[column] for chunk in chunks]
+        if isinstance(parts[0].dtype, pd.CategoricalDtype):
+            columns[column] = union_categoricals(parts, sort_categories=True)
+        else:
+            columns[column] = np.concatenate([part.to_numpy() for part in parts])
+    return pd.DataFrame(columns)
+
+def _nbytes(frame):
+    return int(frame.memory_usage(index=True, deep=True).sum())
+
+# Читаем только нужные колонки, по chunksize строк (None - целиком), сразу в компактных типах.
+# Возвращает таблицу и отчет о памяти: сколько заняли бы прочитанные чанки в типах по умолчанию и сколько после сжатия
+def read_csv(filename, columns, chunksize=None):
+    wanted = set(columns)
+    reader = pd.read_csv(filename, encoding='utf-8', usecols=lambda column: column in wanted, chunksize=chunksize)
+    chunks = [reader] if chunksize is None else reader
+
+    compacted = []
+    report = {'rows': 0, 'raw_bytes': 0, 'peak_chunk_bytes': 0}
+    for chunk in chunks:
+        raw_bytes = _nbytes(chunk)
+        report['rows'] += len(chunk)
+        report['raw_bytes'] += raw_bytes
+        report['peak_chunk_bytes'] = max(report['peak_chunk_bytes'], raw_bytes)
+        compacted.append(compact(chunk))
+
+    frame = concat_chunks(compacted) if compacted else pd.DataFrame(columns=columns)
+    report['compact_bytes'] = _nbytes(frame)
+    return frame, report
@@ -0,0 +1,139 @@
+import numpy as np
+
+from geo import haversine, project
+
+EMPTY_ROWS = np.empty(0, dtype=np.int32)
+
+# Размер ячейки сетки по умолчанию, метры
+CELL_SIZE = 250
+
+# До такого числа ячеек поиск ближайших берет границы ячеек из плотной таблицы, а не двоичным поиском
+DENSE_CELLS_LIMIT = 4000000
+
+# Регулярная сетка над точками в локальной проекции.
+# Точки отсортированы по номеру ячейки, поэтому ряд ячеек - непрерывный диапазон массива
+class GridIndex:
+
+    def __init__(self, lat, lon, cell_size=CELL_SIZE):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.cell_size = cell_size
+
+        valid = np.flatnonzero(~(np.isnan(self.lat) | np.isnan(self.lon)))
+        self.lat0 = float(np.mean(self.lat[valid])) if len(valid) else 0.0
+
+        x, y = project(self.lat[valid], self.lon[valid], self.lat0)
+        self.x0 = float(x.min()) if len(valid) else 0.0
+        self.y0 = float(y.min()) if len(valid) else 0.0
+
+        ix = ((x - self.x0) // cell_size).astype(np.int64)
+        iy = ((y - self.y0) // cell_size).astype(np.int64)
+        self.nx = int(ix.max()) + 1 if len(valid) else 0
+        self.ny = int(iy.max()) + 1 if len(valid) else 0
+
+        cells = iy * self.nx + ix
+        order = np.argsort(cells, kind='stable')
+        self.cells = cells[order]
+        self.rows = valid[order].astype(np.int32)
+
+    def __len__(self):
+        return len(self.rows)
+
+    # Строки из ячеек, покрывающих прямоугольник в проекции
+    def _candidates(self, x_min, x_max, y_min, y_max):
+        ix0 = max(int((x_min - self.x0) // self.cell_size), 0)
+        ix1 = min(int((x_max - self.x0) // self.cell_size), self.nx - 1)
+        iy0 = max(int((y_min - self.y0) // self.cell_size), 0)
+        iy1 = min(int((y_max - self.y0) // self.cell_size), self.ny - 1)
+        if ix0 > ix1 or iy0 > iy1:
+            return EMPTY_ROWS
+
+        row_starts = np.arange(iy0, iy1 + 1, dtype=np.int64) * self.nx
+        starts = np.searchsorted(self.cells, row_starts + ix0, side='left')
+        ends = np.searchsorted(self.cells, row_starts + ix1, side='right')
+        return np.concatenate([self.rows[start:end] for start, end in zip(starts, ends)])
+
+    # Точки внутри прямоугольника координат (например, видимой области карты), отсортированные позиции строк
+    def query_bbox(self, south, west, north, east):
+        (x_min, x_max), (y_min, y_max) = project([south, north], [west, east], self.lat0)
+        rows = self._candidates(x_min, x_max, y_min, y_max)
+
+        lat, lon = self.lat[rows], self.lon[rows]
+        inside = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+        return np.sort(rows[inside])
+
+    # Точки в радиусе radius метров от (lat, lon): позиции строк и расстояния, по возрастанию расстояния
+    def query_radius(self, lat, lon, radius):
+        x, y = project(lat, lon, self.lat0)
+        rows = self._candidates(x - radius, x + radius, y - radius, y + radius)
+
+        distances = haversine(lat, lon, self.lat[rows], self.lon[rows])
+        inside = distances <= radius
+        rows, distances = rows[inside], distances[inside]
+
+        order = np.argsort(distances, kind='stable')
+        return rows[order], distances[order]
+
+    # Ближайшая точка для каждой из точек (lat, lon), не дальше max_distance метров: позиции строк и расстояния
+    # в проекции; -1 и NaN - ближе ничего нет. Просматриваем кольца ячеек вокруг всех точек сразу:
+    # после кольца r точка решена, если найденное расстояние не больше r ячеек - дальние кольца не ближе
+    def nearest(self, lat, lon, max_distance):
+        x, y = project(lat, lon, self.lat0)
+        best_rows = np.full(len(x), -1, dtype=np.int32)
+        best = np.full(len(x), np.inf)
+        if not len(self.rows):
+            return best_rows, np.full(len(x), np.nan)
+
+        grid_x, grid_y = project(self.lat, self.lon, self.lat0)
+        bounds = None
+        if self.nx * self.ny <= DENSE_CELLS_LIMIT:
+            bounds = np.searchsorted(self.cells, np.arange(self.nx * self.ny + 1))
+        cx = ((x - self.x0) // self.cell_size).astype(np.int64)
+        cy = ((y - self.y0) // self.cell_size).astype(np.int64)
+        pending = np.arange(len(x))
+
+        for ring in range(int(max_distance // self.cell_size) + 2):
+            if not len(pending):
+                break
+            dx, dy = _ring_offsets(ring)
+            ix = cx[pending, None] + dx
+            iy = cy[pending, None] + dy
+            valid = (ix >= 0) & (ix < self.nx) & (iy >= 0) & (iy < self.ny)
+            cells = np.where(valid, iy * self.nx + ix, 0)
+            if bounds is not None:
+                starts, ends = bounds[cells], bounds[cells + 1]
+            else:
+                starts = np.searchsorted(self.cells, cells, side='left')
+                ends = np.searchsorted(self.cells, cells, side='right')
+            counts = np.where(valid, ends - starts, 0).ravel()
+
+            # Все пары точка-кандидат одним массивом: позиции строк индекса подряд по каждой ячейке
+            total = int(counts.sum())
+            if total:
+                owner = np.repeat(np.repeat(pending, dx.size), counts)
+                offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                rows = self.rows[np.repeat(starts.ravel(), counts) + offsets]
+                distances = np.hypot(grid_x[rows] - x[owner], grid_y[rows] - y[owner])
+
+                # Минимум по каждой точке: сортируем по (точка, расстояние) и берем первое в группе
+                order = np.lexsort((distances, owner))
+                first = order[np.r_[True, owner[order][1:] != owner[order][:-1]]]
+                closer = distances[first] < best[owner[first]]
+                best[owner[first][closer]] = distances[first][closer]
+                best_rows[owner[first][closer]] = rows[first][closer]
+
+            pending = pending[best[pending] > ring * self.cell_size]
+
+        found = best <= max_distance
+        best_rows[~found] = -1
+        return best_rows, np.where(found, best, np.nan)
+
+# Смещения ячеек кольца ring вокруг ячейки (квадрат со стороной 2 * ring + 1, только граница)
+def _ring_offsets(ring):
+    if ring == 0:
+        return np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64)
+    side = np.arange(-ring, ring + 1, dtype=np.int64)
+    inner = side[1:-1]
+    dx = np.concatenate([side, side, np.full(inner.size, -ring), np.full(inner.size, ring)])
+    dy = np.concatenate([np.full(side.size, -ring), np.full(side.size, ring), inner, inner])
+    return dx, dy
@@ -0,0 +1,175 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from geo import WALK_SPEED, haversine
+from pipeline import CLUSTERS_FILENAME, FINAL_DROP_COLUMNS, join_clusters, load_clusters
+
+# Синтетический sport_objects_final_full_data.csv той же схемы, что собирает pipeline.py, любого размера -
+# для нагрузочных замеров (benchmark.py). Пример:
+#   python synthetic_data.py --objects 100000 --links 30 --districts 50 --sport-types 10 --output big.csv
+
+OUTPUT_FILENAME = 'synthetic_full_data.csv'
+CHUNKSIZE = 500000
+
+# Колонки до присоединения показателей районов - в порядке итогового CSV
+ROW_COLUMNS = ['sport_object_id', 'sport_object_name', 'sport_object_address', 'sport_object_lat', 'sport_object_lon',
+               'sport_object_type', 'sport_object_total_infrastructure', 'schedule', 'district',
+               'infrastructure_type', 'infrastructure_name', 'infrastructure_address', 'infrastructure_lat',
+               'infrastructure_lon', 'distance_meters', 'distance_kilometers', 'walk_time_minutes', 'infrastructure_id']
+
+SPORT_TYPES = ['теннис', 'сквош', 'падел']
+INFRA_TYPES = ['кафе', 'торговый_центр', 'супермаркет', 'фитнес', 'остановка', 'офис', 'метро', 'магазин', 'ресторан']
+
+# Прямоугольник города и разброс объектов вокруг центра района, градусы
+CITY_BBOX = (59.80, 30.10, 60.10, 30.55)
+DISTRICT_SPREAD = 0.02
+# Инфраструктура вокруг объекта (около 500 м) и доля связей с инфраструктурой соседнего объекта,
+# если сосед ближе SHARED_DISTANCE метров
+INFRA_SPREAD = 0.005
+SHARED_INFRA = 0.3
+SHARED_DISTANCE = 1000
+
+# Идентификаторы в стиле 2GIS: большие числа, в CSV - float
+OBJECT_ID_BASE = 70000001000000000
+INFRA_ID_BASE = 70000010000000000
+ID_STEP = 1000
+
+# Районы: реальные из CSV кластеров, недостающие - копии реальных с новым названием и измененными показателями
+def make_districts(count, rng, clusters_filename=CLUSTERS_FILENAME):
+    if os.path.exists(clusters_filename):
+        real = load_clusters(clusters_filename).reset_index(drop=True)
+    else:
+        real = pd.DataFrame({'Населенный_пункт': ['Район 1'], 'Плотность_населения': [5000.0],
+                             'Зарплата': [100000.0], 'Население': [200000.0], 'Соотношение_М_Ж': [0.85]})
+
+    districts = real.iloc[np.arange(count) % len(real)].reset_index(drop=True)
+    copies = np.arange(count) >= len(real)
+    if copies.any():
+        districts.loc[copies, 'Населенный_пункт'] = [f'Синтетический район {i + 1}' for i in np.flatnonzero(copies)]
+        for column in ['Плотность_населения', 'Зарплата', 'Население']:
+            if column in districts.columns:
+                scale = rng.uniform(0.5, 1.5, copies.sum())
+                districts[column] = districts[column].astype(np.float64)
+                districts.loc[copies, column] = (districts.loc[copies, column] * scale).round(2)
+
+    districts.index = districts['Населенный_пункт']
+    return districts
+
+# Названия видов спорта и их доли: первые виды встречаются чаще (убывание как 1/номер)
+def make_sport_types(count):
+    names = SPORT_TYPES[:count] + [f'вид спорта {i + 1}' for i in range(len(SPORT_TYPES), count)]
+    weights = 1.0 / np.arange(1, count + 1)
+    return names, weights / weights.sum()
+
+# Детерминированный шум в [-1, 1) по номеру сущности: два независимых значения из целочисленного хеша
+def _entity_noise(entity):
+    x = entity.astype(np.uint64)
+    noise = []
+    for multiplier in (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F):
+        h = x * np.uint64(multiplier)
+        h ^= h >> np.uint64(31)
+        noise.append((h >> np.uint64(11)).astype(np.float64) / 2.0 ** 53 * 2 - 1)
+    return noise
+
+# Строки для объектов [start, stop): по links связей на объект
+def make_rows(start, stop, links, districts, centers, sport_types, rng):
+    count = stop - start
+    sport_names, sport_weights = sport_types
+
+    district = rng.integers(0, len(districts), count)
+    lat = centers[district, 0] + rng.normal(0, DISTRICT_SPREAD, count)
+    lon = centers[district, 1] + rng.normal(0, DISTRICT_SPREAD * 2, count)
+
+    # Соседние по координатам объекты делят часть инфраструктуры, как в реальных данных
+    order = np.lexsort((lon, np.floor(lat / DISTRICT_SPREAD)))
+    district, lat, lon = district[order], lat[order], lon[order]
+    object_pos = np.arange(start, stop)
+
+    entity = (start * links + np.arange(count * links)).reshape(count, links)
+    shared = rng.random((count, links)) < SHARED_INFRA
+    shared[0] = False
+    shared[1:] &= (haversine(lat[1:], lon[1:], lat[:-1], lon[:-1]) < SHARED_DISTANCE)[:, None]
+    entity[shared] = np.roll(entity, 1, axis=0)[shared]
+    owner = (entity // links) - start
+
+    # Координаты и тип инфраструктуры зависят только от номера сущности - у общей они совпадают
+    offsets = _entity_noise(entity.ravel())
+    infra_lat = lat[owner.ravel()] + offsets[0] * INFRA_SPREAD
+    infra_lon = lon[owner.ravel()] + offsets[1] * INFRA_SPREAD * 2
+    infra_type = np.asarray(INFRA_TYPES)[(entity.ravel() * 7919) % len(INFRA_TYPES)]
+
+    rows = np.repeat(np.arange(count), links)
+    object_lat, object_lon = lat[rows], lon[rows]
+    distance = np.round(haversine(object_lat, object_lon, infra_lat, infra_lon), 1)
+    sport_type = np.asarray(sport_names)[rng.choice(len(sport_names), count, p=sport_weights)]
+    schedule = rng.integers(0, 2, count).astype(float)
+
+    return pd.DataFrame({
+        'sport_object_id': (OBJECT_ID_BASE + object_pos[rows] * ID_STEP).astype(np.float64),
+        'sport_object_name': np.char.add('Спортивный объект ', object_pos.astype(str))[rows],
+        'sport_object_address': np.char.add('ул. Синтетическая, ', object_pos.astype(str))[rows],
+        'sport_object_lat': object_lat.round(6),
+        'sport_object_lon': object_lon.round(6),
+        'sport_object_type': sport_type[rows],
+        'sport_object_total_infrastructure': links,
+        'schedule': schedule[rows],
+        'district': districts.index.to_numpy()[district][rows],
+        'infrastructure_type': infra_type,
+        'infrastructure_name': np.char.add('Объект инфраструктуры ', entity.ravel().astype(str)),
+        'infrastructure_address': np.char.add('пр. Инфраструктурный, ', entity.ravel().astype(str)),
+        'infrastructure_lat': infra_lat.round(6),
+        'infrastructure_lon': infra_lon.round(6),
+        'distance_meters': distance,
+        'distance_kilometers': np.round(distance / 1000, 3),
+        'walk_time_minutes': np.round(distance / WALK_SPEED, 1),
+        'infrastructure_id': (INFRA_ID_BASE + entity.ravel() * ID_STEP).astype(np.float64),
+    }, columns=ROW_COLUMNS)
+
+# Пишем CSV чанками по chunksize строк - память не зависит от размера файла. Возвращает число строк
+def generate(output_filename=OUTPUT_FILENAME, objects=1000, links=30, districts=18, sport_types=3, seed=0,
+             chunksize=CHUNKSIZE, clusters_filename=CLUSTERS_FILENAME):
+    rng = np.random.default_rng(seed)
+    district_table = make_districts(districts, rng, clusters_filename)
+    south, west, north, east = CITY_BBOX
+    centers = np.column_stack([rng.uniform(south, north, districts), rng.uniform(west, east, districts)])
+    sports = make_sport_types(sport_types)
+
+    objects_per_chunk = max(chunksize // max(links, 1), 1)
+    tmp_filename = output_filename + '.tmp'
+    rows = 0
+    try:
+        for start in range(0, objects, objects_per_chunk):
+            stop = min(start + objects_per_chunk, objects)
+            chunk = make_rows(start, stop, links, district_table, centers, sports, rng)
+            chunk = join_clusters(chunk, district_table)
+            chunk = chunk.drop(columns=[col for col in FINAL_DROP_COLUMNS if col in chunk.columns])
+            chunk.to_csv(tmp_filename, mode='w' if start == 0 else 'a', header=start == 0,
+                         index=False, encoding='utf-8-sig' if start == 0 else 'utf-8')
+            rows += len(chunk)
+        os.replace(tmp_filename, output_filename)
+    finally:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Синтетический датасет для дашборда в схеме sport_objects_final_full_data.csv")
+    parser.add_argument('--output', default=OUTPUT_FILENAME, help="итоговый CSV")
+    parser.add_argument('--objects', type=int, default=1000, help="число спортивных объектов")
+    parser.add_argument('--links', type=int, default=30, help="связей с инфраструктурой на объект")
+    parser.add_argument('--districts', type=int, default=18, help="число районов")
+    parser.add_argument('--sport-types', type=int, default=3, help="число видов спорта")
+    parser.add_argument('--seed', type=int, default=0, help="зерно генератора")
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE, help="строк в одном чанке")
+    parser.add_argument('--clusters', default=CLUSTERS_FILENAME, help="CSV с кластерами районов")
+    args = parser.parse_args()
+
+    rows = generate(args.output, args.objects, args.links, args.districts, args.sport_types, args.seed,
+                    args.chunksize, args.clusters)
+    print(f"{args.output}: {rows} строк, {os.path.getsize(args.output) / 2 ** 20:.1f} МБ")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import math
+import re
+
+import numpy as np
+
+# Серверная обработка таблицы объектов: разбор filter_query из DataTable, сортировка и страница
+
+# Условие фильтра DataTable: {колонка} оператор значение.
+# Оператор может иметь префикс i (без учета регистра) или s (с учетом регистра)
+FILTER_PART = re.compile(r'^\{(?P<column>[^}]+)\}\s+(?P<operator>\S+)\s*(?P<value>.*)$')
+
+OPERATORS = {
+    'contains': 'contains', 'datestartswith': 'startswith',
+    'eq': 'eq', '=': 'eq', 'ne': 'ne', '!=': 'ne',
+    'lt': 'lt', '<': 'lt', 'le': 'le', '<=': 'le',
+    'gt': 'gt', '>': 'gt', 'ge': 'ge', '>=': 'ge',
+}
+
+# Без префикса сравниваем без учета регистра - как filter_options={'case': 'insensitive'} в таблице
+DEFAULT_CASE_INSENSITIVE = True
+
+def _unquote(value):
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'`':
+        return value[1:-1]
+    return value
+
+# filter_query -> список (колонка, оператор, значение, без учета регистра); неизвестные условия пропускаем
+def parse_filter_query(filter_query):
+    conditions = []
+    for part in (filter_query or '').split(' && '):
+        match = FILTER_PART.match(part.strip())
+        if not match:
+            continue
+        operator = match.group('operator').lower()
+        insensitive = DEFAULT_CASE_INSENSITIVE
+        if operator not in OPERATORS and operator[:1] in ('i', 's') and operator[1:] in OPERATORS:
+            insensitive = operator[0] == 'i'
+            operator = operator[1:]
+        if operator not in OPERATORS:
+            continue
+        conditions.append((match.group('column'), OPERATORS[operator], _unquote(match.group('value')), insensitive))
+    return conditions
+
+# Маска строк table, удовлетворяющих всем условиям; колонки таблицы строковые
+def filter_mask(table, conditions):
+    mask = np.ones(len(table), dtype=bool)
+    for column, operator, value, insensitive in conditions:
+        if column not in table.columns:
+            continue
+        values = table[column].astype(str)
+        if insensitive:
+            values, value = values.str.lower(), value.lower()
+
+        if operator == 'contains':
+            matched = values.str.contains(value, regex=False)
+        elif operator == 'startswith':
+            matched = values.str.startswith(value)
+        else:
+            matched = getattr(values, operator)(value)
+        mask &= matched.to_numpy(dtype=bool)
+    return mask
+
+# Сортировка по sort_by из DataTable: [{'column_id': ..., 'direction': 'asc' | 'desc'}, ...]
+def sort_table(table, sort_by):
+    sort_by = [item for item in sort_by or [] if item.get('column_id') in table.columns]
+    if not sort_by:
+        return table
+    return table.sort_values(
+        [item['column_id'] for item in sort_by],
+        ascending=[item.get('direction', 'asc') == 'asc' for item in sort_by],
+        kind='stable',
+    )
+
+# Фильтр, сортировка и одна страница. Возвращает строки страницы, число страниц и номер страницы
+# (если после фильтрации страниц стало меньше, показываем последнюю)
+def query_page(table, page_current, page_size, sort_by=None, filter_query=None):
+    conditions = parse_filter_query(filter_query)
+    if conditions:
+        table = table[filter_mask(table, conditions)]
+    table = sort_table(table, sort_by)
+
+    page_size = max(int(page_size or 1), 1)
+    page_count = max(math.ceil(len(table) / page_size), 1)
+    page_current = min(max(int(page_current or 0), 0), page_count - 1)
+    start = page_current * page_size
+    return table.iloc[start:start + page_size], page_count, page_current
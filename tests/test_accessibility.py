@@ -0,0 +1,20 @@
+import numpy as np
+
+from accessibility import UNKNOWN_DISTRICT, city_cells
+
+# Клетки, ближайший объект которых без района, остаются в сетке под отдельным районом
+def test_city_cells_keep_unknown_district():
+    lat = np.array([59.90, 59.95, 60.00])
+    lon = np.array([30.30, 30.30, 30.30])
+    cells = city_cells(lat, lon, np.array([0, 1, -1]), ['A', 'B'], [1000, 2000])
+
+    counts = cells['district'].value_counts()
+    assert list(cells['district'].cat.categories) == ['A', 'B', UNKNOWN_DISTRICT]
+    assert counts[UNKNOWN_DISTRICT] > 0
+    assert np.isclose(cells.loc[cells['district'] == 'A', 'population'].sum(), 1000)
+    assert np.isclose(cells.loc[cells['district'] == 'B', 'population'].sum(), 2000)
+    assert (cells.loc[cells['district'] == UNKNOWN_DISTRICT, 'population'] > 0).all()
+
+def test_city_cells_without_unknown_district():
+    cells = city_cells(np.array([59.90, 59.95]), np.array([30.30, 30.30]), np.array([0, 1]), ['A', 'B'], [1000, 2000])
+    assert list(cells['district'].cat.categories) == ['A', 'B']
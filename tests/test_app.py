@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+import app
+import data_loader
+import synthetic_data
+from data_loader import EMPTY_DATA, sport_data
+
+CLUSTERS_FILENAME = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'full_cluster_analysis.csv')
+
+# Общий загрузчик дашборда на небольшом синтетическом CSV; после теста - прежний файл и пустые данные
+@pytest.fixture
+def dashboard_data(tmp_path):
+    filename = str(tmp_path / 'data.csv')
+    synthetic_data.generate(filename, objects=60, links=3, districts=4, sport_types=3, seed=0,
+                            clusters_filename=CLUSTERS_FILENAME)
+    saved = sport_data.filename, sport_data.snapshot_filename
+    sport_data.filename, sport_data.snapshot_filename = filename, filename + '.snapshot.pkl'
+    app.ready.clear()
+    app.seen_reload_request = None
+    yield filename
+    sport_data.filename, sport_data.snapshot_filename = saved
+    sport_data._swap(EMPTY_DATA)
+    sport_data.loaded = False
+    app.ready.clear()
+    app.seen_reload_request = None
+
+# Запрос, сделанный до загрузки, учтен в данных; сделанный после (другим воркером) - еще нет
+def test_load_records_pending_reload_request(dashboard_data):
+    before = app.request_reload()
+    assert app.load_and_warm()
+    assert app.seen_reload_request == before
+
+    after = app.request_reload(force=True)
+    assert after != app.seen_reload_request
+    assert app.reload_and_warm(force=True)
+    assert app.seen_reload_request == after
+
+# Фоновая загрузка не сдается после неудачи: CSV появился позже - сервер становится готов
+def test_background_load_retries_until_ready(dashboard_data, monkeypatch):
+    monkeypatch.setattr(app, 'LOAD_RETRY_SECONDS', 0.05)
+    monkeypatch.setattr(data_loader, 'LOAD_RETRY_SECONDS', 0)
+    os.replace(dashboard_data, dashboard_data + '.new')
+
+    thread = app.start_background_load()
+    thread.join(0.3)
+    assert thread.is_alive() and not app.ready.is_set()
+
+    os.replace(dashboard_data + '.new', dashboard_data)
+    thread.join(30)
+    assert app.ready.is_set() and sport_data.loaded
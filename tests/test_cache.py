@@ -0,0 +1,50 @@
+from cache import LRUCache
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(10)
+    cache.put('a', 'aaaa')
+    cache.put('b', 'bbbb')
+    assert cache.get('a') == 'aaaa'
+    cache.put('c', 'cccc')
+
+    assert 'b' not in cache
+    assert 'a' in cache and 'c' in cache
+    assert cache.total_bytes == 8
+
+def test_replacing_key_updates_size():
+    cache = LRUCache(10)
+    cache.put('a', 'aaaa')
+    cache.put('a', 'aaaaaaaa')
+    assert len(cache) == 1
+    assert cache.total_bytes == 8
+
+# Значение больше всего бюджета не кешируется и не вытесняет остальные
+def test_oversized_value_is_not_cached():
+    cache = LRUCache(10)
+    cache.put('a', 'aaaa')
+    assert cache.put('big', 'x' * 11) == 'x' * 11
+    assert 'big' not in cache
+    assert cache.get('a') == 'aaaa'
+
+def test_custom_sizeof():
+    cache = LRUCache(100, sizeof=lambda entry: entry[1])
+    cache.put('a', ('first', 60))
+    cache.put('b', ('second', 60))
+    assert 'a' not in cache
+    assert cache.get('b') == ('second', 60)
+
+def test_get_or_create_and_stats():
+    cache = LRUCache(10)
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return 'value'
+
+    assert cache.get_or_create('key', factory) == 'value'
+    assert cache.get_or_create('key', factory) == 'value'
+    assert len(calls) == 1
+    assert cache.stats() == {'items': 1, 'bytes': 5, 'max_bytes': 10, 'hits': 1, 'misses': 1}
+
+    cache.clear()
+    assert len(cache) == 0 and cache.total_bytes == 0
@@ -0,0 +1,130 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+import synthetic_data
+from accessibility import nearest_distances
+from data_loader import EMPTY_DATA, SportDataLoader
+
+CLUSTERS_FILENAME = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'full_cluster_analysis.csv')
+
+@pytest.fixture
+def csv_filename(tmp_path):
+    filename = str(tmp_path / 'data.csv')
+    synthetic_data.generate(filename, objects=60, links=3, districts=4, sport_types=3, seed=0,
+                            clusters_filename=CLUSTERS_FILENAME)
+    return filename
+
+def test_swap_none_keeps_current_version():
+    loader = SportDataLoader('missing.csv')
+    loader._swap(EMPTY_DATA._replace(version='a'))
+    loader._swap(None)
+
+    assert loader.version == 'a'
+    assert loader.loaded
+    assert loader.load_failed_at is not None
+
+# Кеш фильтров сбрасывается и слушатели вызываются только при смене версии
+def test_swap_notifies_listeners_on_new_version():
+    loader = SportDataLoader('missing.csv')
+    calls = []
+    loader.reload_listeners.append(lambda previous, current: calls.append((previous, current)))
+
+    loader._swap(EMPTY_DATA._replace(version='a'))
+    loader.filter_cache.put('key', [])
+    loader._swap(EMPTY_DATA._replace(version='a'))
+    assert 'key' in loader.filter_cache
+
+    loader._swap(EMPTY_DATA._replace(version='b'))
+    assert 'key' not in loader.filter_cache
+    assert calls == [(None, 'a'), ('a', 'b')]
+
+# Поток, начавший запрос до подмены версии, видит свою версию до release()
+def test_pinned_version_survives_swap():
+    loader = SportDataLoader('missing.csv')
+    loader._swap(EMPTY_DATA._replace(version='a'))
+    assert loader.load()
+
+    seen = []
+    thread = threading.Thread(target=lambda: (loader._swap(EMPTY_DATA._replace(version='b')), seen.append(loader.version)))
+    thread.start()
+    thread.join()
+
+    assert seen == ['b']
+    assert loader.version == 'a'
+    loader.release()
+    assert loader.version == 'b'
+
+def test_load_missing_file():
+    loader = SportDataLoader('missing.csv')
+    assert loader.load() is False
+    assert 'missing.csv' in loader.load_error
+
+def test_load_and_reload_on_change(csv_filename):
+    loader = SportDataLoader(csv_filename)
+    assert loader.load()
+    version = loader.version
+    assert loader.get_objects()['sport_object_id'].nunique() == 60
+    assert loader.reload() is False
+
+    synthetic_data.generate(csv_filename, objects=80, links=3, districts=4, sport_types=3, seed=1,
+                            clusters_filename=CLUSTERS_FILENAME)
+    assert loader.reload(force=True)
+    assert loader.version != version
+    assert len(loader.get_objects()) == 80
+
+# Перезагрузка из другого потока не подменяет данные посреди запроса
+def test_pinned_version_survives_reload(csv_filename):
+    loader = SportDataLoader(csv_filename)
+    loader.load()
+    old_version = loader.version
+
+    synthetic_data.generate(csv_filename, objects=80, links=3, districts=4, sport_types=3, seed=1,
+                            clusters_filename=CLUSTERS_FILENAME)
+    reloaded = []
+    thread = threading.Thread(target=lambda: reloaded.append((loader.reload(force=True), loader.version)))
+    thread.start()
+    thread.join()
+
+    assert reloaded[0][0] and reloaded[0][1] != old_version
+    assert loader.version == old_version
+    assert len(loader.get_objects()) == 60
+
+    loader.release()
+    assert loader.version == reloaded[0][1]
+    assert len(loader.get_objects()) == 80
+
+# Сетка по фильтру видов спорта совпадает с поиском ближайшего только по объектам выбранных видов
+def test_accessibility_grid_by_sport_type(csv_filename):
+    loader = SportDataLoader(csv_filename)
+    loader.load()
+    objects = loader.get_objects()
+    sports = list(objects['sport_object_type'].cat.categories[:2])
+
+    grid = loader.get_accessibility_grid(sports)
+    selected = objects[objects['sport_object_type'].isin(sports)]
+    expected = nearest_distances(grid, selected['sport_object_lat'], selected['sport_object_lon']).round(1)
+    # Индексы по видам спорта проецируют координаты каждый от своей широты - расхождение в доли процента
+    assert np.allclose(grid['distance'], expected, rtol=1e-3, atol=0.1, equal_nan=True)
+    assert len(grid) == len(loader.get_accessibility_grid())
+
+# Радиус, как и на карте, ограничивает таблицу объектами с инфраструктурой в его пределах и колонку типов
+def test_radius_applies_to_table(csv_filename):
+    loader = SportDataLoader(csv_filename)
+    loader.load()
+    radius = 250
+    filtered = loader.filter_data(radius=radius)
+
+    links = loader.get_full_data()
+    near = links[loader.link_distances <= radius]
+    assert set(filtered.table_objects['sport_object_id']) == set(near['sport_object_id'])
+    assert len(filtered.objects) == 60
+
+    object_ids = filtered.table_objects['sport_object_id'].to_numpy()
+    types = loader.get_infrastructure_types_by_objects(object_ids, radius=radius)
+    expected = near.groupby('sport_object_id')['infrastructure_type'].agg(lambda values: ', '.join(sorted(set(map(str, values)))))
+    assert list(types) == list(expected.loc[object_ids])
+    assert loader.get_infrastructure_types_by_objects(object_ids, radius=10000).equals(
+        loader.get_infrastructure_types_by_objects(object_ids))
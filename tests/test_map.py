@@ -0,0 +1,31 @@
+import pandas as pd
+
+from callbacks import create_combined_map_with_colors
+
+SPORT_TYPES = [f'спорт {i}' for i in range(10)]
+
+def sport_frame(types):
+    return pd.DataFrame({
+        'sport_object_name': [f'объект {i}' for i in range(len(types))],
+        'sport_object_lat': [59.90 + i * 0.001 for i in range(len(types))],
+        'sport_object_lon': [30.30 + i * 0.001 for i in range(len(types))],
+        'sport_object_type': pd.Categorical(types, categories=SPORT_TYPES),
+    })
+
+def sport_traces(fig):
+    return {trace.name: trace for trace in fig.data if trace.name in SPORT_TYPES}
+
+# У каждого вида спорта своя трасса - и у тех, что дальше первых цветов палитры
+def test_every_sport_type_has_a_trace():
+    fig = create_combined_map_with_colors(sport_frame(SPORT_TYPES * 2), pd.DataFrame())
+    traces = sport_traces(fig)
+    assert list(traces) == SPORT_TYPES
+    assert all(len(trace.lat) == 2 for trace in traces.values())
+
+# Выбранный в фильтре вид спорта из конца списка категорий остается на карте
+def test_filtered_late_sport_type_has_markers():
+    fig = create_combined_map_with_colors(sport_frame([SPORT_TYPES[-1]] * 3), pd.DataFrame())
+    traces = sport_traces(fig)
+    assert len(traces[SPORT_TYPES[-1]].lat) == 3
+    assert traces[SPORT_TYPES[-1]].showlegend
+    assert not any(len(traces[name].lat) for name in SPORT_TYPES[:-1])
@@ -0,0 +1,65 @@
+import numpy as np
+
+from geo import haversine, project
+from spatial_index import GridIndex
+
+def random_points(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(59.80, 60.05, count), rng.uniform(30.10, 30.55, count)
+
+def test_query_bbox_matches_brute_force():
+    lat, lon = random_points(2000)
+    index = GridIndex(lat, lon)
+    south, west, north, east = 59.90, 30.20, 59.98, 30.40
+
+    expected = np.flatnonzero((lat >= south) & (lat <= north) & (lon >= west) & (lon <= east))
+    assert np.array_equal(index.query_bbox(south, west, north, east), expected)
+
+def test_query_radius_matches_brute_force():
+    lat, lon = random_points(2000)
+    index = GridIndex(lat, lon)
+
+    rows, distances = index.query_radius(59.94, 30.31, 1500)
+    all_distances = haversine(59.94, 30.31, lat, lon)
+    assert set(rows) == set(np.flatnonzero(all_distances <= 1500))
+    assert np.all(np.diff(distances) >= 0)
+    assert np.allclose(distances, all_distances[rows])
+
+# Точки без координат в индекс не попадают
+def test_nan_coordinates_are_skipped():
+    lat = np.array([59.94, np.nan, 59.95])
+    lon = np.array([30.31, 30.32, np.nan])
+    index = GridIndex(lat, lon)
+    assert len(index) == 1
+    assert list(index.query_bbox(59.0, 30.0, 61.0, 31.0)) == [0]
+
+def test_nearest_matches_brute_force():
+    lat, lon = random_points(500)
+    index = GridIndex(lat, lon)
+    query_lat, query_lon = random_points(200, seed=1)
+
+    rows, distances = index.nearest(query_lat, query_lon, 400)
+
+    # Расстояния в индексе - в локальной проекции, перебор считаем в ней же
+    x, y = project(lat, lon, index.lat0)
+    query_x, query_y = project(query_lat, query_lon, index.lat0)
+    brute = np.hypot(x[None, :] - query_x[:, None], y[None, :] - query_y[:, None])
+    found = brute.min(axis=1) <= 400
+    assert np.array_equal(rows[~found], np.full((~found).sum(), -1))
+    assert np.array_equal(rows[found], brute.argmin(axis=1)[found])
+    assert np.allclose(distances[found], brute.min(axis=1)[found])
+    assert found.any() and not found.all()
+
+def test_nearest_respects_max_distance():
+    index = GridIndex([59.94], [30.31])
+    rows, distances = index.nearest(np.array([59.94, 59.99]), np.array([30.31, 30.31]), 1000)
+    assert list(rows) == [0, -1]
+    assert distances[0] < 1 and np.isnan(distances[1])
+
+def test_empty_index():
+    index = GridIndex([], [])
+    assert len(index.query_bbox(59.0, 30.0, 61.0, 31.0)) == 0
+    rows, distances = index.query_radius(59.94, 30.31, 1000)
+    assert len(rows) == 0 and len(distances) == 0
+    rows, distances = index.nearest(np.array([59.94]), np.array([30.31]), 1000)
+    assert list(rows) == [-1] and np.isnan(distances[0])
@@ -0,0 +1,49 @@
+import pandas as pd
+
+from table_query import parse_filter_query, query_page
+
+def make_table():
+    return pd.DataFrame({
+        'Название': ['Корт Север', 'корт юг', 'Стадион', 'Манеж'],
+        'Район': ['Приморский', 'Кировский', 'Приморский', 'Центральный'],
+        'Инфраструктура': ['12', '3', '7', '30'],
+    })
+
+def test_parse_operators_and_case_prefixes():
+    conditions = parse_filter_query('{Название} icontains корт && {Район} s= Приморский && {Инфраструктура} >= 7')
+    assert conditions == [
+        ('Название', 'contains', 'корт', True),
+        ('Район', 'eq', 'Приморский', False),
+        ('Инфраструктура', 'ge', '7', True),
+    ]
+
+def test_parse_unquotes_values():
+    assert parse_filter_query('{Название} contains "Корт Север"') == [('Название', 'contains', 'Корт Север', True)]
+    assert parse_filter_query("{Район} eq 'Кировский'") == [('Район', 'eq', 'Кировский', True)]
+
+# Неизвестные операторы и строки не по формату пропускаются, а не ломают запрос
+def test_parse_skips_unknown_conditions():
+    assert parse_filter_query('{Название} matches корт && мусор && {Район} ne Кировский') == [
+        ('Район', 'ne', 'Кировский', True),
+    ]
+    assert parse_filter_query('') == []
+    assert parse_filter_query(None) == []
+
+def test_query_page_filters_case_insensitive_by_default():
+    page, page_count, page_current = query_page(make_table(), 0, 10, filter_query='{Название} contains КОРТ')
+    assert list(page['Название']) == ['Корт Север', 'корт юг']
+    assert (page_count, page_current) == (1, 0)
+
+def test_query_page_case_sensitive_prefix():
+    page, _, _ = query_page(make_table(), 0, 10, filter_query='{Название} scontains корт')
+    assert list(page['Название']) == ['корт юг']
+
+def test_query_page_sorts_and_clamps_page():
+    table = make_table()
+    page, page_count, page_current = query_page(table, 5, 3, sort_by=[{'column_id': 'Название', 'direction': 'desc'}])
+    assert (page_count, page_current) == (2, 1)
+    assert list(page['Название']) == ['Корт Север']
+
+def test_query_page_ignores_unknown_columns():
+    page, _, _ = query_page(make_table(), 0, 10, sort_by=[{'column_id': 'Нет такой'}], filter_query='{Нет такой} eq 1')
+    assert len(page) == 4
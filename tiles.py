@@ -0,0 +1,51 @@
+from collections import namedtuple
+import math
+
+import numpy as np
+
+from geo import haversine, project, unproject
+from spatial_index import GridIndex
+
+# Планирование запросов инфраструктуры: вместо запроса на каждый объект - запрос на тайл,
+# покрывающий все объекты в квадрате tile_size x tile_size. Связи объект-инфраструктура
+# затем восстанавливаются локально фильтром по расстоянию.
+
+# Сторона тайла, метры
+TILE_SIZE = 2000
+
+# Точка запроса и радиус, который покрывает окрестности radius всех объектов тайла
+Tile = namedtuple('Tile', ['lat', 'lon', 'radius', 'objects'])
+
+def plan_tiles(lat, lon, radius, tile_size=TILE_SIZE):
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    if not len(lat):
+        return []
+
+    lat0 = float(np.mean(lat))
+    x, y = project(lat, lon, lat0)
+    cell = np.floor(x / tile_size).astype(np.int64) * 1000003 + np.floor(y / tile_size).astype(np.int64)
+    _, inverse = np.unique(cell, return_inverse=True)
+
+    tiles = []
+    for rows in np.split(np.argsort(inverse, kind='stable'), np.cumsum(np.bincount(inverse))[:-1]):
+        # Центр - середина охватывающего прямоугольника объектов, а не ячейки:
+        # для тайла из одного объекта запрос совпадает с исходным
+        center_x = (x[rows].min() + x[rows].max()) / 2
+        center_y = (y[rows].min() + y[rows].max()) / 2
+        center_lat, center_lon = unproject(center_x, center_y, lat0)
+        reach = haversine(center_lat, center_lon, lat[rows], lon[rows]).max()
+        tiles.append(Tile(float(center_lat), float(center_lon), int(math.ceil(reach + radius)), len(rows)))
+    return tiles
+
+# Для каждого объекта - найденная инфраструктура не дальше radius, по возрастанию расстояния
+def link_infrastructure(lat, lon, items, radius):
+    infra_lat = [item['point']['lat'] for item in items]
+    infra_lon = [item['point']['lon'] for item in items]
+    index = GridIndex(infra_lat, infra_lon)
+
+    links = []
+    for object_lat, object_lon in zip(lat, lon):
+        rows, _ = index.query_radius(object_lat, object_lon, radius)
+        links.append([items[row] for row in rows])
+    return links
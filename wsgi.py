@@ -0,0 +1,18 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from data_loader import sport_data
+from app import create_app, load_and_warm
+
+# Точка входа для WSGI-сервера с pre-fork (gunicorn, настройки в gunicorn.conf.py):
+#   gunicorn wsgi:server
+# Данные и индексы загружаются, а кеши прогреваются при импорте модуля - с preload_app это происходит
+# в мастере до fork, и воркеры получают их общими страницами памяти (copy-on-write), без своей загрузки CSV/снимка
+if not load_and_warm():
+    raise RuntimeError(f"Не удалось загрузить данные из {sport_data.filename}: {sport_data.load_error}")
+
+# Проверку изменений CSV запускают воркеры после fork (post_fork в gunicorn.conf.py) - потоки мастера в них не переходят
+app = create_app(eager_load=False, reload_interval=0)
+server = app.server